@@ -21,8 +21,13 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from __future__ import division
 
+import sys
+
+import numpy
 import pandas
 
+from denovoFilter.trio_counts import TrioCounts
+
 def extract_alt_and_ref_counts(de_novos):
     """extract ALT and REF counts of forward and reverse reads for trio members
     
@@ -31,34 +36,35 @@ def extract_alt_and_ref_counts(de_novos):
     
     Returns:
         data frame of de novos, but with an extra columns for the read depths
-        of forward and reverse reads for each member of the trio.
+        of forward and reverse reads for each member of the trio. Candidates
+        with missing or malformed DP4 entries have counts of zero, and are
+        reported on stderr.
     """
     
-    members = ["child", "father", "mother"]
+    trio = TrioCounts.from_dp4(de_novos)
+    
+    invalid = ~trio.valid
+    if invalid.any():
+        sys.stderr.write("{0} candidates have missing or malformed DP4 "
+            "entries, setting their counts to zero\n".format(invalid.sum()))
     
     counts = de_novos[['person_stable_id', 'chrom', 'pos', 'ref', 'alt', 'symbol']].copy()
     
-    for member in members:
-        dp4 = de_novos["dp4_{0}".format(member)].str.split(",")
-        
-        # split the forward and reverse counts by ref and alt for each member
-        counts["{0}_ref_F".format(member)] = [ int(x[0]) for x in dp4 ]
-        counts["{0}_ref_R".format(member)] = [ int(x[1]) for x in dp4 ]
-        counts["{0}_alt_F".format(member)] = [ int(x[2]) for x in dp4 ]
-        counts["{0}_alt_R".format(member)] = [ int(x[3]) for x in dp4 ]
+    for column, values in trio.columns().items():
+        counts[column] = values
     
     # get the minimum alternate allele count from the parents
-    alts = pandas.DataFrame({"a": counts[["mother_alt_F", "mother_alt_R"]].sum(axis=1),
-        "b": counts[["father_alt_F", "father_alt_R"]].sum(axis=1)})
-    counts["min_parent_alt"] = alts.min(axis=1)
+    counts["min_parent_alt"] = trio.min_parent_alt
     
     return counts
 
-def get_recurrent_genes(de_novos):
+def get_recurrent_genes(de_novos, symbol_counts=None):
     """ count candidate de novo mutations per gene
     
     Args:
         de_novos: dataframe of de novo variants
+        symbol_counts: pandas Series of counts per HGNC symbol for other
+            candidates, such as candidates excluded while loading.
     
     Returns:
         dictionary of counts indexed by HGNC symbol
@@ -66,6 +72,8 @@ def get_recurrent_genes(de_novos):
     
     # count of number of candidates per gene
     counts = de_novos["symbol"].value_counts()
+    if symbol_counts is not None:
+        counts = counts.add(symbol_counts, fill_value=0)
     
     return counts.index[counts > 1]
 
@@ -102,6 +110,83 @@ def get_allele_counts(variants, gene=False):
     
     return values
 
+def group_codes(de_novos, columns):
+    """ get integer codes for the groups defined by the values in some columns
+    
+    Args:
+        de_novos: dataframe of de novo variants
+        columns: list of columns to group on e.g. ["chrom", "pos", "alt"]
+    
+    Returns:
+        tuple of numpy array of group codes for each variant (-1 for variants
+        with missing values in the grouping columns), and the number of groups
+    """
+    
+    groups = de_novos.groupby(columns, sort=False)
+    codes = groups.ngroup().fillna(-1).to_numpy(dtype=numpy.int64)
+    
+    return codes, groups.ngroups
+
+def sum_by_group(values, codes, n_groups):
+    """ sum the rows of an array within groups, in a single pass
+    
+    Args:
+        values: numpy array, with one row per variant
+        codes: numpy array of group codes for each row, from 0 to n_groups - 1
+        n_groups: total number of groups
+    
+    Returns:
+        numpy array of summed values for each group, with one row per group.
+        Groups without any rows have sums of zero.
+    """
+    
+    totals = numpy.zeros((n_groups, ) + values.shape[1:], dtype=numpy.int64)
+    if len(codes) == 0:
+        return totals
+    
+    # sort the rows so each group is contiguous, then sum each block of rows
+    order = numpy.argsort(codes, kind="stable")
+    codes = codes[order]
+    starts = numpy.flatnonzero(numpy.concatenate([[True], codes[1:] != codes[:-1]]))
+    
+    totals[codes[starts]] = numpy.add.reduceat(values[order].astype(numpy.int64),
+        starts, axis=0)
+    
+    return totals
+
+def get_grouped_allele_counts(counts, codes, n_groups, gene=False):
+    """ counts REF and ALT alleles in reads for every site or gene at once
+    
+    This gives the same values as get_allele_counts(), but for all groups in a
+    single pass, rather than one group at a time.
+    
+    Args:
+        counts: TrioCounts object for the variants
+        codes: numpy array of group codes for each variant, from group_codes()
+        n_groups: number of groups
+        gene: whether the groups are genes (rather than sites)
+    
+    Returns:
+        dataframe of counts, with one row per group (indexed by group code).
+        Sites have ref_F, ref_R, alt_F, alt_R, parent_alt and parent_ref
+        columns, whereas genes have gene_alt and gene_ref columns.
+    """
+    
+    totals = sum_by_group(counts.counts, codes, n_groups)
+    
+    # count parental alt and ref, trio members are child, father, then mother
+    parent_alt = totals[:, 1:, 2:].sum(axis=(1, 2))
+    parent_ref = totals[:, 1:, :2].sum(axis=(1, 2))
+    
+    if gene:
+        return pandas.DataFrame({"gene_alt": parent_alt, "gene_ref": parent_ref})
+    
+    trio = totals.sum(axis=1)
+    
+    return pandas.DataFrame({"ref_F": trio[:, 0], "ref_R": trio[:, 1],
+        "alt_F": trio[:, 2], "alt_R": trio[:, 3],
+        "parent_alt": parent_alt, "parent_ref": parent_ref})
+
 def get_depths_and_proportions(counts):
     """ get the read depths, alt depths and alt proportions for the trio members
     
@@ -114,20 +199,13 @@ def get_depths_and_proportions(counts):
         proportion columns for each trio member.
     """
     
-    # get the trio depths
-    child_depth = counts[["child_ref_F", "child_ref_R", "child_alt_F", "child_alt_R"]].sum(axis=1)
-    dad_depth = counts[["father_ref_F", "father_ref_R", "father_alt_F", "father_alt_R"]].sum(axis=1)
-    mom_depth = counts[["mother_ref_F", "mother_ref_R", "mother_alt_F", "mother_alt_R"]].sum(axis=1)
-    
-    # get the depth of the alternate alleles
-    child_alts = counts[["child_alt_F", "child_alt_R"]].sum(axis=1)
-    dad_alts = counts[["father_alt_F", "father_alt_R"]].sum(axis=1)
-    mom_alts = counts[["mother_alt_F", "mother_alt_R"]].sum(axis=1)
+    trio = TrioCounts.from_columns(counts)
     
     values = pandas.DataFrame({
-        'child_depth': child_depth, 'dad_depth': dad_depth, 'mom_depth': mom_depth,
-        'child_alts': child_alts, 'dad_alts': dad_alts, 'mom_alts': mom_alts,
-        'child_prp': child_alts/child_depth, 'dad_prp': dad_alts/dad_depth,
-        'mom_prp': mom_alts/mom_depth}, index=counts.index)
+        'child_depth': trio.depth('child'), 'dad_depth': trio.depth('father'),
+        'mom_depth': trio.depth('mother'), 'child_alts': trio.alts('child'),
+        'dad_alts': trio.alts('father'), 'mom_alts': trio.alts('mother'),
+        'child_prp': trio.proportion('child'), 'dad_prp': trio.proportion('father'),
+        'mom_prp': trio.proportion('mother')}, index=counts.index)
     
     return values
@@ -20,43 +20,142 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import json
+import os
+
+import numpy
+import pandas
+
+# first bytes of the compiled binary file of last base sites
+LAST_BASE_MAGIC = b"denovoFilter.last_base.v1\n"
+
+def site_keys(chroms, positions, chrom_names):
+    """ encode (chrom, pos) pairs as single 64-bit keys
+    
+    The chromosome index is held in the upper 32 bits, and the position in the
+    lower 32 bits, so sites can be matched with a single search.
+    
+    Args:
+        chroms: list or pandas Series of chromosomes
+        positions: list or pandas Series of positions
+        chrom_names: list of chromosome names, to index the chromosomes by
+    
+    Returns:
+        tuple of (numpy array of uint64 keys, boolean array for whether each
+        chromosome is in chrom_names).
+    """
+    
+    # chromosomes which aren't in chrom_names have an index of -1
+    codes = pandas.Index(chrom_names).get_indexer(pandas.Series(chroms).astype(str))
+    known = codes != -1
+    
+    keys = numpy.left_shift(numpy.where(known, codes, 0).astype(numpy.uint64),
+        numpy.uint64(32))
+    keys |= numpy.asarray(positions, dtype=numpy.int64).astype(numpy.uint64)
+    
+    return keys, known
+
+def read_last_base_json(path):
+    """ read the conserved last base sites from the JSON list of sites
+    
+    Args:
+        path: path to JSON file of [chrom, pos] pairs
+    
+    Returns:
+        tuple of (list of chromosome names, sorted numpy array of uint64 site
+        keys), see site_keys().
+    """
+    
+    with open(path, "r") as handle:
+        sites_json = json.load(handle)
+    
+    chroms = [ str(chrom) for chrom, pos in sites_json ]
+    positions = [ int(pos) for chrom, pos in sites_json ]
+    chrom_names = sorted(set(chroms))
+    
+    keys, _ = site_keys(chroms, positions, chrom_names)
+    
+    return chrom_names, numpy.unique(keys)
+
+def compile_last_base_sites(source, destination):
+    """ convert the JSON list of last base sites into a compact binary file
+    
+    The file starts with LAST_BASE_MAGIC, then a JSON line listing the
+    chromosome names, padded so the sorted uint64 site keys which follow are
+    8-byte aligned. The keys can then be memory-mapped, rather than parsed.
+    
+    Args:
+        source: path to JSON file of [chrom, pos] pairs
+        destination: path to write the binary file to
+    """
+    
+    chrom_names, keys = read_last_base_json(source)
+    
+    header = LAST_BASE_MAGIC + json.dumps(chrom_names).encode("utf-8")
+    header += b" " * (-(len(header) + 1) % 8) + b"\n"
+    
+    with open(destination, "wb") as handle:
+        handle.write(header)
+        handle.write(keys.astype("<u8").tobytes())
+
+def load_last_base_sites(path):
+    """ load the conserved last base sites, from either the JSON or binary file
+    
+    Args:
+        path: path to JSON file of [chrom, pos] pairs, or to the binary file
+            from compile_last_base_sites()
+    
+    Returns:
+        tuple of (list of chromosome names, sorted numpy array of uint64 site
+        keys). Keys from binary files are a read-only memory-map.
+    """
+    
+    with open(path, "rb") as handle:
+        magic = handle.read(len(LAST_BASE_MAGIC))
+        if magic != LAST_BASE_MAGIC:
+            return read_last_base_json(path)
+        
+        chrom_names = json.loads(handle.readline().decode("utf-8"))
+        offset = handle.tell()
+    
+    if offset == os.path.getsize(path):
+        return chrom_names, numpy.zeros(0, dtype=numpy.uint64)
+    
+    keys = numpy.memmap(path, dtype="<u8", mode="r", offset=offset)
+    
+    return chrom_names, keys
 
 def change_conserved_last_base_consequence(de_novos, last_base_path):
     """ reannotate the consequence of conserved sites at the end of exons
     
     Args:
         de_novos: pandas dataframe of candidate de novos
-        last_base_path: path to file listing conserved sites at the end of exons
+        last_base_path: path to file listing conserved sites at the end of
+            exons, either as JSON, or the binary file from
+            compile_last_base_sites().
     
     Returns:
         dataframe, but with the conserved sites consequence reannotated as
         "conserved_exon_terminus_variant"
     """
     
-    with open(last_base_path, "r") as handle:
-        sites_json = json.load(handle)
+    chrom_names, sites = load_last_base_sites(last_base_path)
+    keys, known = site_keys(de_novos["chrom"], de_novos["pos"], chrom_names)
     
-    # get a dictionary of sites per chromosome
-    sites = {}
-    for (chrom, pos) in sites_json:
-        if chrom not in sites:
-            sites[chrom] = set([])
-        
-        sites[chrom].add(int(pos))
+    # find the candidates at one of the identified sites, which have single
+    # base alleles (i.e "C" or "G"). The sites are sorted, so we can find
+    # matches by binary search.
+    at_site = numpy.zeros(len(keys), dtype=bool)
+    if len(sites) > 0:
+        idx = numpy.minimum(numpy.searchsorted(sites, keys), len(sites) - 1)
+        at_site = known & (sites[idx] == keys)
+    single_base = (de_novos["ref"].str.len() == 1) & (de_novos["alt"].str.len() == 1)
     
-    # find the sites for each chromosome at conserved last base of exons, and
-    # give them a new consequence value.
-    for chrom in sites:
-        positions = sites[chrom]
-        
-        # find which sites are for the correct chromosome, at one of the
-        # identified sites, and have a single base alleles (i.e "C" or "G")
-        in_chrom = de_novos["chrom"] == chrom
-        in_pos = de_novos["pos"].isin(positions)
-        single_base = (de_novos["ref"].str.len() == 1) & (de_novos["alt"].str.len() == 1)
-        
-        cq = de_novos["consequence"].copy()
-        cq[in_chrom & in_pos & single_base] = "conserved_exon_terminus_variant"
-        de_novos["consequence"] = cq
+    cq = de_novos["consequence"].copy()
+    value = "conserved_exon_terminus_variant"
+    if isinstance(cq.dtype, pandas.CategoricalDtype) and value not in cq.cat.categories:
+        cq = cq.cat.add_categories([value])
+    
+    cq[at_site & single_base] = value
+    de_novos["consequence"] = cq
     
     return de_novos
@@ -22,7 +22,7 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 import pandas
 import numpy
 
-from denovoFilter.most_severe import get_most_severe
+from denovoFilter.most_severe import severity_ranks
 
 def person_recurrence(de_novos):
     """ identify de novos recurrent in a gene within individuals.
@@ -39,30 +39,30 @@ def person_recurrence(de_novos):
         pandas Series for whether each candidate is a duplicate or not
     """
     
-    # find the variants which are recurrent within a person in a single gene
-    from_start = de_novos.duplicated(["person_stable_id", "symbol"])
-    from_end = de_novos.duplicated(["person_stable_id", "symbol"], keep='last')
-    
-    person_dups = from_start | from_end
-    in_person_dups = de_novos[person_dups]
-    
-    # split the dataset, so we can process gene by gene
-    genes = in_person_dups.groupby(["person_stable_id", "symbol"])
+    keys = ["person_stable_id", "symbol"]
     
-    # pick a variant for each person, the first of the most severe consequence
-    retain = pandas.Series([], dtype=numpy.bool_)
-    for key, gene in genes:
-        consequence = get_most_severe(gene["consequence"])
-        first = gene[gene["consequence"] == consequence].index[0]
-        
-        gene_retain = pandas.Series([True] * len(gene), index=gene.index)
-        gene_retain[first] = False
-        retain = retain.append(gene_retain)
-    
-    # set the selected de novos
-    person_dups.loc[retain.index] = retain
-    
-    return person_dups
+    # find the variants which are recurrent within a person in a single gene
+    person_dups = de_novos.duplicated(keys, keep=False)
+    
+    # rank the consequences by severity, and check the recurrent variants all
+    # have known consequences
+    ranks = severity_ranks(de_novos["consequence"])
+    unknown = person_dups & (ranks < 0)
+    if unknown.any():
+        raise KeyError(de_novos["consequence"][unknown].iloc[0])
+    
+    # sort the variants by severity, keeping the original order within each
+    # consequence. The first variant per person and gene is then the first of
+    # the most severe consequence, and all others are duplicates.
+    order = numpy.argsort(ranks, kind="stable")
+    retain = numpy.empty(len(de_novos), dtype=numpy.bool_)
+    retain[order] = de_novos[keys].iloc[order].duplicated().to_numpy()
+    
+    # variants lacking a person or symbol can't be grouped, so all duplicates
+    # of these are excluded
+    ungrouped = person_dups & de_novos[keys].isnull().any(axis=1)
+    
+    return pandas.Series(retain, index=de_novos.index) | ungrouped
 
 def family_recurrence(de_novos, family_ids):
     ''' identify de novos recurrent within a family.
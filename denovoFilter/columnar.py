@@ -0,0 +1,177 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import pandas
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+VCF_EXTENSIONS = (".vcf", ".vcf.gz", ".vcf.bgz")
+
+def table_format(path):
+    """ identify the format of a table from its extension
+    
+    Args:
+        path: path to table, or a file handle (e.g. sys.stdout) for text.
+    
+    Returns:
+        one of "parquet", "arrow" (for Arrow IPC files), "vcf" or "text"
+    """
+    
+    if not isinstance(path, str):
+        return "text"
+    
+    path = path.lower()
+    if path.endswith(PARQUET_EXTENSIONS):
+        return "parquet"
+    elif path.endswith(ARROW_EXTENSIONS):
+        return "arrow"
+    elif path.endswith(VCF_EXTENSIONS):
+        return "vcf"
+    
+    return "text"
+
+def require_pyarrow():
+    """ raise an informative error if pyarrow isn't available
+    """
+    
+    if pyarrow is None:
+        raise ImportError("Parquet and Arrow files need the pyarrow package, "
+            "which can be installed with 'pip install pyarrow'")
+
+def column_names(path):
+    """ get the column names from a Parquet or Arrow file, without the data
+    """
+    
+    if table_format(path) == "parquet":
+        return pyarrow.parquet.ParquetFile(path).schema_arrow.names
+    
+    return pyarrow.ipc.open_file(pyarrow.memory_map(path)).schema.names
+
+def select_columns(path, columns):
+    """ find which of the requested columns are in a Parquet or Arrow file
+    
+    Args:
+        path: path to Parquet or Arrow file
+        columns: list of column names, or None for every column.
+    
+    Returns:
+        list of column names present in the file (in file order), or None
+    """
+    
+    if columns is None:
+        return None
+    
+    columns = set(columns)
+    return [ x for x in column_names(path) if x in columns ]
+
+def read_columnar(path, columns=None):
+    """ load a Parquet or Arrow file into a pandas DataFrame
+    
+    Only the requested columns are read from disk. Dictionary encoded columns
+    are loaded as categoricals.
+    
+    Args:
+        path: path to Parquet or Arrow file
+        columns: list of columns to load, or None to load every column.
+            Columns missing from the file are skipped.
+    
+    Returns:
+        pandas DataFrame
+    """
+    
+    require_pyarrow()
+    columns = select_columns(path, columns)
+    
+    if table_format(path) == "parquet":
+        table = pyarrow.parquet.read_table(path, columns=columns)
+    else:
+        table = pyarrow.feather.read_table(path, columns=columns, memory_map=True)
+    
+    return table.to_pandas().reset_index(drop=True)
+
+def iter_columnar(path, chunk_size, columns=None):
+    """ load a Parquet or Arrow file in chunks of rows
+    
+    Args:
+        path: path to Parquet or Arrow file
+        chunk_size: maximum number of rows per chunk
+        columns: list of columns to load, or None to load every column.
+    
+    Yields:
+        pandas DataFrames of consecutive rows, where each chunk's index
+        continues from the previous chunk.
+    """
+    
+    require_pyarrow()
+    columns = select_columns(path, columns)
+    
+    if table_format(path) == "parquet":
+        handle = pyarrow.parquet.ParquetFile(path)
+        batches = handle.iter_batches(batch_size=chunk_size, columns=columns)
+    else:
+        # Arrow files are memory mapped, so only the rows in each chunk are
+        # converted at a time
+        table = pyarrow.feather.read_table(path, columns=columns, memory_map=True)
+        batches = table.to_batches(max_chunksize=chunk_size)
+    
+    offset = 0
+    for batch in batches:
+        chunk = batch.to_pandas()
+        chunk.index = pandas.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+def write_columnar(table, path, compression=None):
+    """ write a pandas DataFrame to a Parquet or Arrow file
+    
+    Args:
+        table: pandas DataFrame. Categorical columns are stored dictionary
+            encoded, so they load as categoricals.
+        path: path to write to, the format is picked from the extension.
+        compression: compression codec, e.g. "zstd", "lz4", "snappy" (Parquet
+            only) or "uncompressed" (or "none"). Defaults to snappy for Parquet and lz4
+            for Arrow files.
+    """
+    
+    require_pyarrow()
+    table = pyarrow.Table.from_pandas(table, preserve_index=False)
+    
+    # Parquet and Arrow use different names for no compression
+    if compression in ["none", "uncompressed"]:
+        compression = "none" if table_format(path) == "parquet" else "uncompressed"
+    
+    kwargs = {}
+    if compression is not None:
+        kwargs["compression"] = compression
+    
+    if table_format(path) == "parquet":
+        pyarrow.parquet.write_table(table, path, **kwargs)
+    else:
+        pyarrow.feather.write_feather(table, path, **kwargs)
@@ -0,0 +1,161 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy
+import pandas
+
+MEMBERS = ["child", "father", "mother"]
+ALLELES = ["ref_F", "ref_R", "alt_F", "alt_R"]
+
+# DP4 counts are stored as 32-bit integers, which comfortably holds per-sample
+# read depths while halving the memory of the default 64-bit integers.
+DP4_DTYPE = numpy.int32
+DP4_PATTERN = r"\s*\d+\s*,\s*\d+\s*,\s*\d+\s*,\s*\d+\s*"
+
+def _count_bytes_per_entry(text, n_entries):
+    """ count commas and unexpected characters in each newline-separated entry
+    
+    Args:
+        text: bytes of newline-terminated entries
+        n_entries: number of entries expected in the text
+    
+    Returns:
+        tuple of arrays with the number of commas per entry, and the number of
+        characters other than digits, commas and spaces per entry, or None if
+        the text doesn't split into the expected number of entries.
+    """
+    
+    chars = numpy.frombuffer(text, dtype=numpy.uint8)
+    ends = numpy.flatnonzero(chars == ord("\n"))
+    if len(ends) != n_entries:
+        return None
+    
+    is_digit = (chars >= ord("0")) & (chars <= ord("9"))
+    is_comma = chars == ord(",")
+    is_other = ~(is_digit | is_comma | (chars == ord(" ")) | (chars == ord("\n")))
+    
+    commas = numpy.diff(numpy.cumsum(is_comma)[ends], prepend=0)
+    others = numpy.diff(numpy.cumsum(is_other)[ends], prepend=0)
+    
+    return commas, others
+
+def _parse_entries(strings):
+    """ convert DP4 strings with four comma-separated fields to counts
+    
+    Args:
+        strings: numpy array of DP4 strings, each with four fields
+    
+    Returns:
+        (n, 4) numpy array of counts
+    
+    Raises:
+        ValueError if any field isn't an integer, e.g. empty fields
+    """
+    
+    return numpy.loadtxt(strings, delimiter=",", dtype=DP4_DTYPE, comments=None,
+        ndmin=2)
+
+def parse_dp4_column(values):
+    """ parse a column of comma-separated DP4 strings into an array of counts
+    
+    Rather than splitting and converting each entry in python, the entries are
+    joined into a single string, checked with array operations on the raw
+    bytes, and converted together with numpy.loadtxt. Only if that fails (e.g.
+    empty fields) do we fall back to checking each entry against a pattern.
+    
+    Args:
+        values: list or pandas Series of DP4 strings e.g. "10,12,9,10"
+    
+    Returns:
+        tuple of (n, 4) numpy array of counts, and a boolean array indicating
+        which entries were valid. Invalid or missing entries have zero counts.
+    """
+    
+    values = pandas.Series(values, dtype=object).fillna("").astype(str)
+    
+    # python strings in a numpy array are much quicker to join than pandas
+    # string arrays, which box each value in turn
+    strings = values.to_numpy(dtype=object)
+    counts = numpy.zeros((len(strings), 4), dtype=DP4_DTYPE)
+    
+    text = ("\n".join(strings) + "\n").encode("utf8")
+    checked = _count_bytes_per_entry(text, len(strings))
+    if checked is not None:
+        commas, others = checked
+        valid = (commas == 3) & (others == 0)
+    else:
+        valid = values.str.fullmatch(DP4_PATTERN).to_numpy(dtype=bool)
+    
+    if not valid.any():
+        return counts, valid
+    
+    try:
+        counts[valid] = _parse_entries(strings[valid])
+    except ValueError:
+        # at least one entry has empty fields, so only parse the entries which
+        # are definitely well-formed
+        valid = valid & values.str.fullmatch(DP4_PATTERN).to_numpy(dtype=bool)
+        if valid.any():
+            counts[valid] = _parse_entries(strings[valid])
+    
+    return counts, valid
+
+def parse_dp4(de_novos):
+    """ parse the DP4 columns for all trio members into a single array
+    
+    Args:
+        de_novos: dataframe of de novo variants, with dp4_child, dp4_father and
+            dp4_mother columns.
+    
+    Returns:
+        tuple of (n_variants, 3, 4) numpy array of read counts, ordered by trio
+        member (child, father, mother) and then by ref_F, ref_R, alt_F, alt_R;
+        and a boolean array for whether every member had a valid DP4 entry.
+    """
+    
+    counts = numpy.zeros((len(de_novos), len(MEMBERS), len(ALLELES)), dtype=DP4_DTYPE)
+    valid = numpy.ones(len(de_novos), dtype=bool)
+    
+    for i, member in enumerate(MEMBERS):
+        counts[:, i, :], member_valid = parse_dp4_column(de_novos["dp4_{0}".format(member)])
+        valid &= member_valid
+    
+    return counts, valid
+
+def dp4_views(counts):
+    """ get the count for each trio member and allele as a named column
+    
+    The columns are views into the counts array, so no data is copied.
+    
+    Args:
+        counts: (n_variants, 3, 4) numpy array from parse_dp4()
+    
+    Returns:
+        dictionary of one dimensional arrays, indexed by column names such as
+        "child_ref_F" and "mother_alt_R".
+    """
+    
+    columns = {}
+    for i, member in enumerate(MEMBERS):
+        for j, allele in enumerate(ALLELES):
+            columns["{0}_{1}".format(member, allele)] = counts[:, i, j]
+    
+    return columns
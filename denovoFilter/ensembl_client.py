@@ -0,0 +1,362 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import threading
+import time
+
+try:
+    import http.client as httplib
+    from urllib.parse import urlsplit
+except ImportError:
+    import httplib
+    from urlparse import urlsplit
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+
+from denovoFilter.gene_index import build_gene_index, find_overlapping_genes
+
+SERVERS = {"grch37": "http://grch37.rest.ensembl.org",
+    "grch38": "http://rest.ensembl.org"}
+
+# size of the regions requested when prefetching genes
+TILE_SIZE = 1000000
+
+class TokenBucket(object):
+    """ rate limiter shared between threads
+    
+    Tokens are added at a steady rate, up to a maximum, and each request takes
+    a token, waiting if none are available. When the server asks us to back off,
+    all requests are held until the server is ready again.
+    """
+    
+    def __init__(self, rate=15, capacity=15):
+        """
+        Args:
+            rate: number of tokens added per second (Ensembl permits 15
+                requests per second).
+            capacity: maximum number of tokens available at once.
+        """
+        
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.time()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """ take a token, waiting until one is available
+        """
+        
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.capacity,
+                    self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            
+            time.sleep(wait)
+    
+    def pause(self, seconds):
+        """ hold all requests for a number of seconds
+        """
+        
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+            self.tokens = 0.0
+
+def retry_wait(headers):
+    """ find how long the server wants us to wait before retrying
+    
+    Args:
+        headers: dictionary of response headers, with lowercase keys
+    
+    Returns:
+        number of seconds to wait, or None if the server didn't say.
+    """
+    
+    if "retry-after" in headers:
+        return float(headers["retry-after"])
+    elif "x-ratelimit-reset" in headers:
+        return float(headers["x-ratelimit-reset"])
+    
+    return None
+
+def named_genes(genes):
+    """ get the genes with symbols, ordered by start position
+    
+    Ensembl returns null external names for some genes (e.g. novel genes), and
+    these shouldn't be used as symbols.
+    
+    Args:
+        genes: list of dictionaries for genes, as returned by Ensembl
+    
+    Returns:
+        list of the genes with symbols, sorted by start position, and otherwise
+        in the order given.
+    """
+    
+    genes = [ x for x in genes if x.get("external_name") ]
+    
+    return sorted(genes, key=lambda x: x["start"])
+
+class EnsemblClient(object):
+    """ concurrent client for the Ensembl REST API
+    
+    Requests run in a pool of worker threads. Each thread keeps its own
+    keep-alive connection to the server, and all threads share a token bucket,
+    to stay within the Ensembl rate limit.
+    """
+    
+    def __init__(self, build="grch37", server=None, workers=8, rate=15,
+            attempts=5, unavailable_wait=30, backoff=1, verbose=False):
+        """
+        Args:
+            build: whether to use the 'grch37' or 'grch38' build
+            server: base URL of the server, defaults to the Ensembl server for
+                the build.
+            workers: number of concurrent requests.
+            rate: maximum number of requests per second.
+            attempts: number of attempts for each request, before failing.
+            unavailable_wait: seconds to wait after the server is unavailable.
+            backoff: seconds to wait before retrying after a second connection
+                error, doubling for each later error. The first retry after a
+                connection error is immediate, since the server may just have
+                dropped an idle connection.
+            verbose: whether to print the requests as they are made.
+        """
+        
+        if server is None:
+            server = SERVERS[build]
+        
+        self.server = server
+        self.workers = workers
+        self.attempts = attempts
+        self.unavailable_wait = unavailable_wait
+        self.backoff = backoff
+        self.verbose = verbose
+        self.limiter = TokenBucket(rate, capacity=max(rate, 1))
+        self.local = threading.local()
+        self.connections = []
+        self.requests = 0
+        self.lock = threading.Lock()
+    
+    def connection(self, reconnect=False):
+        """ get the keep-alive connection for the current thread
+        """
+        
+        if reconnect and getattr(self.local, "connection", None) is not None:
+            self.local.connection.close()
+            self.local.connection = None
+        
+        if getattr(self.local, "connection", None) is None:
+            parts = urlsplit(self.server)
+            if parts.scheme == "https":
+                self.local.connection = httplib.HTTPSConnection(parts.netloc, timeout=60)
+            else:
+                self.local.connection = httplib.HTTPConnection(parts.netloc, timeout=60)
+            
+            with self.lock:
+                self.connections.append(self.local.connection)
+        
+        return self.local.connection
+    
+    def close(self):
+        """ close the connections opened by all the threads
+        """
+        
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+    
+    def get(self, ext):
+        """ request a REST endpoint, retrying if the server is busy
+        
+        Args:
+            ext: path of the endpoint, including any query string
+        
+        Returns:
+            the parsed JSON response
+        """
+        
+        path = urlsplit(self.server).path.rstrip("/") + "/" + ext.lstrip("/")
+        headers = {"Content-Type": "application/json"}
+        
+        for attempt in range(self.attempts):
+            self.limiter.acquire()
+            with self.lock:
+                self.requests += 1
+            
+            if self.verbose:
+                print(ext)
+            
+            try:
+                connection = self.connection(reconnect=attempt > 0)
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                status_code = response.status
+                text = response.read().decode("utf-8")
+                response_headers = dict((k.lower(), v) for k, v in response.getheaders())
+            except (httplib.HTTPException, IOError, OSError):
+                # the server may drop idle keep-alive connections, so reconnect
+                # at once, but back off if the connection errors continue
+                self.connection(reconnect=True)
+                if 0 < attempt < self.attempts - 1:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            
+            if status_code == 200:
+                return json.loads(text)
+            elif status_code == 429:
+                wait = retry_wait(response_headers)
+                self.limiter.pause(wait if wait is not None else 1)
+            elif status_code in [503, 504]:
+                time.sleep(self.unavailable_wait)
+            else:
+                raise ValueError('Invalid Ensembl response: {0}.\nSubmitted '
+                    'URL was: {1}{2}\nheaders: {3}\nresponse: {4}'.format(
+                        status_code, self.server, path, response_headers, text))
+        
+        raise ValueError("too many attempts, figure out why its failing")
+    
+    def get_genes(self, chrom, start_pos, end_pos):
+        """ get the genes overlapping a region
+        
+        Returns:
+            list of dictionaries for the genes overlapping the region, as
+            returned by Ensembl (with id, start, end and external_name keys).
+        """
+        
+        ext = "overlap/region/human/{0}:{1}-{2}?feature=gene".format(chrom,
+            start_pos, end_pos)
+        
+        return self.get(ext)
+    
+    def get_gene_id(self, chrom, start_pos, end_pos):
+        """ find the HGNC symbol overlapping a region
+        
+        Returns:
+            the symbol of the first gene with a symbol overlapping the region,
+            by start position, or a blank string if no such gene overlaps.
+        """
+        
+        genes = named_genes(self.get_genes(chrom, start_pos, end_pos))
+        if len(genes) > 0:
+            return genes[0]["external_name"]
+        
+        return ""
+    
+    def map(self, func, regions):
+        """ run a function on each distinct region concurrently
+        
+        Args:
+            func: function taking chrom, start and end arguments
+            regions: list of (chrom, start, end) tuples
+        
+        Returns:
+            list of results, in the same order as the regions.
+        """
+        
+        regions = [ (str(chrom), int(start), int(end)) for chrom, start, end in regions ]
+        unique = sorted(set(regions))
+        
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            found = list(pool.map(lambda x: func(*x), unique))
+        finally:
+            pool.shutdown(wait=True)
+        
+        found = dict(zip(unique, found))
+        
+        return [ found[x] for x in regions ]
+    
+    def get_gene_ids(self, regions):
+        """ find the HGNC symbols for many regions concurrently
+        
+        Each distinct region is only requested once.
+        
+        Args:
+            regions: list of (chrom, start, end) tuples
+        
+        Returns:
+            list of HGNC symbols, in the same order as the regions.
+        """
+        
+        return self.map(self.get_gene_id, regions)
+    
+    def prefetch_gene_ids(self, regions, tile_size=TILE_SIZE):
+        """ find the HGNC symbols for many regions, from the genes around them
+        
+        Rather than requesting each region, the genome is split into tiles, and
+        we request all the genes once per tile containing any region. Regions
+        are then matched to the first gene with a symbol overlapping them, by
+        start position, as for get_gene_id().
+        
+        Args:
+            regions: list of (chrom, start, end) tuples
+            tile_size: size of the tiles to request. Ensembl won't return
+                regions longer than 5 Mb.
+        
+        Returns:
+            list of HGNC symbols, in the same order as the regions.
+        """
+        
+        tiles = set()
+        for chrom, start, end in regions:
+            for tile in range((int(start) - 1) // tile_size, (int(end) - 1) // tile_size + 1):
+                tiles.add((str(chrom), tile * tile_size + 1, (tile + 1) * tile_size))
+        
+        tiles = sorted(tiles)
+        features = self.map(self.get_genes, tiles)
+        
+        # genes spanning tile boundaries are returned for each tile, but only
+        # need including once
+        genes = {}
+        for (chrom, start, end), tile_genes in zip(tiles, features):
+            for gene in named_genes(tile_genes):
+                key = (chrom, gene.get("id"), gene["start"], gene["end"])
+                if key not in genes:
+                    genes[key] = (chrom, gene["start"], gene["end"],
+                        gene["external_name"])
+        
+        # the overlap lookups need the genes ordered by start position
+        genes = pandas.DataFrame(list(genes.values()),
+            columns=["chrom", "start", "end", "symbol"])
+        genes = genes.sort_values(["chrom", "start"], kind="stable")
+        index = build_gene_index(genes)
+        
+        chroms, starts, ends = zip(*regions) if len(regions) > 0 else ([], [], [])
+        symbols = find_overlapping_genes(index, pandas.Series(chroms, dtype=object),
+            starts, ends)
+        
+        return list(symbols)
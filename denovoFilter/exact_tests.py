@@ -0,0 +1,182 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import division
+
+import numpy
+from scipy.stats import binom, hypergeom
+
+def bisect_last(condition, lo, hi):
+    """ find the last value in a range where a monotone condition holds
+    
+    This runs a binary search for many ranges at once. The condition must be
+    True from the start of each range up to some point, and False afterwards.
+    
+    Args:
+        condition: function which takes an array of values, and the positions
+            of the ranges they are for, and returns a boolean array for whether
+            the condition holds for each value.
+        lo: numpy array of range starts, where the condition is assumed to hold
+        hi: numpy array of range ends
+    
+    Returns:
+        numpy array of the largest value within each range where the condition
+        holds.
+    """
+    
+    lo = numpy.array(lo, dtype=numpy.int64)
+    hi = numpy.array(hi, dtype=numpy.int64)
+    
+    # only evaluate the ranges which haven't converged yet
+    active = numpy.flatnonzero(lo < hi)
+    while len(active) > 0:
+        mid = lo[active] + (hi[active] - lo[active] + 1) // 2
+        holds = condition(mid, active)
+        lo[active[holds]] = mid[holds]
+        hi[active[~holds]] = mid[~holds] - 1
+        active = active[lo[active] < hi[active]]
+    
+    return lo
+
+def fisher_exact(ref_F, ref_R, alt_F, alt_R):
+    """ two-sided fisher exact tests for many 2x2 tables at once
+    
+    This follows the approach of scipy.stats.fisher_exact, which sums the
+    probabilities of the tables at least as extreme as the observed table, but
+    evaluates all the tables together rather than one at a time. Tables which
+    can't be tested (e.g. with negative counts) get a p-value of 1.0.
+    
+    Args:
+        ref_F: array of forward REF counts, i.e. the top left of each table
+        ref_R: array of reverse REF counts, i.e. the top right of each table
+        alt_F: array of forward ALT counts, i.e. the bottom left of each table
+        alt_R: array of reverse ALT counts, i.e. the bottom right of each table
+    
+    Returns:
+        numpy array of p-values
+    """
+    
+    a, b, c, d = [ numpy.asarray(x, dtype=numpy.int64) for x in (ref_F, ref_R, alt_F, alt_R) ]
+    
+    invalid = (a < 0) | (b < 0) | (c < 0) | (d < 0)
+    
+    # tables where a row or column sums to zero have a p-value of 1.0
+    empty = invalid | (a + b == 0) | (c + d == 0) | (a + c == 0) | (b + d == 0)
+    
+    # avoid evaluating distributions for tables we won't test
+    a, b, c, d = [ numpy.where(empty, 1, x) for x in (a, b, c, d) ]
+    n1 = a + b
+    n2 = c + d
+    n = a + c
+    total = n1 + n2
+    
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        mode = ((n + 1) * (n1 + 1) // (total + 2)).astype(numpy.int64)
+        pexact = hypergeom.pmf(a, total, n1, n)
+        pmode = hypergeom.pmf(mode, total, n1, n)
+        
+        epsilon = 1e-14
+        gamma = 1 + epsilon
+        is_mode = numpy.abs(pexact - pmode) / numpy.maximum(pexact, pmode) <= epsilon
+    
+    lower = a < mode
+    
+    # the tail on the same side of the mode as the observed table
+    plower = hypergeom.cdf(a, total, n1, n)
+    pupper = hypergeom.sf(a - 1, total, n1, n)
+    
+    # check if the far end of the other tail is already more likely than the
+    # observed table, in which case the p-value is only from one tail
+    one_tail = numpy.where(lower, hypergeom.pmf(n, total, n1, n),
+        hypergeom.pmf(0, total, n1, n)) > pexact * gamma
+    
+    # find where the other tail becomes less likely than the observed table. For
+    # tables below the mode, we search upwards from the mode, otherwise we
+    # search from zero up to the mode.
+    def condition(x, i):
+        pmf = hypergeom.pmf(x, total[i], n1[i], n[i])
+        cutoff = pexact[i] * gamma
+        return numpy.where(lower[i], pmf >= cutoff, pmf <= cutoff)
+    
+    guess = bisect_last(condition, numpy.where(lower, mode, 0),
+        numpy.where(lower, n, mode))
+    
+    pvalue = numpy.where(lower, plower + hypergeom.sf(guess, total, n1, n),
+        pupper + hypergeom.cdf(guess, total, n1, n))
+    pvalue = numpy.where(one_tail, numpy.where(lower, plower, pupper), pvalue)
+    pvalue = numpy.where(is_mode | empty, 1.0, pvalue)
+    
+    # tables that can't be evaluated get a p-value of 1.0, as per
+    # site_strand_bias()
+    pvalue = numpy.where(numpy.isnan(pvalue), 1.0, pvalue)
+    
+    return numpy.minimum(pvalue, 1.0)
+
+def binom_test(alt, ref, p):
+    """ two-sided binomial tests for many pairs of ALT and REF counts at once
+    
+    This follows the approach of scipy.stats.binom_test, which sums the
+    probabilities of the counts at least as extreme as the observed count.
+    Identical pairs of counts are only evaluated once.
+    
+    Args:
+        alt: array of ALT counts (i.e. the successes)
+        ref: array of REF counts (i.e. the failures)
+        p: hypothesised probability of an ALT read, e.g. the error rate
+    
+    Returns:
+        numpy array of p-values. Pairs without any reads get a p-value of 1.0.
+    """
+    
+    alt = numpy.asarray(alt, dtype=numpy.int64)
+    ref = numpy.asarray(ref, dtype=numpy.int64)
+    
+    if len(alt) == 0:
+        return numpy.zeros(0, dtype=numpy.float64)
+    
+    pairs, inverse = numpy.unique(numpy.column_stack([alt, alt + ref]), axis=0,
+        return_inverse=True)
+    k, n = pairs[:, 0], pairs[:, 1]
+    
+    expected = p * n
+    lower = k < expected
+    
+    rerr = 1 + 1e-7
+    cutoff = binom.pmf(k, n, p) * rerr
+    
+    # find where the opposite tail becomes less likely than the observed count.
+    # The distribution decreases above the expected count, and increases below
+    # it, so we search upwards from the expected count for counts below it,
+    # and upwards from zero for counts above it.
+    def condition(x, i):
+        pmf = binom.pmf(x, n[i], p)
+        return numpy.where(lower[i], pmf > cutoff[i], pmf <= cutoff[i])
+    
+    edge = bisect_last(condition,
+        numpy.where(lower, numpy.ceil(expected) - 1, -1),
+        numpy.where(lower, n, numpy.floor(expected)))
+    
+    pvalue = numpy.where(lower, binom.cdf(k, n, p) + binom.sf(edge, n, p),
+        binom.cdf(edge, n, p) + binom.sf(k - 1, n, p))
+    pvalue = numpy.where((k == expected) | (n == 0), 1.0, pvalue)
+    pvalue = numpy.minimum(pvalue, 1.0)
+    
+    return pvalue[inverse.ravel()]
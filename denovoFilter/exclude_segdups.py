@@ -19,37 +19,238 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import hashlib
+import os
+import tempfile
+
 from pkg_resources import resource_filename
-import gzip
 
-from intervaltree import IntervalTree
+import numpy
+import pandas
+
+from denovoFilter.cache import get_cache_dir
+
+# the segdup regions, loaded on first use, and shared for the whole process
+SEGDUPS = None
+
+def merge_regions(starts, ends):
+    """ merge overlapping regions into sorted, non-overlapping regions
+    
+    Args:
+        starts: numpy array of region start positions
+        ends: numpy array of region end positions (exclusive)
+    
+    Returns:
+        tuple of sorted numpy arrays of start and end positions, where none of
+        the regions overlap or touch.
+    """
+    
+    order = numpy.argsort(starts, kind="stable")
+    starts = starts[order]
+    ends = ends[order]
+    
+    if len(starts) == 0:
+        return starts, ends
+    
+    # a region starts a new merged region if it begins after the furthest end
+    # of all the regions before it
+    furthest = numpy.maximum.accumulate(ends)
+    first = numpy.flatnonzero(numpy.concatenate([[True], starts[1:] > furthest[:-1]]))
+    
+    return starts[first], numpy.maximum.reduceat(ends, first)
+
+def read_segdup_regions(path):
+    """ read segdup regions from the text table of regions
+    
+    Args:
+        path: path to gzipped table of regions, with chrom, chromStart and
+            chromEnd columns.
+    
+    Returns:
+        dictionary of (starts, ends) tuples of sorted, merged segdup regions per
+        chromosome. Ends are exclusive.
+    """
+    
+    regions = pandas.read_table(path, compression="gzip",
+        dtype={"chrom": str, "chromStart": numpy.int64, "chromEnd": numpy.int64})
+    regions["chrom"] = regions["chrom"].str.strip("chr")
+    
+    segdups = {}
+    for chrom, group in regions.groupby("chrom", sort=False):
+        segdups[chrom] = merge_regions(group["chromStart"].to_numpy(),
+            group["chromEnd"].to_numpy() + 1)
+    
+    return segdups
+
+def file_checksum(path):
+    """ get the SHA-256 checksum of a file
+    """
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    
+    return digest.hexdigest()
+
+def save_segdups(segdups, checksum, destination):
+    """ save segdup regions to a compact binary file
+    
+    The file is written to a temporary file, then moved into place, so that
+    other processes never see a partially written file.
+    
+    Args:
+        segdups: dictionary of (starts, ends) tuples per chromosome
+        checksum: checksum of the table the regions were read from
+        destination: path to write the .npz file to
+    """
+    
+    arrays = {"source_sha256": numpy.array(checksum)}
+    for chrom, (starts, ends) in segdups.items():
+        arrays["starts_{0}".format(chrom)] = starts.astype(numpy.int32)
+        arrays["ends_{0}".format(chrom)] = ends.astype(numpy.int32)
+    
+    folder = os.path.dirname(os.path.abspath(destination))
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    
+    handle, temp_path = tempfile.mkstemp(dir=folder, suffix=".npz.tmp")
+    with os.fdopen(handle, "wb") as output:
+        numpy.savez(output, **arrays)
+    os.replace(temp_path, destination)
+
+def compile_segdups(source=None, destination=None):
+    """ convert the table of segdup regions into a compact binary file
+    
+    The merged regions are stored as int32 arrays of starts and ends for each
+    chromosome, in an uncompressed .npz file, so they can be loaded without
+    parsing any text. The checksum of the table is stored alongside, so the
+    file is only used while the table is unchanged.
+    
+    Args:
+        source: path to the table of regions. Defaults to the bundled regions.
+        destination: path to write the .npz file to. Defaults to
+            segdup_regions.npz in the cache directory.
+    """
+    
+    if source is None:
+        source = resource_filename(__name__, "data/segdup_regions.gz")
+    if destination is None:
+        destination = os.path.join(get_cache_dir(), "segdup_regions.npz")
+    
+    save_segdups(read_segdup_regions(source), file_checksum(source), destination)
+
+def read_compiled_segdups(path, checksum):
+    """ read segdup regions from a compiled binary file
+    
+    Args:
+        path: path to .npz file, from compile_segdups()
+        checksum: checksum of the current table of regions
+    
+    Returns:
+        dictionary of (starts, ends) tuples per chromosome, or None if the file
+        is missing, can't be read, or was compiled from a different table.
+    """
+    
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        with numpy.load(path) as data:
+            if "source_sha256" not in data.files or \
+                    str(data["source_sha256"]) != checksum:
+                return None
+            
+            segdups = {}
+            for key in data.files:
+                if not key.startswith("starts_"):
+                    continue
+                chrom = key[len("starts_"):]
+                segdups[chrom] = (data[key], data["ends_{0}".format(chrom)])
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+    
+    return segdups
 
 def load_segdups():
     """ load all the segdup regions
     
+    The regions are loaded on first use, and then reused for the rest of the
+    process. They are loaded from the compiled binary file bundled with the
+    package, or else one compiled in the cache directory, as long as it was
+    compiled from the current table of regions. Otherwise the table is parsed,
+    and compiled into the cache directory for later runs. The arrays are
+    read-only, so forked worker processes can share the same copy.
+    
     Returns:
-        dictionary of IntervalTree based segdup regions per chromosome
+        dictionary of (starts, ends) tuples of sorted, merged segdup regions per
+        chromosome. Ends are exclusive.
     """
     
-    segdup_path = resource_filename(__name__, "data/segdup_regions.gz")
+    global SEGDUPS
     
-    segdups = {}
-    with gzip.open(segdup_path, "rt") as handle:
+    if SEGDUPS is not None:
+        return SEGDUPS
+    
+    source = resource_filename(__name__, "data/segdup_regions.gz")
+    checksum = file_checksum(source)
+    
+    segdups = None
+    for path in [resource_filename(__name__, "data/segdup_regions.npz"),
+            os.path.join(get_cache_dir(), "segdup_regions.npz")]:
+        segdups = read_compiled_segdups(path, checksum)
+        if segdups is not None:
+            break
+    
+    if segdups is None:
+        segdups = read_segdup_regions(source)
+        try:
+            save_segdups(segdups, checksum,
+                os.path.join(get_cache_dir(), "segdup_regions.npz"))
+        except (IOError, OSError):
+            # the cache directory might not be writable
+            pass
+    
+    for starts, ends in segdups.values():
+        starts.flags.writeable = False
+        ends.flags.writeable = False
+    
+    SEGDUPS = segdups
+    
+    return SEGDUPS
+
+def in_regions(regions, chroms, positions):
+    """ check if positions fall within any of a set of regions
+    
+    Args:
+        regions: dictionary of (starts, ends) tuples of sorted, non-overlapping
+            regions per chromosome, e.g. from load_segdups()
+        chroms: pandas Series of chromosomes
+        positions: pandas Series of nucleotide positions
+    
+    Returns:
+        numpy array of booleans for whether each position is within a region.
+        Positions on chromosomes without any regions are never within one.
+    """
+    
+    chroms = chroms.astype(str).to_numpy()
+    positions = numpy.asarray(positions, dtype=numpy.int64)
+    
+    inside = numpy.zeros(len(positions), dtype=bool)
+    for chrom in pandas.unique(chroms):
+        if chrom not in regions:
+            continue
         
-        header = handle.readline()
+        starts, ends = regions[chrom]
+        rows = numpy.flatnonzero(chroms == chrom)
+        pos = positions[rows]
         
-        for line in handle:
-            line = line.strip().split("\t")
-            chrom = line[0].strip("chr")
-            start = int(line[1])
-            end = int(line[2]) + 1
-            
-            if chrom not in segdups:
-                segdups[chrom] = IntervalTree()
-            
-            segdups[chrom].addi(start, end)
+        # find the last region starting at or before each position, then check
+        # if the position is before the end of that region
+        idx = numpy.searchsorted(starts, pos, side="right") - 1
+        inside[rows] = (idx >= 0) & (pos < ends[numpy.maximum(idx, 0)])
     
-    return segdups
+    return inside
 
 def check_segdups(de_novos):
     """ identifies de novo calls within segmental duplications.
@@ -63,14 +264,8 @@ def check_segdups(de_novos):
     
     segdups = load_segdups()
     
-    # check if each candidate is not in a segdup region. This uses an interval
-    # tree for efficient searching.
-    statuses = []
-    for i, row in de_novos.iterrows():
-        chrom = row["chrom"]
-        pos = row["pos"]
-        
-        status = len(segdups[chrom].search(pos)) == 0
-        statuses.append(status)
+    # check if each candidate is not in a segdup region. This uses a binary
+    # search of the sorted regions on each chromosome for efficient searching.
+    inside = in_regions(segdups, de_novos["chrom"], de_novos["pos"])
     
-    return statuses
+    return (~inside).tolist()
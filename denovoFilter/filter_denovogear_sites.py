@@ -19,15 +19,33 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import numpy
 import pandas
 
-from denovoFilter.allele_counts import extract_alt_and_ref_counts, \
-    get_recurrent_genes
+from denovoFilter.allele_counts import get_recurrent_genes
+from denovoFilter.trio_counts import TrioCounts
 from denovoFilter.site_deviations import test_sites, test_genes
-from denovoFilter.min_depth import min_depth
+from denovoFilter.min_depth import min_depth_thresholds
 from denovoFilter.constants import P_CUTOFF, ERROR_RATE
 
-def filter_denovogear_sites(de_novos, status):
+def has_good_depth(counts):
+    """ check for good sample depths (different threshold for child and
+    parents) and sufficient alts in the child. Candidates with missing or
+    malformed DP4 entries fail.
+    
+    Args:
+        counts: TrioCounts object for the de novos
+    
+    Returns:
+        numpy boolean array
+    """
+    
+    return counts.valid & (counts.alts('child') > 1) & \
+        (counts.depth('child') > 7) & (counts.depth('father') > 5) & \
+        (counts.depth('mother') > 5)
+
+def filter_denovogear_sites(de_novos, status, counts=None, deviations=None,
+        symbol_counts=None):
     """ set flags for filtering, fail samples with strand bias < threshold, or any 2 of
      (i) both parents have ALTs
      (ii) site-specific parental alts < threshold,
@@ -36,28 +54,37 @@ def filter_denovogear_sites(de_novos, status):
     Args:
         de_novos: dataframe of de novo variants
         status: list (or pandas Series) or boolea
+        counts: TrioCounts object for the de novos, to share read counts with
+            other filtering stages. This is constructed from the DP4 columns if
+            not provided.
+        deviations: DeviationCounts object, with counts for every site and gene
+            in the dataset. This is needed when de_novos is only one chunk of
+            the dataset, otherwise the sites and genes are tested using the
+            candidates in de_novos.
+        symbol_counts: pandas Series of counts per HGNC symbol, for candidates
+            which were excluded while loading. These still count towards
+            whether a gene is recurrent.
     
     Returns:
         vector of true/false for whether each variant passes the filters
     """
     
-    counts = extract_alt_and_ref_counts(de_novos)
-    recurrent = get_recurrent_genes(de_novos)
-    
-    counts['child_alts'] = counts[['child_alt_F', 'child_alt_R']].sum(axis=1)
-    counts['child_depth'] = counts[['child_ref_F', 'child_ref_R', 'child_alt_F', 'child_alt_R']].sum(axis=1)
-    counts['dad_depth'] = counts[['father_ref_F', 'father_ref_R', 'father_alt_F', 'father_alt_R']].sum(axis=1)
-    counts['mom_depth'] = counts[['mother_ref_F', 'mother_ref_R', 'mother_alt_F', 'mother_alt_R']].sum(axis=1)
+    if counts is None:
+        counts = TrioCounts.from_dp4(de_novos)
     
-    # only include sites with good sample depths (different threshold for child
-    # and parents) and sufficient alts in the child
-    good_depth = (counts['child_alts'] > 1) & (counts['child_depth'] > 7) & \
-        (counts['dad_depth'] > 5)  &(counts['mom_depth'] > 5)
-    status &= good_depth
+    # only include sites with good sample depths
+    good_depth = has_good_depth(counts)
+    status = numpy.asarray(status, dtype=bool) & good_depth
     
     # check if sites deviate from expected strand bias and parental alt depths
-    strand_bias, parental_site_bias = test_sites(counts, status)
-    parental_gene_bias = test_genes(counts, strand_bias, status)
+    if deviations is None:
+        recurrent = get_recurrent_genes(de_novos, symbol_counts)
+        strand_bias, parental_site_bias = test_sites(de_novos, status, counts)
+        parental_gene_bias = test_genes(de_novos, strand_bias, status, counts)
+    else:
+        recurrent = deviations.recurrent_genes()
+        strand_bias, parental_site_bias = deviations.test_sites(de_novos)
+        parental_gene_bias = deviations.test_genes(de_novos)
     
     # fail SNVs with excessive strand bias. Don't check strand bias in indels.
     overall_pass = (strand_bias >= P_CUTOFF) | (de_novos["ref"].str.len() != 1) | \
@@ -68,9 +95,11 @@ def filter_denovogear_sites(de_novos, status):
     gene_fail = (parental_gene_bias < P_CUTOFF) & de_novos["symbol"].isin(recurrent)
     site_fail = (parental_site_bias < P_CUTOFF)
     
-    counts['parental_depth_threshold'] = counts[['dad_depth', 'mom_depth']].apply(min_depth, error=ERROR_RATE, axis=1)
+    thresholds = min_depth_thresholds(counts.depth('father'),
+        counts.depth('mother'), error=ERROR_RATE)
     
-    excess_alts = counts["min_parent_alt"] > counts['parental_depth_threshold']
+    excess_alts = pandas.Series(counts.min_parent_alt > thresholds,
+        index=de_novos.index)
     
     # exclude sites that fail two of three classes
     sites = pandas.DataFrame({"gene": gene_fail, "site": site_fail, "alts": excess_alts})
@@ -0,0 +1,181 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy
+import pandas
+
+# gene indexes are cached by genome build and annotation path
+GENE_INDEXES = {}
+
+GTF_COLUMNS = ["chrom", "source", "feature", "start", "end", "score", "strand",
+    "frame", "attributes"]
+
+def annotation_format(path):
+    """ identify the format of a gene annotation file from its extension
+    
+    Args:
+        path: path to GTF, GFF3 or BED file, optionally gzipped
+    
+    Returns:
+        one of "gtf", "gff" or "bed"
+    """
+    
+    name = path.lower()
+    for suffix in [".gz", ".bgz"]:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    
+    for extension, format in [(".gtf", "gtf"), (".gff3", "gff"), (".gff", "gff"),
+            (".bed", "bed")]:
+        if name.endswith(extension):
+            return format
+    
+    raise ValueError("unknown gene annotation format: {0}".format(path))
+
+def read_gene_annotations(path):
+    """ load the genes from a GTF, GFF3 or BED file
+    
+    For GTF files, we use gene features and their gene_name attribute. For GFF3
+    files, we use features whose type ends in "gene" (e.g. "gene", "ncRNA_gene")
+    and their Name attribute. For BED files, we use every region, and the name
+    column.
+    
+    Args:
+        path: path to gene annotations, optionally gzipped
+    
+    Returns:
+        pandas DataFrame of genes, with chrom, start, end (1-based, inclusive)
+        and symbol columns. Genes lacking a name have blank symbols.
+    """
+    
+    format = annotation_format(path)
+    
+    if format == "bed":
+        genes = pandas.read_table(path, header=None, usecols=[0, 1, 2, 3],
+            names=["chrom", "start", "end", "symbol"], comment="#",
+            dtype={"chrom": str, "symbol": str}, compression="infer")
+        genes = genes[pandas.to_numeric(genes["start"], errors="coerce").notnull()].copy()
+        genes["start"] = genes["start"].astype(numpy.int64) + 1
+    else:
+        genes = pandas.read_table(path, header=None, names=GTF_COLUMNS,
+            comment="#", dtype={"chrom": str}, compression="infer")
+        
+        if format == "gtf":
+            genes = genes[genes["feature"] == "gene"].copy()
+            pattern = r'gene_name "([^"]*)"'
+        else:
+            genes = genes[genes["feature"].str.endswith("gene")].copy()
+            pattern = r"Name=([^;]*)"
+        
+        genes["symbol"] = genes["attributes"].str.extract(pattern, expand=False)
+    
+    genes["chrom"] = genes["chrom"].str.replace("^chr", "", regex=True)
+    genes["symbol"] = genes["symbol"].fillna("")
+    
+    return genes[["chrom", "start", "end", "symbol"]].astype({"start": numpy.int64,
+        "end": numpy.int64}).reset_index(drop=True)
+
+def build_gene_index(genes):
+    """ construct a per-chromosome interval index of genes
+    
+    Genes are sorted by start position. Alongside this, we keep the furthest end
+    position of each gene and all the genes before it, which lets us find the
+    first overlapping gene with binary searches. Genes without symbols are
+    left out, as they are for genes from Ensembl, so a gene lacking a name
+    can't hide a named gene overlapping the same position.
+    
+    Args:
+        genes: pandas DataFrame with chrom, start, end and symbol columns.
+    
+    Returns:
+        dictionary of (starts, furthest_ends, symbols) tuples per chromosome.
+    """
+    
+    genes = genes[genes["symbol"] != ""]
+    
+    index = {}
+    for chrom, rows in genes.groupby("chrom", sort=False).indices.items():
+        group = genes.iloc[rows]
+        order = numpy.argsort(group["start"].to_numpy(), kind="stable")
+        
+        starts = group["start"].to_numpy()[order]
+        ends = group["end"].to_numpy()[order]
+        symbols = group["symbol"].to_numpy(dtype=object)[order]
+        
+        index[chrom] = (starts, numpy.maximum.accumulate(ends), symbols)
+    
+    return index
+
+def get_gene_index(path, build="grch37"):
+    """ get the gene index for an annotation file, loading it on first use
+    
+    Args:
+        path: path to GTF, GFF3 or BED file of genes
+        build: genome build of the annotations
+    
+    Returns:
+        dictionary of gene indexes per chromosome, see build_gene_index()
+    """
+    
+    key = (build, path)
+    if key not in GENE_INDEXES:
+        GENE_INDEXES[key] = build_gene_index(read_gene_annotations(path))
+    
+    return GENE_INDEXES[key]
+
+def find_overlapping_genes(index, chroms, starts, ends):
+    """ find the first gene overlapping each of many regions
+    
+    This matches the Ensembl REST overlap/region endpoint, where we take the
+    first of the overlapping genes with symbols, ordered by start position.
+    
+    Args:
+        index: dictionary of gene indexes per chromosome, from build_gene_index()
+        chroms: pandas Series of chromosomes
+        starts: pandas Series of region start positions
+        ends: pandas Series of region end positions (inclusive)
+    
+    Returns:
+        numpy array of gene symbols, blank where no gene overlaps the region.
+    """
+    
+    chroms = chroms.astype(str).str.replace("^chr", "", regex=True).to_numpy()
+    starts = numpy.asarray(starts, dtype=numpy.int64)
+    ends = numpy.asarray(ends, dtype=numpy.int64)
+    
+    symbols = numpy.full(len(chroms), "", dtype=object)
+    for chrom in pandas.unique(chroms):
+        if chrom not in index:
+            continue
+        
+        gene_starts, furthest_ends, gene_symbols = index[chrom]
+        rows = numpy.flatnonzero(chroms == chrom)
+        
+        # the first gene ending at or after the region start is the first which
+        # can overlap the region. It does overlap, if it also starts at or
+        # before the region end.
+        first = numpy.searchsorted(furthest_ends, starts[rows], side="left")
+        n_before_end = numpy.searchsorted(gene_starts, ends[rows], side="right")
+        
+        overlaps = first < n_before_end
+        symbols[rows[overlaps]] = gene_symbols[first[overlaps]]
+    
+    return symbols
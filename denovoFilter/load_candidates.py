@@ -19,28 +19,355 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import gzip
+import io
+import itertools
+
+import numpy
 import pandas
 
-def load_candidates(candidates_path):
-    """ load the candidate dataset
+from denovoFilter.most_severe import to_categorical
+from denovoFilter.columnar import table_format, read_columnar, iter_columnar, \
+    write_columnar
+from denovoFilter.regions import index_path, fetch_regions, in_regions, \
+    build_region_index
+from denovoFilter.vcf_candidates import iter_vcf_candidates
+
+# default number of candidates per chunk, when streaming the candidates
+CHUNK_SIZE = 100000
+
+# declared types of the candidate columns, as loaded. Columns with repeated
+# values are categorical, and integer columns use the narrowest suitable type.
+# Floats keep double precision, so they are written out as they were read.
+SCHEMA = {"person_stable_id": "category", "chrom": "category",
+    "pos": numpy.int32, "ref": str, "alt": str, "symbol": "category",
+    "consequence": "category", "max_af": str, "pp_dnm": numpy.float64,
+    "dp4_child": str, "dp4_father": str, "dp4_mother": str,
+    "in_child_vcf": numpy.int8, "in_father_vcf": numpy.int8,
+    "in_mother_vcf": numpy.int8}
+
+# columns used by the filtering, any others are skipped when loading
+REQUIRED_COLUMNS = ["person_stable_id", "chrom", "pos", "ref", "alt", "symbol",
+    "consequence", "max_af", "pp_dnm", "dp4_child", "dp4_father", "dp4_mother",
+    "in_child_vcf", "in_father_vcf", "in_mother_vcf"]
+
+# values used for missing allele frequencies and probabilities
+MISSING_VALUES = ["", ".", "missing", "nan", "None", "NA"]
+
+def read_candidates(candidates_path, columns=None, **kwargs):
+    """ read a tab-separated table of candidates, with the declared column types
+    
+    Only the max_af and pp_dnm columns can have missing values, other columns
+    keep blank values as blank strings (e.g. for candidates lacking symbols).
     
     Args:
         candidates_path: path to candidate DNMs
+        columns: list of columns to load, or None to load every column.
+            Columns missing from the file are skipped.
+        kwargs: other arguments for pandas.read_table, e.g. chunksize
+    """
+    
+    usecols = None
+    if columns is not None:
+        columns = set(columns)
+        usecols = lambda x: x in columns
+    
+    return pandas.read_table(candidates_path, dtype=SCHEMA, keep_default_na=False,
+        na_values={"max_af": MISSING_VALUES, "pp_dnm": MISSING_VALUES},
+        usecols=usecols, **kwargs)
+
+def apply_schema(candidates):
+    """ convert columns loaded from Parquet or Arrow files to the declared types
+    
+    Columnar files keep the types they were written with, which can differ from
+    the declared types when written by other tools, e.g. with integer
+    chromosomes, or null rather than blank symbols.
+    
+    Args:
+        candidates: pandas DataFrame of candidates
     
     Returns:
-        pandas dataframe of candidate de novo sites
+        pandas DataFrame, with blank values for missing text, as when loading
+        from text.
     """
     
-    candidates = pandas.read_table(candidates_path, na_filter=False)
-    candidates['chrom'] = candidates['chrom'].astype(str)
-    candidates['pos'] = candidates['pos'].astype(int)
+    for column, dtype in SCHEMA.items():
+        if column not in candidates.columns or column == 'max_af':
+            continue
+        
+        values = candidates[column]
+        if dtype == "category":
+            if values.dtype.name != "category":
+                values = values.fillna('').astype(str).astype("category")
+            elif values.isnull().any():
+                if '' not in values.cat.categories:
+                    values = values.cat.add_categories([''])
+                values = values.fillna('')
+        elif dtype is str:
+            values = values.fillna('').astype(str)
+        else:
+            values = values.astype(dtype)
+        
+        candidates[column] = values
+    
+    return candidates
+
+def parse_floats(values):
+    """ convert a column of text to floats, with NaN for missing values
+    
+    Some entries have comma-separated lists of values. We select the first
+    value (for max_af, this corresponds to the alternate allele, the additional
+    alleles are from denovogear selecting all possible alternates at a
+    candidate de novo site).
+    
+    Args:
+        values: pandas Series of text values, with missing values as NaN
+    
+    Returns:
+        pandas Series of float64 values
+    """
+    
+    numbers = pandas.to_numeric(values, errors="coerce")
+    
+    # only entries which aren't plain numbers need splitting
+    lists = numbers.isnull() & values.notnull()
+    if lists.any():
+        first = values[lists].astype(str).str.partition(",")[0]
+        numbers[lists] = pandas.to_numeric(first.where(~first.isin(MISSING_VALUES)))
+    
+    return numbers.astype(numpy.float64)
+
+def prepare_candidates(candidates):
+    """ convert the columns of a table of candidates to the declared types
+    """
+    
+    candidates['pos'] = candidates['pos'].astype(numpy.int32)
+    candidates['consequence'] = to_categorical(candidates['consequence'])
+    candidates['max_af'] = parse_floats(candidates['max_af'])
     
     # the missing indels don't have some columns that are present in the
     # denovogear input, use mock columns so that later processing works smoothly.
     if 'in_child_vcf' not in candidates.columns:
-        candidates["in_child_vcf"] = 1
-        candidates["in_mother_vcf"] = 0
-        candidates["in_father_vcf"] = 0
-        candidates["pp_dnm"] = None
+        candidates["in_child_vcf"] = numpy.int8(1)
+        candidates["in_mother_vcf"] = numpy.int8(0)
+        candidates["in_father_vcf"] = numpy.int8(0)
+        candidates["pp_dnm"] = numpy.float64("nan")
+    
+    return candidates
+
+def load_candidates(candidates_path, columns=None, predicate=None,
+        chunk_size=CHUNK_SIZE, regions=None, dropped=None):
+    """ load the candidate dataset
+    
+    Args:
+        candidates_path: path to candidate DNMs, either as tab-separated text,
+            or as Parquet (.parquet or .pq) or Arrow IPC (.arrow, .feather or
+            .ipc) files, which skip parsing, or as a trio VCF (.vcf or .vcf.gz),
+            see iter_vcf_records().
+        columns: list of columns to load (e.g. REQUIRED_COLUMNS), or None to
+            load every column.
+        predicate: function which takes a dataframe of candidates, and returns
+            a boolean Series for the candidates to keep. If given, the table is
+            parsed in chunks, and other candidates are dropped from each chunk
+            as it is parsed, so they are never all held in memory.
+        chunk_size: number of candidates per chunk, when using a predicate.
+        regions: dictionary of regions per chromosome, from load_regions(), to
+            only load candidates within these regions. See iter_candidates().
+        dropped: list to append the number of candidates dropped by the
+            predicate per HGNC symbol to, see filter_chunks().
+    
+    Returns:
+        pandas dataframe of candidate de novo sites
+    """
+    
+    fmt = table_format(candidates_path)
+    if predicate is None and regions is None and fmt != "vcf":
+        if fmt == "text":
+            candidates = read_candidates(candidates_path, columns)
+        else:
+            candidates = apply_schema(read_columnar(candidates_path, columns))
+        return prepare_candidates(candidates)
+    
+    chunks = iter_candidates(candidates_path, chunk_size, columns, regions)
+    if predicate is not None:
+        chunks = filter_chunks(chunks, predicate, dropped)
+    
+    return concat_candidates(list(chunks))
+
+def filter_chunks(chunks, predicate, dropped=None):
+    """ drop candidates from each chunk as it is loaded
+    
+    Args:
+        chunks: iterable of pandas dataframes of candidates
+        predicate: function which takes a dataframe of candidates, and returns
+            a boolean Series for the candidates to keep.
+        dropped: list to append a pandas Series for each chunk to, with the
+            number of dropped candidates per HGNC symbol, or None.
+    
+    Yields:
+        pandas dataframes of the candidates to keep from each chunk
+    """
+    
+    for chunk in chunks:
+        keep = predicate(chunk)
+        if dropped is not None:
+            dropped.append(chunk['symbol'][~keep].value_counts())
+        yield chunk[keep]
+
+def concat_candidates(chunks):
+    """ join chunks of candidates, keeping the declared column types
+    
+    Categorical columns from different chunks have different categories, which
+    pandas.concat converts to plain object columns. Each chunk's categoricals
+    are given the categories from all the chunks first, so the columns are
+    joined as categoricals.
+    
+    Args:
+        chunks: list of pandas dataframes of candidates
+    
+    Returns:
+        pandas dataframe of candidate de novo sites
+    """
+    
+    for column, dtype in SCHEMA.items():
+        if dtype != "category" or not all( column in x.columns and
+                x[column].dtype.name == "category" for x in chunks ):
+            continue
         
+        categories = pandas.unique(numpy.concatenate([
+            x[column].cat.categories.to_numpy(dtype=object) for x in chunks ]))
+        chunks = [ x.assign(**{column: x[column].cat.set_categories(categories)})
+            for x in chunks ]
+    
+    return restore_categories(pandas.concat(chunks))
+
+def restore_categories(candidates):
+    """ convert the declared categorical columns back to categoricals
+    
+    Args:
+        candidates: pandas dataframe of candidates
+    
+    Returns:
+        pandas dataframe of candidates
+    """
+    
+    for column, dtype in SCHEMA.items():
+        if dtype == "category" and column in candidates.columns:
+            candidates[column] = candidates[column].astype("category")
+    
+    if 'consequence' in candidates.columns:
+        candidates['consequence'] = to_categorical(candidates['consequence'])
+    
     return candidates
+
+def iter_candidates(candidates_path, chunk_size=CHUNK_SIZE, columns=None,
+        regions=None):
+    """ load the candidate dataset in chunks, to limit memory use
+    
+    Args:
+        candidates_path: path to candidate DNMs
+        chunk_size: maximum number of candidates per chunk
+        columns: list of columns to load, or None to load every column. VCFs
+            always give the columns of the candidates table.
+        regions: dictionary of regions per chromosome, from load_regions(), to
+            only load candidates within these regions. For bgzipped files
+            with a tabix index, only the blocks within the regions are read,
+            otherwise candidates outside the regions are dropped from each
+            chunk. Every candidate at a site is kept, so site tests on the
+            remaining candidates are unaffected.
+    
+    Yields:
+        pandas dataframes of consecutive candidate de novo sites. Each chunk's
+        index continues from the previous chunk, so rows have the same index
+        as in load_candidates().
+    """
+    
+    fmt = table_format(candidates_path)
+    if fmt == "vcf":
+        reader = ( apply_schema(x) for x in iter_vcf_candidates(candidates_path,
+            chunk_size, regions) )
+    elif regions is not None and index_path(candidates_path) is not None:
+        reader = read_indexed_candidates(candidates_path, regions, columns,
+            chunk_size)
+    elif fmt == "text":
+        reader = read_candidates(candidates_path, columns, chunksize=chunk_size)
+    else:
+        reader = ( apply_schema(x) for x in iter_columnar(candidates_path,
+            chunk_size, columns) )
+    
+    index = build_region_index(regions) if regions is not None else None
+    for candidates in reader:
+        candidates = prepare_candidates(candidates)
+        if regions is not None:
+            candidates = candidates[in_regions(index, candidates['chrom'],
+                candidates['pos'])]
+        yield candidates
+
+def read_indexed_candidates(candidates_path, regions, columns=None,
+        chunk_size=CHUNK_SIZE):
+    """ read the candidates within regions from a tabix-indexed table
+    
+    Args:
+        candidates_path: path to bgzip-compressed table of candidate DNMs, with
+            a tabix or CSI index, see fetch_regions().
+        regions: dictionary of regions per chromosome, from load_regions()
+        columns: list of columns to load, or None to load every column.
+        chunk_size: maximum number of candidates per chunk
+    
+    Yields:
+        pandas dataframes of candidates, as from read_candidates(). Only the
+        first chunk can be empty, if no candidates are within the regions, as
+        for a table without any candidates.
+    """
+    
+    with gzip.open(candidates_path, "rt") as handle:
+        header = handle.readline()
+    
+    lines = fetch_regions(candidates_path, regions)
+    offset = 0
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if len(chunk) == 0 and offset > 0:
+            break
+        
+        text = header + "".join( x + "\n" for x in chunk )
+        
+        candidates = read_candidates(io.StringIO(text), columns)
+        candidates.index = pandas.RangeIndex(offset, offset + len(candidates))
+        offset += len(candidates)
+        yield candidates
+        
+        if len(chunk) < chunk_size:
+            break
+
+def write_candidates(candidates, path, compression=None):
+    """ write candidates to a table, in a format picked from the extension
+    
+    Parquet (.parquet or .pq) and Arrow (.arrow, .feather or .ipc) files keep
+    the column types, including the categoricals, so they load again without
+    parsing. Candidates can't be written as VCFs (.vcf or .vcf.gz). Other
+    paths are written as tab-separated text.
+    
+    Args:
+        candidates: pandas dataframe of candidates
+        path: path to write to, or a file handle for text (e.g. sys.stdout)
+        compression: compression codec, see write_columnar(). Text files are
+            compressed if this is given (e.g. "gzip"), or the path ends in a
+            compressed extension such as ".gz". File handles can't be
+            compressed.
+    """
+    
+    fmt = table_format(path)
+    if fmt == "vcf":
+        raise ValueError("can't write candidates as a VCF: {0}".format(path))
+    
+    if compression is not None and not isinstance(path, str):
+        raise ValueError("can't compress candidates written to a file handle")
+    
+    if fmt == "text":
+        kwargs = {}
+        if compression is not None:
+            kwargs["compression"] = compression
+        candidates.to_csv(path, sep="\t", index=False, na_rep='NA', **kwargs)
+    else:
+        write_columnar(restore_categories(candidates.copy()), path, compression)
@@ -0,0 +1,186 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import sys
+
+import pandas
+
+from denovoFilter.load_candidates import load_candidates, concat_candidates, \
+    CHUNK_SIZE
+
+def read_manifest(manifest_path):
+    """ read the paths to per-trio candidate files from a manifest
+    
+    Args:
+        manifest_path: path to manifest, with one path per line. Paths are
+            relative to the manifest's folder, unless absolute. Only the first
+            tab-separated column is used, and blank lines or lines starting with
+            "#" are skipped.
+    
+    Returns:
+        list of paths to candidate files
+    """
+    
+    folder = os.path.dirname(os.path.abspath(manifest_path))
+    
+    paths = []
+    with open(manifest_path) as handle:
+        for line in handle:
+            path = line.rstrip("\n").split("\t")[0].strip()
+            if path == "" or path.startswith("#"):
+                continue
+            paths.append(os.path.join(folder, path))
+    
+    return paths
+
+def load_file(path, columns=None, regions=None, predicate=None):
+    """ load one candidate file, catching any errors, for use in a process pool
+    
+    Args:
+        path: path to candidate file
+        columns: list of columns to load, or None to load every column.
+        regions: dictionary of regions per chromosome, or None.
+        predicate: function to select candidates to keep, or None to keep all
+            the candidates. This runs in the worker process, so only the kept
+            candidates are sent back, and it must be picklable (e.g. a module
+            level function, or a functools.partial of one).
+    
+    Returns:
+        tuple of (candidates, dropped, error). If the file loaded, error is
+        None, and dropped is a pandas Series of the number of candidates dropped
+        by the predicate per HGNC symbol (or None without a predicate). If the
+        file couldn't be loaded, error describes the error, and the others are
+        None.
+    """
+    
+    try:
+        counts = []
+        candidates = load_candidates(path, columns, predicate, regions=regions,
+            dropped=counts)
+    except Exception as error:
+        return None, None, "{0}: {1}".format(type(error).__name__, error)
+    
+    dropped = None
+    if predicate is not None:
+        dropped = pandas.Series([], dtype=int)
+        if len(counts) > 0:
+            dropped = pandas.concat(counts).groupby(level=0).sum()
+            dropped = dropped[dropped > 0]
+    
+    return candidates, dropped, None
+
+def iter_manifest(manifest_path, chunk_size=CHUNK_SIZE, columns=None,
+        regions=None, workers=None, predicate=None, dropped=None):
+    """ load the per-trio candidate files in a manifest, in parallel
+    
+    The files are parsed by a pool of processes, and are yielded in the order
+    of the manifest. Only a few files per process are loaded ahead of the file
+    being yielded, so the loaded files don't pile up in memory. Files which
+    can't be loaded are reported, and skipped.
+    
+    Args:
+        manifest_path: path to manifest of candidate files, see read_manifest().
+            Each file can be in any format for load_candidates().
+        chunk_size: unused, each file is one chunk. This matches the arguments
+            of iter_candidates().
+        columns: list of columns to load, or None to load every column.
+        regions: dictionary of regions per chromosome, to only load candidates
+            within these regions.
+        workers: number of processes, defaults to the number of CPUs.
+        predicate: picklable function to select the candidates to keep from
+            each file, which is applied in the worker processes. See
+            load_file().
+        dropped: list to append the number of candidates dropped by the
+            predicate per HGNC symbol to, for each file.
+    
+    Yields:
+        pandas dataframes of the candidates from each file. Each file's index
+        continues from the previous file.
+    """
+    
+    paths = read_manifest(manifest_path)
+    if len(paths) == 0:
+        raise ValueError("no candidate files listed in {0}".format(manifest_path))
+    
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    
+    offset = 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        remaining = iter(paths)
+        while True:
+            # keep a bounded number of files loading, rather than submitting
+            # every file at once
+            for path in remaining:
+                pending.append((path, pool.submit(load_file, path, columns,
+                    regions, predicate)))
+                if len(pending) >= 2 * workers:
+                    break
+            
+            if len(pending) == 0:
+                break
+            
+            path, future = pending.popleft()
+            candidates, counts, error = future.result()
+            if error is not None:
+                failed += 1
+                sys.stderr.write("can't load candidates from {0}: {1}\n".format(
+                    path, error))
+                continue
+            
+            if dropped is not None and counts is not None:
+                dropped.append(counts)
+            
+            candidates.index = pandas.RangeIndex(offset, offset + len(candidates))
+            offset += len(candidates)
+            yield candidates
+    
+    if failed > 0:
+        sys.stderr.write("{0} of {1} candidate files couldn't be loaded\n".format(
+            failed, len(paths)))
+    
+    if failed == len(paths):
+        raise ValueError("no candidates loaded from {0}".format(manifest_path))
+
+def load_manifest(manifest_path, columns=None, predicate=None,
+        chunk_size=CHUNK_SIZE, regions=None, workers=None, dropped=None):
+    """ load the per-trio candidate files in a manifest into one table
+    
+    Arguments are as for load_candidates() and iter_manifest(). The predicate is
+    applied to each file's candidates in the worker processes, so it must be
+    picklable, and the remaining candidates are joined once all the files are
+    loaded.
+    
+    Returns:
+        pandas dataframe of candidate de novo sites
+    """
+    
+    chunks = iter_manifest(manifest_path, chunk_size, columns, regions,
+        workers, predicate, dropped)
+    
+    return concat_candidates(list(chunks))
@@ -19,8 +19,21 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import os
+import tempfile
+
+import numpy
 from scipy.stats import binom
 
+from denovoFilter.exact_tests import bisect_last
+from denovoFilter.cache import get_cache_dir
+
+# maximum parental depth for the precomputed threshold tables
+MAX_DEPTH = 2000
+
+# threshold tables are cached by error rate, threshold and maximum depth
+THRESHOLD_TABLES = {}
+
 def min_depth(depth, error, threshold=0.98):
     '''  determine the maximum parental depth permitted from both parents
     
@@ -36,8 +49,8 @@ def min_depth(depth, error, threshold=0.98):
     
     We only need to consider the fourth scenario. The probability that this
     happens (at a given depth) is 1 - prob(first parent exceeds) * prob(second
-    parent exceeds). We repeatedly increment the depth threshold upwards until
-    this probability is sufficiently high.
+    parent exceeds). We find the lowest depth threshold where this probability
+    is sufficiently high.
     
     Args:
         depth: depth of parental sequencing. Can either be a single value (as a
@@ -63,14 +76,186 @@ def min_depth(depth, error, threshold=0.98):
     assert len(depth) == 2
     assert 0.0 < threshold < 1.0
     
+    return int(search_thresholds([depth[0]], [depth[1]], error, threshold)[0])
+
+def search_thresholds(first, second, error, threshold=0.98):
+    """ find the min_depth() thresholds for many pairs of depths by bisection
+    
+    The probability that both parents exceed an alt count falls as the alt
+    count rises, so rather than stepping upwards from zero, we bisect between
+    zero and the larger depth (where the probability must be zero).
+    
+    Args:
+        first: array of depths for the first parent
+        second: array of depths for the second parent
+        error: site-specific error rate (e.g. 0.002)
+        threshold: probability threshold that we are wanting to exceed.
+    
+    Returns:
+        numpy array of maximum permitted alternate depths across both parents.
+    """
+    
+    first = numpy.asarray(first, dtype=numpy.int64)
+    second = numpy.asarray(second, dtype=numpy.int64)
+    
+    # find the last alt count where the probability does not exceed the
+    # threshold, the next count is the first which does
+    def condition(x, i):
+        product = binom.sf(x, first[i], error) * binom.sf(x, second[i], error)
+        return 1 - product <= threshold
+    
+    return bisect_last(condition, numpy.full(len(first), -1),
+        numpy.maximum(first, second)) + 1
+
+def threshold_table(error, threshold=0.98, max_depth=MAX_DEPTH):
+    """ compute min_depth() thresholds for all pairs of depths up to a maximum
+    
+    Rather than searching for each pair of depths separately, we step upwards
+    through alt counts, and at each count check every pair of depths at once.
+    
+    Args:
+        error: site-specific error rate (e.g. 0.002)
+        threshold: probability threshold that we are wanting to exceed.
+        max_depth: maximum depth for either parent in the table.
+    
+    Returns:
+        (max_depth + 1, max_depth + 1) numpy array of maximum permitted
+        alternate depths, indexed by the depth of each parent.
+    """
+    
+    assert 0.0 < threshold < 1.0
+    
+    depths = numpy.arange(max_depth + 1)
+    table = numpy.zeros((len(depths), len(depths)), dtype=numpy.min_scalar_type(max_depth))
+    unset = numpy.ones(table.shape, dtype=bool)
+    
     x = 0
-    while True:
-        product = 1
-        for i in depth:
-            product *= binom.sf(x, i, error)
-        prob = 1 - product
+    while unset.any():
+        sf = binom.sf(x, depths, error)
+        prob = 1 - sf[:, None] * sf[None, :]
         
-        if prob > threshold:
-            return(x)
+        exceeds = unset & (prob > threshold)
+        table[exceeds] = x
+        unset &= ~exceeds
         
         x += 1
+    
+    return table
+
+def threshold_table_path(error, threshold, max_depth, cache_dir=None):
+    """ get the path to the cached file for a threshold table
+    """
+    
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    
+    filename = "min_depth.error_{0!r}.threshold_{1!r}.max_depth_{2}.npy".format(
+        float(error), float(threshold), int(max_depth))
+    
+    return os.path.join(cache_dir, filename)
+
+def load_threshold_table(path, max_depth):
+    """ load a cached threshold table, as a read-only memory-map
+    
+    Args:
+        path: path to the cached table
+        max_depth: maximum depth the table should extend to
+    
+    Returns:
+        numpy array of thresholds, or None if the file is missing, or its
+        header doesn't match the expected shape and type.
+    """
+    
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        table = numpy.load(path, mmap_mode="r")
+    except (IOError, OSError, ValueError):
+        return None
+    
+    if table.shape != (max_depth + 1, max_depth + 1) or \
+            table.dtype != numpy.min_scalar_type(max_depth):
+        return None
+    
+    return table
+
+def save_threshold_table(table, path):
+    """ save a threshold table to the cache
+    
+    The table is written to a temporary file, then moved into place, so that
+    other processes never see a partially written table. Failures to write
+    (e.g. from a read-only cache directory) are ignored.
+    """
+    
+    folder = os.path.dirname(path)
+    try:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        
+        handle, temp_path = tempfile.mkstemp(dir=folder, suffix=".npy.tmp")
+        with os.fdopen(handle, "wb") as output:
+            numpy.save(output, table)
+        os.replace(temp_path, path)
+    except (IOError, OSError):
+        pass
+
+def get_threshold_table(error, threshold=0.98, max_depth=MAX_DEPTH, cache_dir=None):
+    """ get a table of min_depth() thresholds, computing it on first use
+    
+    Tables are kept in memory for the rest of the run, and also cached on disk
+    for later runs, so they only need to be computed once per error rate,
+    threshold and maximum depth.
+    
+    Args:
+        error: site-specific error rate (e.g. 0.002)
+        threshold: probability threshold that we are wanting to exceed.
+        max_depth: maximum depth for either parent in the table.
+        cache_dir: folder for cached tables. Defaults to the user cache folder.
+    
+    Returns:
+        numpy array of thresholds, indexed by the depth of each parent.
+    """
+    
+    key = (error, threshold, max_depth)
+    if key not in THRESHOLD_TABLES:
+        path = threshold_table_path(error, threshold, max_depth, cache_dir)
+        table = load_threshold_table(path, max_depth)
+        if table is None:
+            table = threshold_table(error, threshold, max_depth)
+            save_threshold_table(table, path)
+        
+        THRESHOLD_TABLES[key] = table
+    
+    return THRESHOLD_TABLES[key]
+
+def min_depth_thresholds(first, second, error, threshold=0.98, max_depth=MAX_DEPTH):
+    """ get the min_depth() thresholds for the parental depths of many variants
+    
+    Thresholds are looked up from a precomputed table, except for depths beyond
+    the table, which are searched for directly.
+    
+    Args:
+        first: array of depths for the first parent
+        second: array of depths for the second parent
+        error: site-specific error rate (e.g. 0.002)
+        threshold: probability threshold that we are wanting to exceed.
+        max_depth: maximum depth for either parent in the lookup table.
+    
+    Returns:
+        numpy array of maximum permitted alternate depths across both parents.
+    """
+    
+    first = numpy.asarray(first, dtype=numpy.int64)
+    second = numpy.asarray(second, dtype=numpy.int64)
+    
+    table = get_threshold_table(error, threshold, max_depth)
+    
+    in_table = (first <= max_depth) & (second <= max_depth)
+    
+    thresholds = numpy.zeros(len(first), dtype=numpy.int64)
+    thresholds[in_table] = table[first[in_table], second[in_table]]
+    thresholds[~in_table] = search_thresholds(first[~in_table],
+        second[~in_table], error, threshold)
+    
+    return thresholds
@@ -19,10 +19,12 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from denovoFilter.allele_counts import extract_alt_and_ref_counts, \
-    get_depths_and_proportions
+import numpy
+import pandas
 
-def filter_missing_indels(candidates, *args):
+from denovoFilter.trio_counts import TrioCounts
+
+def filter_missing_indels(candidates, *args, **kwargs):
     """ filter the candidate missing indels.
     
     We have a set of sites that have been called in the child, but not in the
@@ -34,23 +36,30 @@ def filter_missing_indels(candidates, *args):
     
     Args:
         candidates: pandas dataframe of de novo indel sites
+        counts: TrioCounts object for the candidates (as a keyword argument), to
+            share read counts with other filtering stages. This is constructed
+            from the DP4 columns if not provided.
     
     Returns:
         dataframe of candidate sites that pass the required criteria.
     """
     
-    counts = extract_alt_and_ref_counts(candidates)
-    depths = get_depths_and_proportions(counts)
+    counts = kwargs.get('counts')
+    if counts is None:
+        counts = TrioCounts.from_dp4(candidates)
     
-    depths["min_parent_depth"] = depths[["mom_depth", "dad_depth"]].min(axis=1)
-    depths["max_parent_proportion"] = depths[["mom_prp", "dad_prp"]].max(axis=1)
+    min_parent_depth = numpy.minimum(counts.depth('mother'), counts.depth('father'))
+    max_parent_proportion = numpy.fmax(counts.proportion('mother'),
+        counts.proportion('father'))
     
     # apply the filtering criteria for the missing indels
-    good_depth = depths["child_alts"] > 2
-    low_parental_alt = counts["min_parent_alt"] < 2
-    good_parental_depth = depths["min_parent_depth"] > 7
-    good_parental_proportion = depths["max_parent_proportion"] < 0.1
-    good_child_proportion = depths["child_prp"] > 0.2
+    good_depth = counts.alts('child') > 2
+    low_parental_alt = counts.min_parent_alt < 2
+    good_parental_depth = min_parent_depth > 7
+    good_parental_proportion = max_parent_proportion < 0.1
+    good_child_proportion = counts.proportion('child') > 0.2
     
-    return good_depth & low_parental_alt & good_parental_depth & \
-        good_parental_proportion & good_child_proportion
+    # candidates with missing or malformed DP4 entries fail
+    return pandas.Series(counts.valid & good_depth & low_parental_alt &
+        good_parental_depth & good_parental_proportion & good_child_proportion,
+        index=candidates.index)
@@ -19,35 +19,38 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import time
 import sys
-import json
+import urllib.request as request
+from urllib.error import HTTPError
 
-try:
-    import urllib.request as request
-    from urllib.error import HTTPError
-except ImportError:
-    import urllib2 as request
-    from urllib2 import HTTPError
+from denovoFilter.gene_index import get_gene_index, find_overlapping_genes
+from denovoFilter.symbol_cache import SymbolCache
+from denovoFilter.ensembl_client import EnsemblClient
 
-import pandas
-
-PREV_TIME = time.time()
-IS_PYTHON3 = sys.version[0] == "3"
-
-def fix_missing_gene_symbols(de_novos, build='grch37'):
+def fix_missing_gene_symbols(de_novos, build='grch37', gene_annotations=None,
+        cache=None, prefetch=False, client=None, verbose=False):
     """ adds gene symbols to variants lacking them.
     
     Args:
         de_novos: dataframe of de novo variants
         build: whether to use the 'grch37' or 'grch38' build (default=GRCh37)
+        gene_annotations: path to GTF, GFF3 or BED file of genes for the build.
+            If given, symbols are found from the local file, rather than by
+            querying the Ensembl REST API.
+        cache: SymbolCache for symbols found via Ensembl. Defaults to the
+            persistent cache in the cache directory.
+        prefetch: whether to request the genes in large tiles around the
+            variants, rather than requesting each variant's region.
+        client: EnsemblClient to request symbols with, so one client can be
+            shared between calls. Defaults to a new client for the build.
+        verbose: whether to print the Ensembl requests as they are made.
     
     Returns:
         pandas Series of HGNC symbols, with additional annotations for many
         variants previously lacking a HGNC symbol.
     """
     
-    symbols = de_novos["symbol"].copy()
+    symbols = de_novos["symbol"].astype(object)
     
     # get the variants with no gene annotation, ensure chrom, start and stop
     # positions columns exist
@@ -55,7 +58,13 @@ def fix_missing_gene_symbols(de_novos, build='grch37'):
     missing['end'] = missing["pos"] + missing["ref"].str.len() - 1
     
     # find the HGNC symbols (if any) for the variants
-    missing = [ get_gene_id(x["chrom"], x["pos"], x['end'], build=build, verbose=True) for i, x in missing.iterrows() ]
+    if gene_annotations is not None:
+        index = get_gene_index(gene_annotations, build)
+        missing = find_overlapping_genes(index, missing["chrom"], missing["pos"],
+            missing["end"])
+    else:
+        missing = get_cached_gene_ids(missing, build, cache, prefetch, client,
+            verbose)
     symbols[de_novos["symbol"] == ""] = missing
     
     # 360 out of 17000 de novos still lack HGNC symbols. Their consequences are:
@@ -71,11 +80,65 @@ def fix_missing_gene_symbols(de_novos, build='grch37'):
     # add them to the analysis of their nearest gene. We shall analyse these
     # per site by giving them mock gene symbols.
     missing = de_novos[symbols == ""].copy()
-    fake = 'fake_symbol.' + missing['chrom'].map(str) + '_' + missing["pos"].map(str)
+    fake = 'fake_symbol.' + missing['chrom'].astype(str) + '_' + missing["pos"].astype(str)
     symbols[symbols == ""] = fake
     
     return symbols
 
+def get_cached_gene_ids(variants, build='grch37', cache=None, prefetch=False,
+        client=None, verbose=False):
+    """ find symbols via Ensembl, for regions not already in the symbol cache
+    
+    Args:
+        variants: dataframe of variants, with chrom, pos and end columns
+        build: whether to use the 'grch37' or 'grch38' build
+        cache: SymbolCache to check first, and store new symbols in. Defaults
+            to the persistent cache in the cache directory, which is closed
+            and reported on afterwards. A cache which is passed in is left for
+            the caller to report on and close.
+        prefetch: whether to request the genes in large tiles around the
+            uncached regions, rather than requesting each region.
+        client: EnsemblClient to request symbols with. Defaults to a new client
+            for the build, which is closed afterwards.
+        verbose: whether a new client prints the requests as they are made.
+    
+    Returns:
+        list of HGNC symbols (blank for variants not in a gene)
+    """
+    
+    close = cache is None
+    if cache is None:
+        cache = SymbolCache()
+    
+    regions = [ (str(chrom), int(start), int(end)) for chrom, start, end in
+        zip(variants["chrom"], variants["pos"], variants["end"]) ]
+    
+    # only look up each region once, so the cache hits and misses count
+    # distinct regions, and request the uncached regions concurrently
+    unique = sorted(set(regions))
+    symbols = dict(zip(unique, cache.get_many(build, unique)))
+    missing = [ x for x in unique if symbols[x] is None ]
+    if len(missing) > 0:
+        close_client = client is None
+        if client is None:
+            client = EnsemblClient(build, verbose=verbose)
+        if prefetch:
+            found = client.prefetch_gene_ids(missing)
+        else:
+            found = client.get_gene_ids(missing)
+        found = dict(zip(missing, found))
+        if close_client:
+            client.close()
+        
+        cache.set_many(build, missing, [ found[x] for x in missing ])
+        symbols.update(found)
+    
+    if close:
+        sys.stderr.write(cache.report() + "\n")
+        cache.close()
+    
+    return [ symbols[x] for x in regions ]
+
 def open_url(url, headers):
     """ open url with python libraries
     
@@ -95,33 +158,23 @@ def open_url(url, headers):
         handler = e
     
     status_code = handler.getcode()
-    response = handler.read()
-    if IS_PYTHON3:
-        response = response.decode("utf-8")
+    response = handler.read().decode("utf-8")
     
     # parse the headers into a key, value dictionary
     headers = dict(zip(map(str.lower, handler.headers.keys()), handler.headers.values()))
     
     return response, status_code, headers
 
-def rate_limit_requests(rate_limit=0.0667):
-    """ limit ensembl requests to one per 0.067 s
-    """
-    
-    global PREV_TIME
-    
-    diff = time.time() - PREV_TIME
-    if diff < rate_limit:
-        time.sleep(rate_limit - diff)
-    
-    PREV_TIME = time.time()
-
-def get_gene_id(chrom, start_pos, end_pos, build="grch37", verbose=False, attempts=0):
+def get_gene_id(chrom, start_pos, end_pos, build="grch37", verbose=False):
     """find the hgnc symbol overlapping a variant position
     
+    This makes a single request with a new EnsemblClient. Use
+    EnsemblClient.get_gene_ids() to find symbols for many variants.
+    
     Args:
-        variant: data frame or list for a variant, containing columns named
-            "chrom", "start_pos", and "end_pos" for a single variant
+        chrom: chromosome of the variant
+        start_pos: start position of the variant
+        end_pos: end position of the variant
         build: genome build to find consequences on
         verbose: flag indicating whether to print variants as they are checked
     
@@ -129,40 +182,8 @@ def get_gene_id(chrom, start_pos, end_pos, build="grch37", verbose=False, attemp
         a character string containing the HGNC symbol.
     """
     
-    attempts += 1
-    if attempts > 5:
-        raise ValueError("too many attempts, figure out why its failing")
-    
-    rate_limit_requests()
-    
-    # define parts of the URL
-    ext = "overlap/region/human/{0}:{1}-{2}?feature=gene".format(chrom, start_pos, end_pos)
-    server_dict = {"grch37": "grch37.", "grch38": ""}
-    base_url = "http://{}rest.ensembl.org".format(server_dict[build])
-    url = "{0}/{1}".format(base_url, ext)
-    headers = {"Content-Type" : "application/json"}
-    
-    if verbose:
-        print("chr{0}:{1}   {2}".format(chrom, start_pos, ext))
-    
-    response, status_code, requested_headers = open_url(url, headers)
-    
-    if status_code == 429:
-        if "retry-after" in requested_headers:
-            time.sleep(float(requested_headers["retry-after"]))
-        elif "x-ratelimit-reset" in requested_headers:
-            time.sleep(int(requested_headers["x-ratelimit-reset"]))
-        return get_gene_id(chrom, start_pos, end_pos, build, verbose, attempts)
-    elif status_code in [503, 504]:
-        time.sleep(30)
-        return get_gene_id(chrom, start_pos, end_pos, build, verbose, attempts)
-    elif status_code != 200:
-        raise ValueError('Invalid Ensembl response: {0}.\nSubmitted '
-            'URL was: {1}{2}\nheaders: {3}\nresponse: {4}'.format(status_code,
-                base_url, ext, requested_headers, response))
-    
-    json_text = json.loads(response)
-    if len(json_text) > 0:
-        return json_text[0]["external_name"]
-    
-    return ""
+    client = EnsemblClient(build, verbose=verbose)
+    try:
+        return client.get_gene_id(chrom, start_pos, end_pos)
+    finally:
+        client.close()
@@ -19,6 +19,9 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import numpy
+import pandas
+
 consequences = ["transcript_ablation", "splice_donor_variant",
     "splice_acceptor_variant", "stop_gained", "frameshift_variant",
     "initiator_codon_variant", "stop_lost", "start_lost", "transcript_amplification",
@@ -36,6 +39,154 @@ consequences = ["transcript_ablation", "splice_donor_variant",
     "intergenic_variant"]
 severity = dict(zip(consequences, range(len(consequences))))
 
+# consequences within coding exons or splice sites
+coding_consequences = ["coding_sequence_variant", "frameshift_variant",
+    "inframe_deletion", "inframe_insertion", "initiator_codon_variant",
+    "missense_variant", "protein_altering_variant", "splice_acceptor_variant",
+    "splice_donor_variant", "splice_region_variant", "start_lost",
+    "stop_gained", "stop_lost", "synonymous_variant",
+    'conserved_exon_terminus_variant']
+
+# separators between terms in VEP consequence strings
+TERM_SEPARATORS = "[&,]"
+
+def to_categorical(values):
+    """ convert consequences to an ordered categorical, from most to least severe
+    
+    The categories are the VEP consequences ordered by severity, so comparisons
+    between consequences only need the integer codes. Other values (such as
+    multi-term consequences) are kept, as categories after all the VEP
+    consequences.
+    
+    Args:
+        values: list or pandas Series of consequence strings
+    
+    Returns:
+        pandas Series of ordered categorical consequences
+    """
+    
+    values = pandas.Series(values)
+    if isinstance(values.dtype, pandas.CategoricalDtype) and \
+            list(values.cat.categories[:len(consequences)]) == consequences:
+        return values
+    
+    observed = pandas.unique(values.dropna().astype(str))
+    extra = sorted(set(observed) - set(consequences))
+    
+    return values.astype(pandas.CategoricalDtype(consequences + extra, ordered=True))
+
+def consequence_bitmask(values):
+    """ encode each consequence as a bitmask of its VEP terms
+    
+    Values can hold multiple terms, separated by "&" or ",", e.g.
+    "missense_variant&splice_region_variant". Bits are set by term severity,
+    so the lowest set bit is the most severe term. Unrecognised terms are
+    ignored. Each distinct value is only parsed once.
+    
+    Args:
+        values: list or pandas Series of consequence strings
+    
+    Returns:
+        numpy array of uint64 bitmasks
+    """
+    
+    codes, uniques = pandas.factorize(pandas.Series(values).astype(object))
+    
+    terms = pandas.Series(uniques, dtype=object).str.split(TERM_SEPARATORS,
+        regex=True).explode()
+    ranks = terms.map(severity)
+    known = ranks.notnull().to_numpy()
+    
+    masks = numpy.zeros(len(uniques) + 1, dtype=numpy.uint64)
+    bits = numpy.left_shift(numpy.uint64(1), ranks[known].to_numpy().astype(numpy.uint64))
+    numpy.bitwise_or.at(masks, terms.index.to_numpy()[known], bits)
+    
+    # missing values have code -1, which maps to the trailing empty mask
+    return masks[codes]
+
+def severity_ranks(values):
+    """ get the severity rank of the most severe term in each consequence
+    
+    Args:
+        values: list or pandas Series of consequence strings
+    
+    Returns:
+        numpy array of ranks (0 is most severe), with -1 for consequences
+        without any recognised terms.
+    """
+    
+    masks = consequence_bitmask(values)
+    
+    # isolate the lowest set bit, then find its position
+    lowest = masks & (~masks + numpy.uint64(1))
+    ranks = numpy.full(len(masks), -1, dtype=numpy.int64)
+    found = lowest > 0
+    ranks[found] = numpy.log2(lowest[found]).astype(numpy.int64)
+    
+    return ranks
+
+def get_most_severe_terms(values):
+    """ get the most severe term from each of many VEP consequence strings
+    
+    Args:
+        values: list or pandas Series of consequence strings
+    
+    Returns:
+        pandas Series of ordered categorical consequences, with missing values
+        for consequences without any recognised terms.
+    """
+    
+    categories = pandas.CategoricalDtype(consequences, ordered=True)
+    terms = pandas.Categorical.from_codes(severity_ranks(values), dtype=categories)
+    
+    index = values.index if isinstance(values, pandas.Series) else None
+    
+    return pandas.Series(terms, index=index)
+
+def most_severe_per_group(values, groups):
+    """ get the most severe consequence within each group of variants
+    
+    Args:
+        values: pandas Series of consequence strings
+        groups: column, or list of columns, to group the consequences by
+    
+    Returns:
+        pandas Series of the most severe consequence per group, indexed by
+        group, with missing values for groups without any recognised terms.
+    """
+    
+    ranks = pandas.Series(severity_ranks(values), index=values.index)
+    ranks = ranks.where(ranks >= 0, len(consequences))
+    
+    best = ranks.groupby(groups).min()
+    best = best.where(best < len(consequences), -1)
+    
+    categories = pandas.CategoricalDtype(consequences, ordered=True)
+    
+    return pandas.Series(pandas.Categorical.from_codes(best.to_numpy(),
+        dtype=categories), index=best.index)
+
+def is_coding(values):
+    """ check whether each consequence is a coding consequence
+    
+    Args:
+        values: list or pandas Series of consequence strings
+    
+    Returns:
+        numpy boolean array
+    """
+    
+    codes = to_categorical(values).cat.codes.to_numpy()
+    
+    # codes are positions in the severity order, or beyond that for other
+    # values, with -1 for missing values
+    lookup = numpy.zeros(len(consequences) + 1, dtype=bool)
+    lookup[[ severity[x] for x in coding_consequences ]] = True
+    codes = numpy.where((codes < 0) | (codes >= len(consequences)),
+        len(consequences), codes)
+    
+    return lookup[codes]
+
 def get_most_severe(consequences):
     """ get the most severe consequence from a list of VEP consequences
     
@@ -49,14 +200,13 @@ def get_most_severe(consequences):
     if consequences is None:
         return None
     
-    most_severe = None
-    
-    for consequence in consequences:
-        # check if this is the most severe consequence; prefer HGNC transcripts
-        if most_severe is None or severity[consequence] < severity[most_severe]:
-            most_severe = consequence
-    
-    if most_severe is None:
+    values = to_categorical(list(consequences))
+    if len(values) == 0:
         raise IndexError
     
-    return most_severe
+    # values outside the VEP consequences are placed after them
+    unknown = values.cat.codes >= len(severity)
+    if unknown.any():
+        raise KeyError(values[unknown].iloc[0])
+    
+    return values.min()
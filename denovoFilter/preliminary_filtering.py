@@ -20,6 +20,9 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 from pandas import Series
+from pandas.api.types import is_float_dtype
+
+from denovoFilter.most_severe import is_coding
 
 def fix_maf(max_af):
     """ cleans up the max AF entries in the de novo dataframe
@@ -32,7 +35,12 @@ def fix_maf(max_af):
         modified pandas Series of max_af values
     """
     
-    max_af = max_af.copy()
+    index = max_af.index
+    
+    # max_af values are parsed to floats when loaded, so we only need to fill
+    # the missing values
+    if is_float_dtype(max_af):
+        return max_af.fillna(0.0)
     
     # some de novos have comma-separated lists of maf values. We select the
     # first value (which correspononds to the alternate allele, the additional
@@ -44,7 +52,29 @@ def fix_maf(max_af):
     missing = set(['', '.', 'missing', 'nan', 'None', 'NA'])
     max_af = [ float(x) if x not in missing else 0.0 for x in max_af ]
     
-    return Series(max_af)
+    return Series(max_af, index=index)
+
+def rare_de_novo(de_novos, maf_cutoff=0.01):
+    """ check the allele frequency, and that the variant only appears in the child
+    
+    These checks only use a few columns, so are cheap enough to run as the
+    candidates are loaded.
+    
+    Args:
+        de_novos: dataframe of de novo variants
+        maf_cutoff: sites have to have a minor allele frequency below this.
+    
+    Returns:
+        pandas Series of true/false for whether each candidate passes
+    """
+    
+    max_af = fix_maf(de_novos['max_af'])
+    passes_maf = (max_af <= maf_cutoff) & max_af.notnull()
+    
+    # keep sites in child vcf, and not in parental vcfs
+    appears_de_novo = (de_novos["in_child_vcf"] == 1) & (de_novos["in_father_vcf"] == 0) & (de_novos["in_mother_vcf"] == 0)
+    
+    return passes_maf & appears_de_novo
 
 def preliminary_filtering(de_novos, sample_fails=None, maf_cutoff=0.01):
     """run some preliminary filtering of de novos.
@@ -63,18 +93,12 @@ def preliminary_filtering(de_novos, sample_fails=None, maf_cutoff=0.01):
         allele frequency and where the variant appears in one or more parents.
     """
     
-    max_af = fix_maf(de_novos['max_af'])
-    passes_maf = (max_af <= maf_cutoff) & max_af.notnull()
-    
-    # keep sites in child vcf, and not in parental vcfs
-    appears_de_novo = (de_novos["in_child_vcf"] == 1) & (de_novos["in_father_vcf"] == 0) & (de_novos["in_mother_vcf"] == 0)
-    
-    good_samples = [True] * len(de_novos)
+    good_samples = Series(True, index=de_novos.index)
     if sample_fails is not None:
         # remove samples with too many candidates
         good_samples = ~de_novos["person_stable_id"].isin(sample_fails)
     
-    return passes_maf & appears_de_novo & good_samples
+    return rare_de_novo(de_novos, maf_cutoff) & good_samples
 
 def check_coding(de_novos, cq_name="consequence"):
     """check whether the consequence is for a coding consequence
@@ -88,11 +112,4 @@ def check_coding(de_novos, cq_name="consequence"):
     """
     
     # annotate candidates within coding exons or splice sites
-    coding_splicing = ["coding_sequence_variant", "frameshift_variant",
-        "inframe_deletion", "inframe_insertion", "initiator_codon_variant",
-        "missense_variant", "protein_altering_variant", "splice_acceptor_variant",
-        "splice_donor_variant", "splice_region_variant", "start_lost",
-        "stop_gained", "stop_lost", "synonymous_variant",
-        'conserved_exon_terminus_variant']
-    
-    return de_novos[cq_name].isin(coding_splicing)
+    return Series(is_coding(de_novos[cq_name]), index=de_novos.index)
@@ -0,0 +1,198 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+
+import numpy
+import pandas
+
+from denovoFilter.exclude_segdups import merge_regions
+
+# masks are held as bits of 64-bit integers, so we can check up to 64 tracks
+MAX_TRACKS = 64
+
+def read_bed(path):
+    """ read the regions from a BED file (optionally gzipped)
+    
+    Args:
+        path: path to BED file. Only the first three columns are used.
+    
+    Returns:
+        dictionary of (starts, ends) tuples of sorted, merged regions per
+        chromosome. These use 1-based coordinates, with exclusive ends, so a
+        BED region of "1  100  200" covers positions 101 to 200.
+    """
+    
+    regions = pandas.read_table(path, header=None, usecols=[0, 1, 2],
+        names=["chrom", "start", "end"], dtype=str, comment="#",
+        compression="infer")
+    
+    # drop any browser or track lines
+    regions = regions[regions["start"].str.isdigit() & regions["end"].str.isdigit()]
+    
+    regions["chrom"] = regions["chrom"].str.replace("^chr", "", regex=True)
+    starts = regions["start"].astype(numpy.int64) + 1
+    ends = regions["end"].astype(numpy.int64) + 1
+    
+    merged = {}
+    for chrom, rows in regions.groupby("chrom", sort=False).indices.items():
+        merged[chrom] = merge_regions(starts.to_numpy()[rows], ends.to_numpy()[rows])
+    
+    return merged
+
+def track_name(path):
+    """ get a short name for a mask track from its path
+    
+    e.g. "/data/low_complexity.bed.gz" becomes "low_complexity"
+    """
+    
+    name = os.path.basename(path)
+    for suffix in [".gz", ".bgz", ".bed"]:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    
+    return name
+
+def load_tracks(paths):
+    """ load the regions for a list of BED files
+    
+    Args:
+        paths: list of paths to BED files
+    
+    Returns:
+        list of (name, regions) tuples, one per BED file
+    """
+    
+    return [ (track_name(path), read_bed(path)) for path in paths ]
+
+def build_mask_index(tracks):
+    """ combine the regions from many tracks into a single index
+    
+    Each chromosome is split into segments at every region boundary from any
+    track. Each segment then gets a bitmask of the tracks that cover it, so
+    that a single search finds the tracks covering a position.
+    
+    Args:
+        tracks: list of region dictionaries, each with (starts, ends) tuples
+            of sorted, non-overlapping regions per chromosome.
+    
+    Returns:
+        dictionary of (boundaries, masks) tuples per chromosome, where masks[i]
+        is the bitmask of the tracks covering boundaries[i] up to (but not
+        including) boundaries[i + 1].
+    """
+    
+    if len(tracks) > MAX_TRACKS:
+        raise ValueError("can't check more than {0} region tracks at "
+            "once".format(MAX_TRACKS))
+    
+    chroms = set()
+    for regions in tracks:
+        chroms |= set(regions)
+    
+    index = {}
+    for chrom in chroms:
+        present = [ x[chrom] for x in tracks if chrom in x ]
+        boundaries = numpy.unique(numpy.concatenate([ numpy.concatenate(x) for x in present ]))
+        masks = numpy.zeros(len(boundaries), dtype=numpy.uint64)
+        
+        for bit, regions in enumerate(tracks):
+            if chrom not in regions:
+                continue
+            
+            starts, ends = regions[chrom]
+            idx = numpy.searchsorted(starts, boundaries, side="right") - 1
+            covered = (idx >= 0) & (boundaries < ends[numpy.maximum(idx, 0)])
+            masks[covered] |= numpy.uint64(1) << numpy.uint64(bit)
+        
+        index[chrom] = (boundaries, masks)
+    
+    return index
+
+def index_tracks(tracks):
+    """ build the combined index for a list of named tracks
+    
+    Args:
+        tracks: list of (name, regions) tuples e.g. from load_tracks()
+    
+    Returns:
+        dictionary of (boundaries, masks) per chromosome, see build_mask_index()
+    """
+    
+    return build_mask_index([ regions for name, regions in tracks ])
+
+def region_bitmask(index, chroms, positions):
+    """ get the bitmask of tracks covering each position
+    
+    Args:
+        index: dictionary of (boundaries, masks) per chromosome, from
+            build_mask_index()
+        chroms: pandas Series of chromosomes
+        positions: pandas Series of nucleotide positions
+    
+    Returns:
+        numpy array of 64-bit bitmasks, where bit i is set if the position is
+        within a region of the i-th track.
+    """
+    
+    chroms = chroms.astype(str).to_numpy()
+    positions = numpy.asarray(positions, dtype=numpy.int64)
+    
+    bitmask = numpy.zeros(len(positions), dtype=numpy.uint64)
+    for chrom in pandas.unique(chroms):
+        if chrom not in index:
+            continue
+        
+        boundaries, masks = index[chrom]
+        rows = numpy.flatnonzero(chroms == chrom)
+        
+        idx = numpy.searchsorted(boundaries, positions[rows], side="right") - 1
+        bitmask[rows] = numpy.where(idx >= 0, masks[numpy.maximum(idx, 0)], 0)
+    
+    return bitmask
+
+def check_masks(de_novos, tracks, index=None):
+    """ identify de novo calls within the regions of each of many tracks
+    
+    Args:
+        de_novos: dataframe of candidate de novo calls
+        tracks: list of (name, regions) tuples e.g. from load_tracks()
+        index: combined index of the tracks, from index_tracks(). This is built
+            from the tracks if not provided, so build it once when checking
+            many sets of candidates against the same tracks.
+    
+    Returns:
+        dataframe with a boolean column per track, for whether each candidate
+        is within a region of that track.
+    """
+    
+    if index is None:
+        index = index_tracks(tracks)
+    
+    bitmask = region_bitmask(index, de_novos["chrom"], de_novos["pos"])
+    
+    masked = pandas.DataFrame(index=de_novos.index)
+    for bit, (name, regions) in enumerate(tracks):
+        if name in masked.columns:
+            name = "{0}.{1}".format(name, bit)
+        masked[name] = (bitmask >> numpy.uint64(bit)) & numpy.uint64(1) == 1
+    
+    return masked
@@ -0,0 +1,188 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+
+import numpy
+import pandas
+
+from denovoFilter.exclude_segdups import merge_regions
+from denovoFilter.region_masks import read_bed, build_mask_index, region_bitmask
+
+try:
+    import pysam
+except ImportError:
+    pysam = None
+
+# end position for regions covering the rest of a chromosome. This is the
+# largest position a tabix index can hold.
+MAX_POSITION = 2 ** 29
+
+def parse_region(region):
+    """ parse a region in the "chrom:start-end" format used by tabix
+    
+    Positions are 1-based and inclusive, and can contain commas. Either the end
+    or both positions can be left off, e.g. "X:1000000" covers chrX from
+    1,000,000 onwards, and "X" covers all of chrX.
+    
+    Args:
+        region: region string e.g. "1:1,000,000-2,000,000"
+    
+    Returns:
+        tuple of (chrom, start, end), with 1-based coordinates and an exclusive
+        end, as for read_bed().
+    """
+    
+    chrom, separator, span = region.strip().rpartition(":")
+    if separator == "":
+        chrom, span = span, ""
+    
+    start, _, end = span.replace(",", "").partition("-")
+    try:
+        start = int(start) if start != "" else 1
+        end = int(end) + 1 if end != "" else MAX_POSITION
+    except ValueError:
+        raise ValueError("can't parse region: {0}".format(region))
+    
+    if chrom == "" or start < 1 or end <= start:
+        raise ValueError("can't parse region: {0}".format(region))
+    
+    if chrom.startswith("chr"):
+        chrom = chrom[3:]
+    
+    return chrom, start, end
+
+def load_regions(regions=None, regions_path=None):
+    """ combine regions given as text, or in a BED file
+    
+    Args:
+        regions: list of region strings, see parse_region()
+        regions_path: path to BED file (optionally gzipped) of regions
+    
+    Returns:
+        dictionary of (starts, ends) tuples of sorted, merged regions per
+        chromosome, as for read_bed(). Overlapping regions are merged, so
+        candidates within them are only included once. Returns None if no
+        regions were given.
+    """
+    
+    if regions is None and regions_path is None:
+        return None
+    
+    merged = {}
+    if regions_path is not None:
+        merged = read_bed(regions_path)
+    
+    for chrom, start, end in map(parse_region, regions or []):
+        starts, ends = merged.get(chrom, (numpy.array([], dtype=numpy.int64),
+            numpy.array([], dtype=numpy.int64)))
+        merged[chrom] = merge_regions(numpy.append(starts, start),
+            numpy.append(ends, end))
+    
+    return merged
+
+def build_region_index(regions):
+    """ build an index of regions, to check many chunks of positions against
+    
+    Args:
+        regions: dictionary of (starts, ends) tuples per chromosome, see
+            load_regions()
+    
+    Returns:
+        index of the regions, see build_mask_index()
+    """
+    
+    return build_mask_index([regions])
+
+def in_regions(index, chroms, positions):
+    """ check whether positions are within any of a set of regions
+    
+    Args:
+        index: index of regions, from build_region_index()
+        chroms: pandas Series of chromosomes. Any "chr" prefix is removed, to
+            match the regions.
+        positions: pandas Series of nucleotide positions
+    
+    Returns:
+        numpy boolean array
+    """
+    
+    # only strip the prefix from the distinct chromosomes
+    codes, names = pandas.factorize(pandas.Series(chroms).astype(str))
+    names = names.str.replace("^chr", "", regex=True).to_numpy(dtype=object)
+    chroms = pandas.Series(names[codes] if len(codes) > 0 else [], dtype=object)
+    
+    return region_bitmask(index, chroms, positions) != 0
+
+def index_path(path):
+    """ find the tabix (or CSI) index for a bgzipped file, if there is one
+    
+    Args:
+        path: path to bgzip-compressed file
+    
+    Returns:
+        path to the index, or None if the file isn't indexed
+    """
+    
+    if not isinstance(path, str):
+        return None
+    
+    for suffix in [".tbi", ".csi"]:
+        if os.path.exists(path + suffix):
+            return path + suffix
+    
+    return None
+
+def fetch_regions(path, regions):
+    """ get the lines within a set of regions from a tabix indexed file
+    
+    This seeks to the blocks covering each region, rather than reading the
+    whole file. The file must be indexed by position, e.g. for the candidates
+    table: tabix --skip-lines 1 --sequence 2 --begin 3 --end 3 candidates.txt.gz
+    
+    Args:
+        path: path to bgzip-compressed file, with a tabix or CSI index
+        regions: dictionary of (starts, ends) tuples per chromosome, from
+            load_regions(), with 1-based coordinates and exclusive ends.
+    
+    Yields:
+        lines (without line endings) for the records within the regions. Each
+        record is yielded once, since the regions don't overlap.
+    """
+    
+    if pysam is None:
+        raise ImportError("reading regions from indexed files needs the pysam "
+            "package, which can be installed with 'pip install pysam'")
+    
+    with pysam.TabixFile(path, index=index_path(path)) as handle:
+        contigs = set(handle.contigs)
+        for chrom, (starts, ends) in regions.items():
+            # the regions don't include a "chr" prefix, but the file might
+            if chrom not in contigs:
+                chrom = "chr" + chrom
+                if chrom not in contigs:
+                    continue
+            
+            # tabix uses 0-based coordinates, with exclusive ends
+            for start, end in zip(starts, ends):
+                for line in handle.fetch(chrom, int(start) - 1, int(end) - 1):
+                    yield line
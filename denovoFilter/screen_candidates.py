@@ -19,14 +19,164 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from denovoFilter.load_candidates import load_candidates
-from denovoFilter.preliminary_filtering import preliminary_filtering
-from denovoFilter.exclude_segdups import check_segdups
+import functools
+import inspect
+import sys
+
+import pandas
+
+from denovoFilter.load_candidates import load_candidates, iter_candidates, \
+    REQUIRED_COLUMNS
+from denovoFilter.preliminary_filtering import preliminary_filtering, rare_de_novo
+from denovoFilter.exclude_segdups import load_segdups
+from denovoFilter.region_masks import load_tracks, index_tracks, check_masks
 from denovoFilter.missing_symbols import fix_missing_gene_symbols
+from denovoFilter.symbol_cache import SymbolCache
+from denovoFilter.ensembl_client import EnsemblClient
 from denovoFilter.standardise import standardise_columns
+from denovoFilter.trio_counts import TrioCounts
+from denovoFilter.filter_denovogear_sites import has_good_depth
+from denovoFilter.site_deviations import DeviationCounts
+from denovoFilter.manifest import load_manifest, iter_manifest
+
+def load_mask_tracks(mask_paths=None):
+    """ load the segdup regions, and any other regions to exclude
+    
+    Args:
+        mask_paths: list of paths to BED files of regions to exclude
+    
+    Returns:
+        tuple of (tracks, index), where tracks is a list of (name, regions)
+        tuples (see load_tracks()), and index is their combined index from
+        index_tracks(), so the index is only built once.
+    """
+    
+    tracks = [("segdup", load_segdups())]
+    if mask_paths is not None:
+        tracks += load_tracks(mask_paths)
+    
+    return tracks, index_tracks(tracks)
+
+def load_sample_fails(fails_path):
+    """ load the list of samples which failed QC
+    """
+    
+    if fails_path is None:
+        return []
+    
+    return [ x.strip() for x in open(fails_path) ]
+
+def initial_screen(de_novos, sample_fails, maf, tracks, index=None):
+    """ run the initial screening, which only depends on each candidate itself
+    
+    Args:
+        de_novos: dataframe of candidate de novos
+        sample_fails: list of samples which failed QC
+        maf: MAF threshold for filtering
+        tracks: list of (name, regions) tuples of regions to exclude. All the
+            tracks are checked together.
+        index: combined index of the tracks, from load_mask_tracks(). This is
+            built from the tracks if not provided.
+    
+    Returns:
+        pandas Series for whether each candidate passes
+    """
+    
+    status = preliminary_filtering(de_novos, sample_fails, maf_cutoff=maf)
+    unmasked = ~check_masks(de_novos, tracks, index).any(axis=1)
+    
+    return status & unmasked
+
+def accepts_keyword(function, name):
+    """ check whether a function accepts a keyword argument
+    
+    Args:
+        function: function to check
+        name: name of the keyword argument
+    
+    Returns:
+        True if the function has an argument with that name, or takes any
+        keyword arguments (**kwargs).
+    """
+    
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        return True
+    
+    return any( x.name == name or x.kind == x.VAR_KEYWORD for x in parameters )
+
+def candidate_loaders(manifest=False, workers=None):
+    """ get the functions to load candidates from a file, or from a manifest
+    
+    Args:
+        manifest: whether the candidates path is a manifest of per-trio files
+        workers: number of processes to load the files in a manifest with.
+    
+    Returns:
+        tuple of functions to load all the candidates, and to load them in
+        chunks, with the same arguments as load_candidates() and
+        iter_candidates().
+    """
+    
+    if not manifest:
+        return load_candidates, iter_candidates
+    
+    return functools.partial(load_manifest, workers=workers), \
+        functools.partial(iter_manifest, workers=workers)
+
+def keep_rare(de_novos, maf):
+    """ find the candidates to keep while loading, see load_rare_candidates()
+    
+    Candidates without symbols are kept regardless, since their symbols are
+    found later.
+    
+    Args:
+        de_novos: dataframe of candidate de novos
+        maf: MAF threshold for filtering.
+    
+    Returns:
+        pandas Series of whether to keep each candidate
+    """
+    
+    return rare_de_novo(de_novos, maf) | (de_novos['symbol'] == '')
+
+def load_rare_candidates(de_novos_path, maf, regions=None, load=load_candidates):
+    """ load the candidates, dropping common or inherited candidates during parsing
+    
+    Only the candidates which pass keep_rare() are kept, so the candidates
+    which would be excluded anyway aren't all held in memory.
+    
+    Args:
+        de_novos_path: path to table of unfiltered canddiate DNMs
+        maf: MAF threshold for filtering.
+        regions: dictionary of regions per chromosome to load candidates from,
+            or None to load all candidates.
+        load: function to load the candidates, see candidate_loaders().
+    
+    Returns:
+        tuple of (candidates, symbol_counts), where symbol_counts is a pandas
+        Series of the number of dropped candidates per HGNC symbol. The
+        dropped candidates still count towards whether genes are recurrent.
+    """
+    
+    dropped = []
+    predicate = functools.partial(keep_rare, maf=maf)
+    de_novos = load(de_novos_path, REQUIRED_COLUMNS, predicate, regions=regions,
+        dropped=dropped)
+    
+    symbol_counts = pandas.Series([], dtype=int)
+    if len(dropped) > 0:
+        symbol_counts = pandas.concat(dropped).groupby(level=0).sum()
+        symbol_counts = symbol_counts[symbol_counts > 0]
+    
+    return de_novos, symbol_counts
 
 def screen_candidates(de_novos_path, fails_path, filter_function, maf=0.01,
-        fix_symbols=True, annotate_only=False, build='grch37'):
+        fix_symbols=True, annotate_only=False, build='grch37', mask_paths=None,
+        gene_annotations=None, prefetch_symbols=False, chunk_size=None,
+        regions=None, manifest=False, workers=None,
+        verbose=False):
     """ load and optionally filter candidate de novo mutations.
     
     Args:
@@ -34,7 +184,10 @@ def screen_candidates(de_novos_path, fails_path, filter_function, maf=0.01,
         fails_path: path to file listing samples which failed QC, and therefore
             all of their candidates need to be excluded.
         filter_function: function for filtering the candidates, either
-            filter_denovogear_sites(), or filter_missing_indels().
+            filter_denovogear_sites(), or filter_missing_indels(). If any
+            candidates are dropped while loading, functions which accept a
+            symbol_counts keyword argument are given the dropped candidates'
+            counts per symbol.
         maf: MAF threshold for filtering. This is 0.01 for denovogear sites,
             and 0 for the missing indels.
         fix_symbols: whether to annotate HGNC symbols for candidates
@@ -43,6 +196,26 @@ def screen_candidates(de_novos_path, fails_path, filter_function, maf=0.01,
             than excluding all candidates which fail the filtering.
         build: whether to use the 'grch37' or 'grch38' build to get
             missing symbols.
+        mask_paths: list of paths to BED files (optionally gzipped) of regions
+            to exclude, in addition to the segdup regions.
+        gene_annotations: path to GTF, GFF3 or BED file of genes for the build,
+            to find missing symbols offline, rather than via Ensembl.
+        prefetch_symbols: whether to get the genes from Ensembl in large tiles
+            around the variants missing symbols, rather than per variant.
+        chunk_size: if given, parse and screen the candidates in chunks of
+            this many rows, see screen_candidate_chunks(). The screened
+            chunks are joined, so use screen_candidate_chunks() directly to
+            avoid holding every screened candidate in memory.
+        regions: dictionary of regions per chromosome (see load_regions()), to
+            only screen candidates within these regions. Sites and genes are
+            tested using the candidates within the regions.
+        manifest: whether de_novos_path is a manifest listing per-trio
+            candidate files (see read_manifest()), rather than a single file.
+            The files are parsed in parallel, and joined once.
+        workers: number of processes for loading the files in a manifest.
+            Defaults to the number of CPUs.
+        verbose: whether to print the Ensembl requests for missing symbols as
+            they are made.
     
     Returns:
         pandas DataFrame of candidate de novo mutations.
@@ -51,20 +224,44 @@ def screen_candidates(de_novos_path, fails_path, filter_function, maf=0.01,
     if de_novos_path is None:
         return None
     
-    # load the datasets
-    de_novos = load_candidates(de_novos_path)
-    sample_fails = []
-    if fails_path is not None:
-        sample_fails = [ x.strip() for x in open(fails_path) ]
+    if chunk_size is not None:
+        chunks = screen_candidate_chunks(de_novos_path, fails_path,
+            filter_function, maf, fix_symbols, annotate_only, build, mask_paths,
+            gene_annotations, prefetch_symbols, chunk_size, regions, manifest,
+            workers, verbose)
+        return pandas.concat(list(chunks))
     
-    # run some initial screening
-    status = preliminary_filtering(de_novos, sample_fails, maf_cutoff=maf)
-    segdup = check_segdups(de_novos)
+    # load the datasets. If we only keep passing candidates, drop candidates
+    # which fail the cheapest checks while loading.
+    load, _ = candidate_loaders(manifest, workers)
+    symbol_counts = None
+    if annotate_only:
+        de_novos = load(de_novos_path, REQUIRED_COLUMNS, regions=regions)
+    else:
+        de_novos, symbol_counts = load_rare_candidates(de_novos_path, maf,
+            regions, load)
+    sample_fails = load_sample_fails(fails_path)
+    
+    # run some initial screening, and exclude candidates in segdups, or any of
+    # the other masked regions
+    tracks, index = load_mask_tracks(mask_paths)
+    status = initial_screen(de_novos, sample_fails, maf, tracks, index)
     
     if fix_symbols:
-        de_novos['symbol'] = fix_missing_gene_symbols(de_novos, build)
+        de_novos['symbol'] = fix_missing_gene_symbols(de_novos, build,
+            gene_annotations, prefetch=prefetch_symbols, verbose=verbose)
+    
+    # parse the read counts once, so the filtering stages can share them
+    counts = TrioCounts.from_dp4(de_novos)
+    
+    # only pass on the counts for dropped candidates if there are any, and the
+    # filter function takes them, so other filter functions still work
+    kwargs = {}
+    if symbol_counts is not None and len(symbol_counts) > 0 and \
+            accepts_keyword(filter_function, 'symbol_counts'):
+        kwargs['symbol_counts'] = symbol_counts
     
-    pass_status = filter_function(de_novos, status & segdup) & status & segdup
+    pass_status = filter_function(de_novos, status, counts=counts, **kwargs) & status
     
     if annotate_only:
         de_novos['pass'] = pass_status
@@ -72,3 +269,87 @@ def screen_candidates(de_novos_path, fails_path, filter_function, maf=0.01,
         de_novos = de_novos[pass_status]
     
     return standardise_columns(de_novos)
+
+def screen_candidate_chunks(de_novos_path, fails_path, filter_function, maf=0.01,
+        fix_symbols=True, annotate_only=False, build='grch37', mask_paths=None,
+        gene_annotations=None, prefetch_symbols=False, chunk_size=None,
+        regions=None, manifest=False, workers=None,
+        verbose=False):
+    """ screen candidate de novo mutations, streaming the candidates in chunks
+    
+    This gives the same candidates as screen_candidates(), but only holds one
+    chunk of the candidates in memory at a time. The candidates are read twice.
+    The first pass counts the alleles at each site and gene, which the site and
+    gene tests need. The second pass reads the candidates again, and filters
+    each chunk using those tests. With a manifest, each file is parsed once per
+    pass.
+    
+    Args:
+        chunk_size: maximum number of candidates per chunk. Other arguments are
+            as for screen_candidates().
+    
+    Yields:
+        pandas DataFrames of screened candidates, one per chunk.
+    """
+    
+    sample_fails = load_sample_fails(fails_path)
+    tracks, index = load_mask_tracks(mask_paths)
+    _, iterate = candidate_loaders(manifest, workers)
+    
+    # share one symbol cache and Ensembl client between the chunks
+    cache, client = None, None
+    if fix_symbols and gene_annotations is None:
+        cache, client = SymbolCache(), EnsemblClient(build, verbose=verbose)
+    
+    try:
+        chunks = iterate(de_novos_path, chunk_size, REQUIRED_COLUMNS, regions)
+        
+        # count the alleles per site and gene. Keep any fixed symbols (a small
+        # proportion of candidates), so we only need to look these up once.
+        deviations = DeviationCounts()
+        fixed = []
+        for de_novos in chunks:
+            status = initial_screen(de_novos, sample_fails, maf, tracks, index)
+            
+            if fix_symbols:
+                symbols = fix_missing_gene_symbols(de_novos, build,
+                    gene_annotations, cache, prefetch_symbols, client)
+                fixed.append(symbols[de_novos['symbol'] == ''])
+                de_novos['symbol'] = symbols
+            
+            counts = TrioCounts.from_dp4(de_novos)
+            deviations.add(de_novos, counts, status & has_good_depth(counts))
+        
+        if len(fixed) > 0:
+            fixed = pandas.concat(fixed)
+        
+        if cache is not None:
+            sys.stderr.write(cache.report() + "\n")
+            cache.close()
+            client.close()
+            cache, client = None, None
+        
+        chunks = iterate(de_novos_path, chunk_size, REQUIRED_COLUMNS, regions)
+        
+        for de_novos in chunks:
+            status = initial_screen(de_novos, sample_fails, maf, tracks, index)
+            
+            if fix_symbols:
+                de_novos['symbol'] = de_novos['symbol'].astype(object)
+                missing = de_novos['symbol'] == ''
+                de_novos.loc[missing, 'symbol'] = fixed.reindex(de_novos.index[missing])
+            
+            counts = TrioCounts.from_dp4(de_novos)
+            pass_status = filter_function(de_novos, status, counts=counts,
+                deviations=deviations) & status
+            
+            if annotate_only:
+                de_novos['pass'] = pass_status
+            else:
+                de_novos = de_novos[pass_status]
+            
+            yield standardise_columns(de_novos)
+    finally:
+        if cache is not None:
+            cache.close()
+            client.close()
@@ -19,10 +19,13 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import numpy
 import scipy.stats
 import pandas
 
-from denovoFilter.allele_counts import get_allele_counts
+from denovoFilter.allele_counts import group_codes, get_grouped_allele_counts
+from denovoFilter.exact_tests import fisher_exact, binom_test
+from denovoFilter.trio_counts import TrioCounts
 from denovoFilter.constants import P_CUTOFF, ERROR_RATE
 
 def site_strand_bias(site):
@@ -44,7 +47,27 @@ def site_strand_bias(site):
     except ValueError:
         return float(1)
 
-def test_sites(de_novos, pass_status=None):
+def expand_to_variants(values, codes, n_groups, index):
+    """ assign the values for each group back to the variants in the group
+    
+    Args:
+        values: pandas Series of values per group, indexed by group code
+        codes: numpy array of group codes for each variant
+        n_groups: number of groups
+        index: index for the table of variants
+    
+    Returns:
+        pandas Series of values for each variant, with NaN for variants in
+        groups lacking a value.
+    """
+    
+    per_group = numpy.full(n_groups + 1, numpy.nan)
+    per_group[values.index] = values
+    
+    # variants without a group have codes of -1, so pick up the trailing NaN
+    return pandas.Series(per_group[codes], index=index)
+
+def test_sites(de_novos, pass_status=None, counts=None):
     """ tests each site for deviation from expected behaviour
     
     Args:
@@ -54,6 +77,8 @@ def test_sites(de_novos, pass_status=None):
             failed MAF etc, since instead of filtering we want a column
             indicating pass status. We need to exclude these variants from the
             strand bias and parental alt checks.
+        counts: TrioCounts object for the variants. If this isn't provided, the
+            counts are taken from the child_ref_F etc columns of de_novos.
     
     Returns:
         tuple of pandas Series, one of p-values from testing if the variants have
@@ -61,76 +86,256 @@ def test_sites(de_novos, pass_status=None):
         have an excess of parental alts.
     """
     
-    de_novos["key"] = list(zip(de_novos["chrom"], de_novos["pos"], de_novos["alt"]))
-    
-    alleles = de_novos[["key",
-        "child_ref_F", "child_ref_R", "child_alt_F", "child_alt_R",
-        "mother_ref_F", "mother_ref_R", "mother_alt_F", "mother_alt_R",
-        "father_ref_F", "father_ref_R", "father_alt_F", "father_alt_R"]].copy()
+    if counts is None:
+        counts = TrioCounts.from_columns(de_novos)
     
+    include = numpy.ones(len(de_novos), dtype=bool)
     if pass_status is not None:
-        alleles = alleles[pass_status]
-    
-    variants = alleles.groupby("key")
+        include = numpy.array(pass_status, dtype=bool)
     
     # count the ref and alt alleles for each de novo site
-    counts = [ get_allele_counts(site) for name, site in variants ]
-    results = pandas.DataFrame(counts)
-    results["key"] = [ name for name, site in variants ]
+    codes, n_sites = group_codes(de_novos, ["chrom", "pos", "alt"])
+    include &= codes >= 0
+    results = get_grouped_allele_counts(counts.subset(include), codes[include], n_sites)
+    
+    # only test the sites with at least one included variant
+    tested = numpy.bincount(codes[include], minlength=n_sites) > 0
+    results = results[tested]
     
     # check for overabundance of parental alt alleles using binomial test
-    parent_counts = pandas.DataFrame({"alt": results["parent_alt"], "ref": results["parent_ref"]})
-    parental_alt_p = parent_counts.apply(scipy.stats.binom_test, axis=1, p=ERROR_RATE)
-    recode = dict(zip(results['key'], parental_alt_p))
-    parental_bias = de_novos['key'].map(recode)
+    parental_alt_p = pandas.Series(binom_test(results["parent_alt"],
+        results["parent_ref"], ERROR_RATE), index=results.index)
+    parental_bias = expand_to_variants(parental_alt_p, codes, n_sites, de_novos.index)
     
     # check for strand bias by fishers exact test on the allele counts
-    strand_bias_p = results.apply(site_strand_bias, axis=1)
-    recode = dict(zip(results['key'], strand_bias_p))
-    strand_bias = de_novos['key'].map(recode)
+    strand_bias_p = pandas.Series(fisher_exact(results["ref_F"], results["ref_R"],
+        results["alt_F"], results["alt_R"]), index=results.index)
+    strand_bias = expand_to_variants(strand_bias_p, codes, n_sites, de_novos.index)
     
     return strand_bias, parental_bias
 
-def test_genes(de_novos, strand_bias, pass_status=None):
+def test_genes(de_novos, strand_bias, pass_status=None, counts=None):
     """ checks if the variants in a gene have more parental ALTs than expected
     
     Args:
         de_novos: dataframe of de novo variants
+        strand_bias: pandas Series of strand bias p-values from test_sites()
+        pass_status: whether the candidate passed prelimary filtering.
+        counts: TrioCounts object for the variants. If this isn't provided, the
+            counts are taken from the child_ref_F etc columns of de_novos.
     
     Returns:
         p-value for whether the forward or reverse are biased in the proportion
         of ref and alt alleles within each gene.
     """
     
-    sites = de_novos.copy()
+    if counts is None:
+        counts = TrioCounts.from_columns(de_novos)
     
+    include = numpy.ones(len(de_novos), dtype=bool)
     if pass_status is not None:
-        sites = sites[pass_status]
-        strand_bias = strand_bias.copy()[pass_status]
+        include = numpy.array(pass_status, dtype=bool)
     
     # exclude de novo SNVs that fail the strand bias filter, otherwise these
     # skew the parental alts within genes
-    sites = sites[(strand_bias >= P_CUTOFF) & (sites["ref"].str.len() == 1) &
-        (sites["alt"].str.len() == 1)]
+    include &= (numpy.asarray(strand_bias, dtype=float) >= P_CUTOFF) & \
+        (de_novos["ref"].str.len() == 1).to_numpy() & \
+        (de_novos["alt"].str.len() == 1).to_numpy()
+    
+    # count the number of parental alleles within genes
+    codes, n_genes = group_codes(de_novos, ["symbol"])
+    include &= codes >= 0
     
     # cover the edge case where we don't have any sites for testing
-    if len(sites) == 0:
-        return [float('nan')] * len(de_novos)
+    if not include.any():
+        return pandas.Series(float('nan'), index=de_novos.index)
     
-    sites = sites[["symbol",
-        "mother_ref_F", "mother_ref_R", "mother_alt_F", "mother_alt_R",
-        "father_ref_F", "father_ref_R", "father_alt_F", "father_alt_R"]].copy()
-        
-    # count the number of parental alleles within genes, and restructure data
-    # for testing
-    genes = sites.groupby("symbol")
-    counts = [ get_allele_counts(site, gene=True) for name, site in genes ]
-    results = pandas.DataFrame(counts)
-    results["symbol"] = [ name for name, site in genes ]
+    results = get_grouped_allele_counts(counts.subset(include), codes[include],
+        n_genes, gene=True)
+    tested = numpy.bincount(codes[include], minlength=n_genes) > 0
+    results = results[tested]
     
     # check for overabundance of parental alt alleles using binomial test
-    parent_counts = pandas.DataFrame({"alt": results["gene_alt"], "ref": results["gene_ref"]})
-    parental_alt_p = parent_counts.apply(scipy.stats.binom_test, axis=1, p=ERROR_RATE)
-    recode = dict(zip(results["symbol"], parental_alt_p))
+    parental_alt_p = pandas.Series(binom_test(results["gene_alt"],
+        results["gene_ref"], ERROR_RATE), index=results.index)
+    
+    return expand_to_variants(parental_alt_p, codes, n_genes, de_novos.index)
+
+class DeviationCounts(object):
+    """ allele counts per site and gene, accumulated over chunks of candidates
+    
+    This lets test_sites() and test_genes() run on candidates streamed in
+    chunks, since only the summed counts for each site are kept between chunks,
+    rather than the candidates themselves.
+    
+    Gene counts are kept per site and symbol, since which sites contribute to
+    each gene depends on the site strand bias, which is only known once all the
+    chunks are counted.
+    """
+    
+    site_columns = ["chrom", "pos", "alt"]
+    
+    def __init__(self, max_pending=1000000):
+        """
+        Args:
+            max_pending: number of per-chunk rows to hold before merging them
+                into the running totals.
+        """
+        
+        self.max_pending = max_pending
+        self.pending = {"sites": [], "genes": [], "symbols": []}
+        self.n_pending = 0
+        self.totals = {}
+        self.site_tests = None
+        self.gene_tests = None
+    
+    def add(self, de_novos, counts, pass_status):
+        """ add the allele counts from a chunk of candidates
+        
+        Args:
+            de_novos: dataframe of de novo variants
+            counts: TrioCounts object for the variants
+            pass_status: whether each candidate passed the prior filtering, and
+                should be counted towards its site and gene.
+        """
+        
+        include = numpy.array(pass_status, dtype=bool)
+        variants = self.keys(de_novos, self.site_columns + ["symbol"])[include]
+        totals = counts.subset(include).counts
+        
+        trio = totals.sum(axis=1)
+        for i, allele in enumerate(["ref_F", "ref_R", "alt_F", "alt_R"]):
+            variants[allele] = trio[:, i]
+        variants["parent_alt"] = totals[:, 1:, 2:].sum(axis=(1, 2))
+        variants["parent_ref"] = totals[:, 1:, :2].sum(axis=(1, 2))
+        
+        sites = variants.groupby(self.site_columns).sum(numeric_only=True)
+        
+        # only SNVs count towards the gene totals
+        snv = (de_novos["ref"].str.len() == 1) & (de_novos["alt"].str.len() == 1)
+        snv = snv.to_numpy()[include]
+        genes = variants[snv].groupby(self.site_columns + ["symbol"])[
+            ["parent_alt", "parent_ref"]].sum()
+        
+        self.pending["sites"].append(sites)
+        self.pending["genes"].append(genes)
+        self.pending["symbols"].append(self.keys(de_novos, ["symbol"])["symbol"].value_counts())
+        self.n_pending += len(sites) + len(genes)
+        
+        self.site_tests = None
+        self.gene_tests = None
+        if self.n_pending > self.max_pending:
+            self.merge()
+    
+    def keys(self, de_novos, columns):
+        """ get columns to group variants by, as plain values
+        
+        Categorical columns from different chunks can have different categories,
+        so these are converted back to plain values, which can be combined.
+        
+        Returns:
+            dataframe of the columns
+        """
+        
+        keys = de_novos[columns].astype(object)
+        if "pos" in columns:
+            keys["pos"] = de_novos["pos"].astype(numpy.int64)
+        
+        return keys
+    
+    def merge(self):
+        """ merge the counts from recent chunks into the running totals
+        """
+        
+        for key, pending in self.pending.items():
+            if key in self.totals:
+                pending = [self.totals[key]] + pending
+            if len(pending) == 0:
+                continue
+            
+            levels = list(range(pending[0].index.nlevels))
+            self.totals[key] = pandas.concat(pending).groupby(level=levels).sum()
+            self.pending[key] = []
+        
+        self.n_pending = 0
+    
+    def recurrent_genes(self):
+        """ get the genes with more than one candidate, see get_recurrent_genes()
+        """
+        
+        self.merge()
+        symbols = self.totals.get("symbols", pandas.Series([], dtype=int))
+        
+        return symbols.index[symbols > 1]
+    
+    def get_site_tests(self):
+        """ test every counted site for strand bias and parental alts
+        
+        Returns:
+            dataframe of strand_bias and parental_bias p-values, indexed by
+            site.
+        """
+        
+        if self.site_tests is None:
+            self.merge()
+            sites = self.totals["sites"]
+            self.site_tests = pandas.DataFrame({
+                "strand_bias": fisher_exact(sites["ref_F"], sites["ref_R"],
+                    sites["alt_F"], sites["alt_R"]),
+                "parental_bias": binom_test(sites["parent_alt"],
+                    sites["parent_ref"], ERROR_RATE)}, index=sites.index)
+        
+        return self.site_tests
+    
+    def get_gene_tests(self):
+        """ test every counted gene for parental alts
+        
+        Returns:
+            pandas Series of p-values, indexed by symbol
+        """
+        
+        if self.gene_tests is None:
+            site_tests = self.get_site_tests()
+            genes = self.totals["genes"].reset_index()
+            
+            # exclude sites that fail the strand bias filter, otherwise these
+            # skew the parental alts within genes
+            sites = pandas.MultiIndex.from_frame(genes[self.site_columns])
+            strand_bias = site_tests["strand_bias"].reindex(sites).to_numpy()
+            genes = genes[strand_bias >= P_CUTOFF]
+            
+            genes = genes.groupby("symbol")[["parent_alt", "parent_ref"]].sum()
+            self.gene_tests = pandas.Series(binom_test(genes["parent_alt"],
+                genes["parent_ref"], ERROR_RATE), index=genes.index)
+        
+        return self.gene_tests
+    
+    def test_sites(self, de_novos):
+        """ get the site test results for a chunk of candidates
+        
+        Returns:
+            tuple of pandas Series, of p-values for strand bias, and for an
+            excess of parental alts, as from test_sites().
+        """
+        
+        site_tests = self.get_site_tests()
+        sites = pandas.MultiIndex.from_frame(self.keys(de_novos, self.site_columns))
+        found = site_tests.reindex(sites)
+        
+        return pandas.Series(found["strand_bias"].to_numpy(), index=de_novos.index), \
+            pandas.Series(found["parental_bias"].to_numpy(), index=de_novos.index)
     
-    return de_novos['symbol'].map(recode)
+    def test_genes(self, de_novos):
+        """ get the gene test results for a chunk of candidates
+        
+        Returns:
+            pandas Series of p-values for an excess of parental alts within the
+            gene of each candidate, as from test_genes().
+        """
+        
+        gene_tests = self.get_gene_tests()
+        
+        symbols = self.keys(de_novos, ["symbol"])["symbol"]
+        
+        return pandas.Series(gene_tests.reindex(symbols).to_numpy(),
+            index=de_novos.index)
@@ -0,0 +1,207 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import sqlite3
+import time
+
+from denovoFilter.cache import get_cache_dir
+
+# maximum size of the symbol cache, in bytes
+MAX_BYTES = 100 * 1024 * 1024
+
+# approximate bytes per region beyond its text, for the numeric columns, the
+# row headers, and the index entries
+ROW_OVERHEAD = 100
+
+class SymbolCache(object):
+    """ persistent cache of gene symbols for genomic regions
+    
+    Symbols are stored in a SQLite database, keyed by genome build, chromosome,
+    start and end, so they can be shared between runs and between processes.
+    Regions without a gene are stored with blank symbols, so these aren't
+    requested again either. When the cache is closed, the least recently used
+    regions are dropped if the regions take more than max_bytes. SQLite reuses
+    the space freed by dropped regions, so the file stays near this size.
+    """
+    
+    def __init__(self, path=None, max_bytes=MAX_BYTES):
+        """
+        Args:
+            path: path to the SQLite database. Defaults to symbols.sqlite in
+                the cache directory.
+            max_bytes: maximum size of the cached regions, in bytes, estimated
+                from the length of their text, plus ROW_OVERHEAD per region.
+        """
+        
+        if path is None:
+            path = os.path.join(get_cache_dir(), "symbols.sqlite")
+        
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        
+        try:
+            folder = os.path.dirname(os.path.abspath(path))
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            self.db = self.connect(path)
+        except (IOError, OSError, sqlite3.Error):
+            # fall back to a cache for this run only, if the cache directory
+            # isn't writable
+            self.db = self.connect(":memory:")
+    
+    def connect(self, path):
+        """ open the database, and create the symbols table if needed
+        """
+        
+        # wait for other processes to finish writing, rather than failing
+        db = sqlite3.connect(path, timeout=60)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            pass
+        
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS symbols (build TEXT, "
+                "chrom TEXT, start INTEGER, end INTEGER, symbol TEXT, "
+                "last_used REAL, PRIMARY KEY (build, chrom, start, end))")
+            db.execute("CREATE INDEX IF NOT EXISTS symbols_last_used ON "
+                "symbols (last_used)")
+        
+        return db
+    
+    def get_many(self, build, regions):
+        """ get the symbols for many regions
+        
+        The last use of all the regions found is updated in one transaction,
+        rather than once per region.
+        
+        Args:
+            build: genome build of the regions
+            regions: list of (chrom, start, end) tuples
+        
+        Returns:
+            list of gene symbols, which are blank for regions without any gene,
+            or None for regions which aren't cached.
+        """
+        
+        symbols = []
+        used = []
+        now = time.time()
+        for chrom, start, end in regions:
+            key = (build, str(chrom), int(start), int(end))
+            row = self.db.execute("SELECT symbol FROM symbols WHERE build=? AND "
+                "chrom=? AND start=? AND end=?", key).fetchone()
+            
+            if row is None:
+                self.misses += 1
+                symbols.append(None)
+            else:
+                self.hits += 1
+                symbols.append(row[0])
+                used.append((now, ) + key)
+        
+        if len(used) > 0:
+            with self.db:
+                self.db.executemany("UPDATE symbols SET last_used=? WHERE "
+                    "build=? AND chrom=? AND start=? AND end=?", used)
+        
+        return symbols
+    
+    def get(self, build, chrom, start, end):
+        """ get the symbol for a region, or None if the region isn't cached
+        
+        Returns:
+            gene symbol, which is blank for regions without any gene.
+        """
+        
+        return self.get_many(build, [(chrom, start, end)])[0]
+    
+    def set_many(self, build, regions, symbols):
+        """ store the symbols for many regions, in one transaction
+        
+        Args:
+            build: genome build of the regions
+            regions: list of (chrom, start, end) tuples
+            symbols: list of symbols for the regions (blank if no gene overlaps)
+        """
+        
+        now = time.time()
+        rows = [ (build, str(chrom), int(start), int(end), symbol, now)
+            for (chrom, start, end), symbol in zip(regions, symbols) ]
+        
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO symbols VALUES "
+                "(?, ?, ?, ?, ?, ?)", rows)
+    
+    def set(self, build, chrom, start, end, symbol):
+        """ store the symbol for a region (blank if no gene overlaps)
+        """
+        
+        self.set_many(build, [(chrom, start, end)], [symbol])
+    
+    def size(self):
+        """ estimate the number of bytes used by the cached regions
+        """
+        
+        return self.db.execute("SELECT COALESCE(SUM(LENGTH(build) + "
+            "LENGTH(chrom) + LENGTH(symbol) + ?), 0) FROM symbols",
+            (ROW_OVERHEAD, )).fetchone()[0]
+    
+    def evict(self):
+        """ drop the least recently used regions beyond the size limit
+        """
+        
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        
+        # find the oldest regions which free enough space
+        rows = self.db.execute("SELECT rowid, LENGTH(build) + LENGTH(chrom) + "
+            "LENGTH(symbol) + ? FROM symbols ORDER BY last_used, rowid",
+            (ROW_OVERHEAD, ))
+        drop = []
+        for rowid, size in rows:
+            if excess <= 0:
+                break
+            drop.append((rowid, ))
+            excess -= size
+        
+        with self.db:
+            self.db.executemany("DELETE FROM symbols WHERE rowid=?", drop)
+    
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+    
+    def report(self):
+        """ summarise how many lookups were found in the cache
+        """
+        
+        return "symbol cache: {0} hits, {1} misses".format(self.hits, self.misses)
+    
+    def close(self):
+        """ trim the cache to the size limit, and close the database
+        """
+        
+        self.evict()
+        self.db.close()
@@ -0,0 +1,140 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import division
+
+import numpy
+
+from denovoFilter.dp4 import MEMBERS, ALLELES, DP4_DTYPE, parse_dp4, dp4_views
+
+class TrioCounts(object):
+    """ forward and reverse REF and ALT read counts for each trio member
+    
+    The counts are held in a single (n_variants, 3, 4) array. Derived values,
+    such as the depths, ALT counts and ALT proportions for each member, are
+    only computed when first requested, and then cached, so that the filtering
+    stages can share them rather than recomputing them.
+    """
+    
+    def __init__(self, counts, valid=None):
+        """
+        Args:
+            counts: (n_variants, 3, 4) numpy array of read counts, ordered by
+                trio member (child, father, mother) and then by ref_F, ref_R,
+                alt_F and alt_R.
+            valid: boolean array for whether the counts for each variant were
+                parsed from well-formed DP4 entries. Defaults to all valid.
+        """
+        
+        if valid is None:
+            valid = numpy.ones(len(counts), dtype=bool)
+        
+        self.counts = counts
+        self.valid = valid
+        self._cache = {}
+    
+    @classmethod
+    def from_dp4(cls, de_novos):
+        """ construct from the dp4_child, dp4_father and dp4_mother columns
+        """
+        
+        counts, valid = parse_dp4(de_novos)
+        return cls(counts, valid)
+    
+    @classmethod
+    def from_columns(cls, table):
+        """ construct from a table with child_ref_F, mother_alt_R etc columns
+        """
+        
+        counts = numpy.zeros((len(table), len(MEMBERS), len(ALLELES)), dtype=DP4_DTYPE)
+        for i, member in enumerate(MEMBERS):
+            for j, allele in enumerate(ALLELES):
+                column = "{0}_{1}".format(member, allele)
+                counts[:, i, j] = table[column].to_numpy()
+        
+        return cls(counts)
+    
+    def __len__(self):
+        return len(self.counts)
+    
+    def _cached(self, key, func, *args):
+        """ get a derived value, computing it if it hasn't been used before
+        """
+        
+        if key not in self._cache:
+            self._cache[key] = func(*args)
+        
+        return self._cache[key]
+    
+    def columns(self):
+        """ get the counts as views, indexed by names such as "child_ref_F"
+        """
+        
+        return dp4_views(self.counts)
+    
+    def subset(self, include):
+        """ get the counts for a subset of variants
+        
+        Args:
+            include: boolean array (or integer positions) of variants to keep.
+        
+        Returns:
+            TrioCounts object for the selected variants.
+        """
+        
+        include = numpy.asarray(include)
+        return TrioCounts(self.counts[include], self.valid[include])
+    
+    def depth(self, member):
+        """ get the total read depth for a trio member
+        """
+        
+        i = MEMBERS.index(member)
+        return self._cached(("depth", member),
+            lambda: self.counts[:, i, :].sum(axis=1))
+    
+    def alts(self, member):
+        """ get the ALT read count (forward and reverse) for a trio member
+        """
+        
+        i = MEMBERS.index(member)
+        return self._cached(("alts", member),
+            lambda: self.counts[:, i, 2:].sum(axis=1))
+    
+    def proportion(self, member):
+        """ get the proportion of reads which are ALT for a trio member
+        
+        Sites without any reads have a proportion of NaN.
+        """
+        
+        def get_proportion():
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                return self.alts(member) / self.depth(member)
+        
+        return self._cached(("proportion", member), get_proportion)
+    
+    @property
+    def min_parent_alt(self):
+        """ get the minimum ALT read count across both parents
+        """
+        
+        return self._cached("min_parent_alt",
+            lambda: numpy.minimum(self.alts("father"), self.alts("mother")))
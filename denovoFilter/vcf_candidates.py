@@ -0,0 +1,348 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import gzip
+import io
+import re
+
+import pandas
+
+from denovoFilter.most_severe import severity
+from denovoFilter.regions import index_path, fetch_regions
+
+# columns of the candidates from each VCF, as for the candidates table
+VCF_COLUMNS = ["person_stable_id", "chrom", "pos", "ref", "alt", "consequence",
+    "symbol", "max_af", "pp_dnm", "dp4_child", "dp4_father", "dp4_mother",
+    "in_child_vcf", "in_father_vcf", "in_mother_vcf"]
+
+# INFO (or VEP CSQ) fields with population allele frequencies. The highest of
+# any present is used as the max_af for each allele.
+AF_FIELDS = ["MAX_AF", "AF_popmax", "gnomAD_AF", "gnomADe_AF", "gnomADg_AF"]
+
+# INFO fields for the consequence and gene symbol, if there is no CSQ field
+CONSEQUENCE_FIELDS = ["CQ", "Consequence"]
+SYMBOL_FIELDS = ["HGNC", "SYMBOL", "GENE"]
+
+def open_vcf(path):
+    """ open a plain or gzip (including bgzip) compressed VCF as text
+    """
+    
+    with open(path, "rb") as handle:
+        compressed = handle.read(2) == b"\x1f\x8b"
+    
+    if compressed:
+        return io.TextIOWrapper(gzip.open(path, "rb"))
+    
+    return open(path)
+
+def parse_header(handle):
+    """ read the VCF header, up to and including the #CHROM line
+    
+    Args:
+        handle: text handle for VCF, at the start of the file
+    
+    Returns:
+        tuple of (samples, pedigree, csq_fields), where samples is a list of
+        sample IDs, pedigree is a dictionary with the child, father and mother
+        IDs from a ##PEDIGREE line (or empty), and csq_fields is a list of the
+        VEP CSQ field names (or empty if there is no CSQ field).
+    """
+    
+    pedigree = {}
+    csq_fields = []
+    for line in handle:
+        if line.startswith("##PEDIGREE=<"):
+            fields = dict( x.split("=", 1) for x in line.strip()[12:-1].split(",") )
+            pedigree = dict( (x.lower(), y) for x, y in fields.items() )
+        elif line.startswith("##INFO=<ID=CSQ,"):
+            match = re.search(r'Format: ([^"]+)"', line)
+            if match is not None:
+                csq_fields = match.group(1).strip().split("|")
+        elif line.startswith("#CHROM"):
+            return line.rstrip("\n").split("\t")[9:], pedigree, csq_fields
+    
+    raise ValueError("no #CHROM line in VCF header")
+
+def trio_columns(samples, pedigree=None):
+    """ find the sample columns for the child, father and mother
+    
+    Args:
+        samples: list of sample IDs in the VCF
+        pedigree: dictionary with "child", "father" and "mother" sample IDs,
+            e.g. from a ##PEDIGREE header line. If this isn't available, the
+            first three samples are the child, father and mother, in order.
+    
+    Returns:
+        tuple of (child, father, mother) indexes into the samples
+    """
+    
+    members = ["child", "father", "mother"]
+    if pedigree and all( x in pedigree for x in members ):
+        missing = [ pedigree[x] for x in members if pedigree[x] not in samples ]
+        if len(missing) > 0:
+            raise ValueError("pedigree samples not in VCF: {0}".format(missing))
+        return tuple( samples.index(pedigree[x]) for x in members )
+    
+    if len(samples) < 3:
+        raise ValueError("trio VCFs need child, father and mother samples")
+    
+    return (0, 1, 2)
+
+def parse_info(info):
+    """ parse the INFO column into a dictionary (flags have a value of True)
+    """
+    
+    if info == ".":
+        return {}
+    
+    return dict( x.split("=", 1) if "=" in x else (x, True) for x in info.split(";") )
+
+def carries_allele(genotype, allele, missing=0):
+    """ check whether a genotype (e.g. "0/1" or "1|2") includes an allele
+    
+    Args:
+        genotype: GT value, or None if the sample doesn't have a GT field
+        allele: index of the allele (1 for the first ALT)
+        missing: value for samples without a genotype. By default these don't
+            carry the allele, so a parent without a GT doesn't make a candidate
+            look inherited.
+    
+    Returns:
+        1 if the genotype includes the allele, or 0 otherwise.
+    """
+    
+    if genotype is None:
+        return missing
+    
+    return int(str(allele) in re.split("[/|]", genotype))
+
+def to_int(value):
+    """ convert a depth to an integer, with zero for missing values
+    """
+    
+    return 0 if value in ["", "."] else int(value)
+
+def read_depths(sample, allele):
+    """ get the DP4 read depths for an allele in a sample
+    
+    Uses the DP4 field if present, otherwise the ADF and ADR fields (forward
+    and reverse depths per allele), otherwise the AD field. AD doesn't split
+    reads by strand, so the reads are split evenly between strands, so that
+    these don't fail the strand bias test.
+    
+    Args:
+        sample: dictionary of FORMAT values for the sample
+        allele: index of the alternate allele
+    
+    Returns:
+        comma-separated depths for the forward ref, reverse ref, forward alt
+        and reverse alt reads, as in the dp4 columns of the candidates table.
+    """
+    
+    if "DP4" in sample:
+        return sample["DP4"]
+    
+    if "ADF" in sample and "ADR" in sample:
+        forward = sample["ADF"].split(",")
+        reverse = sample["ADR"].split(",")
+        depths = [forward[0], reverse[0], forward[allele], reverse[allele]]
+        return ",".join( str(to_int(x)) for x in depths )
+    
+    if "AD" in sample:
+        depths = sample["AD"].split(",")
+        ref, alt = to_int(depths[0]), to_int(depths[allele])
+        depths = [ref - ref // 2, ref // 2, alt - alt // 2, alt // 2]
+        return ",".join( str(x) for x in depths )
+    
+    return "0,0,0,0"
+
+def vep_allele(ref, alt):
+    """ get the allele as written by VEP, which trims a shared first base
+    """
+    
+    if len(ref) != len(alt) and ref[0] == alt[0]:
+        return alt[1:] or "-"
+    
+    return alt
+
+def allele_value(values, allele):
+    """ get the value for an allele from an INFO value, which can have one
+    value per alternate allele (Number=A), or a single value. Flags don't have
+    a value, so give a blank string.
+    """
+    
+    if not isinstance(values, str):
+        return ""
+    
+    values = values.split(",")
+    return values[allele - 1] if len(values) > 1 else values[0]
+
+def parse_float(value):
+    """ convert an allele frequency to a float, or None if missing
+    
+    Values which aren't text (e.g. True for an INFO field given as a flag, or
+    None) are missing, rather than converted to numbers.
+    """
+    
+    if not isinstance(value, str):
+        return None
+    
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def get_annotation(info, csq_fields, ref, alt, allele):
+    """ get the consequence, symbol and population frequency for an allele
+    
+    Args:
+        info: dictionary of INFO values
+        csq_fields: list of VEP CSQ field names (empty without a CSQ field)
+        ref: reference allele
+        alt: alternate allele
+        allele: index of the alternate allele
+    
+    Returns:
+        tuple of (consequence, symbol, max_af). The consequence is the most
+        severe of any VEP consequences for the allele, and the symbol is from
+        the same transcript. max_af is NaN if no frequencies are given.
+    """
+    
+    consequence, symbol = "", ""
+    frequencies = []
+    
+    for key in CONSEQUENCE_FIELDS:
+        if key in info:
+            consequence = allele_value(info[key], allele)
+            break
+    
+    for key in SYMBOL_FIELDS:
+        if key in info:
+            symbol = allele_value(info[key], allele)
+            break
+    
+    for key in AF_FIELDS:
+        if key in info:
+            frequencies.append(parse_float(allele_value(info[key], allele)))
+    
+    if isinstance(info.get("CSQ"), str) and len(csq_fields) > 0:
+        target = vep_allele(ref, alt)
+        ranked = len(severity)
+        for entry in info["CSQ"].split(","):
+            entry = dict(zip(csq_fields, entry.split("|")))
+            if entry.get("Allele", target) != target:
+                continue
+            
+            frequencies += [ parse_float(entry[x]) for x in AF_FIELDS if entry.get(x) ]
+            for term in entry.get("Consequence", "").split("&"):
+                if term != "" and severity.get(term, len(severity)) < ranked:
+                    ranked = severity[term]
+                    consequence, symbol = term, entry.get("SYMBOL", "")
+    
+    frequencies = [ x for x in frequencies if x is not None ]
+    max_af = max(frequencies) if len(frequencies) > 0 else float("nan")
+    
+    return consequence, symbol, max_af
+
+def iter_vcf_records(path, regions=None):
+    """ extract candidates from a trio VCF, one record at a time
+    
+    Each alternate allele carried by the child is a candidate.
+    
+    Args:
+        path: path to plain or gzip (or bgzip) compressed VCF, with the child,
+            father and mother samples, see trio_columns().
+        regions: dictionary of regions per chromosome, from load_regions(). If
+            the VCF is bgzipped with a tabix index, only records within these
+            regions are read, otherwise this is ignored.
+    
+    Yields:
+        lists of values for the VCF_COLUMNS of each candidate
+    """
+    
+    with open_vcf(path) as handle:
+        samples, pedigree, csq_fields = parse_header(handle)
+        trio = trio_columns(samples, pedigree)
+        child_id = samples[trio[0]]
+        
+        lines = handle
+        if regions is not None and index_path(path) is not None:
+            lines = fetch_regions(path, regions)
+        
+        for line in lines:
+            fields = line.rstrip("\n").split("\t")
+            chrom, pos, ref, alts, info = fields[0], fields[1], fields[3], \
+                fields[4], fields[7]
+            if chrom.startswith("chr"):
+                chrom = chrom[3:]
+            
+            keys = fields[8].split(":")
+            members = [ dict(zip(keys, fields[9 + x].split(":"))) for x in trio ]
+            info = parse_info(info)
+            pp_dnm = parse_float(info.get("PP_DNM", "."))
+            
+            for allele, alt in enumerate(alts.split(","), start=1):
+                present = [ carries_allele(x.get("GT"), allele) for x in members ]
+                if alt in [".", "*"] or not present[0]:
+                    continue
+                
+                consequence, symbol, max_af = get_annotation(info, csq_fields,
+                    ref, alt, allele)
+                
+                yield [child_id, chrom, int(pos), ref, alt, consequence, symbol,
+                    max_af, pp_dnm] + [ read_depths(x, allele) for x in members ] + \
+                    present
+
+def iter_vcf_candidates(path, chunk_size, regions=None):
+    """ extract candidates from a trio VCF in chunks
+    
+    Args:
+        path: path to trio VCF, see iter_vcf_records()
+        chunk_size: maximum number of candidates per chunk
+        regions: dictionary of regions to read, see iter_vcf_records()
+    
+    Yields:
+        pandas DataFrames of candidates, with the columns of the candidates
+        table. Each chunk's index continues from the previous chunk.
+    """
+    
+    offset = 0
+    rows = []
+    for row in iter_vcf_records(path, regions):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield to_table(rows, offset)
+            offset += len(rows)
+            rows = []
+    
+    if len(rows) > 0 or offset == 0:
+        yield to_table(rows, offset)
+
+def to_table(rows, offset):
+    """ convert candidate rows to a DataFrame, with an index from an offset
+    """
+    
+    table = pandas.DataFrame.from_records(rows, columns=VCF_COLUMNS)
+    table.index = pandas.RangeIndex(offset, offset + len(table))
+    table["pp_dnm"] = table["pp_dnm"].astype(float)
+    
+    return table
@@ -0,0 +1,117 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+from __future__ import division
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy
+import pandas
+
+from denovoFilter.load_candidates import load_candidates
+from denovoFilter.most_severe import consequences
+
+def get_options():
+    """ get the command line options
+    """
+    
+    parser = argparse.ArgumentParser(description="Compare the memory used by "
+        "candidates loaded as text, and loaded with the typed schema.")
+    parser.add_argument("--candidates", type=int, default=1000000,
+        help="Number of candidates to simulate.")
+    parser.add_argument("--seed", type=int, default=1,
+        help="Seed for simulating the candidates.")
+    
+    return parser.parse_args()
+
+def simulate_candidates(path, count, seed):
+    """ write a table of simulated candidates
+    
+    Args:
+        path: path to write the table to
+        count: number of candidates
+        seed: seed for the random number generator
+    """
+    
+    state = numpy.random.RandomState(seed)
+    
+    def dp4(depth):
+        counts = state.poisson(depth, (count, 4))
+        return pandas.Series(counts[:, 0]).astype(str) + "," + \
+            pandas.Series(counts[:, 1]).astype(str) + "," + \
+            pandas.Series(counts[:, 2]).astype(str) + "," + \
+            pandas.Series(counts[:, 3]).astype(str)
+    
+    chroms = [ str(x) for x in range(1, 23) ] + ["X", "Y"]
+    bases = numpy.array(["A", "C", "G", "T"])
+    
+    candidates = pandas.DataFrame({
+        "person_stable_id": [ "DDDP{0}".format(x) for x in state.randint(100000, 113000, count) ],
+        "chrom": state.choice(chroms, count),
+        "pos": state.randint(1, 250000000, count),
+        "ref": bases[state.randint(0, 4, count)],
+        "alt": bases[state.randint(0, 4, count)],
+        "consequence": state.choice(consequences, count),
+        "symbol": [ "GENE{0}".format(x) for x in state.randint(0, 20000, count) ],
+        "max_af": numpy.where(state.random_sample(count) < 0.2, ".",
+            state.random_sample(count).round(5).astype(str)),
+        "pp_dnm": state.random_sample(count).round(5),
+        "dp4_child": dp4(15), "dp4_father": dp4(15), "dp4_mother": dp4(15),
+        "in_child_vcf": 1, "in_father_vcf": 0, "in_mother_vcf": 0})
+    
+    candidates.to_csv(path, sep="\t", index=False)
+
+def report(name, table, elapsed):
+    """ print the memory used by each column of a table
+    """
+    
+    usage = table.memory_usage(deep=True, index=False)
+    print("{0}: {1:.1f} MB, loaded in {2:.1f} s".format(name, usage.sum() / 1e6, elapsed))
+    for column, size in usage.items():
+        print("    {0:<17} {1:<10} {2:8.1f} MB".format(column,
+            str(table[column].dtype), size / 1e6))
+
+def main():
+    args = get_options()
+    
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "candidates.txt")
+        simulate_candidates(path, args.candidates, args.seed)
+        
+        start = time.time()
+        text = pandas.read_table(path, na_filter=False)
+        report("text columns", text, time.time() - start)
+        del text
+        
+        start = time.time()
+        typed = load_candidates(path)
+        report("typed columns", typed, time.time() - start)
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import division
+
+import argparse
+import time
+
+import numpy
+import pandas
+
+from denovoFilter.site_deviations import site_strand_bias
+from denovoFilter.exact_tests import fisher_exact
+
+def get_options():
+    """ get the command line options
+    """
+    
+    parser = argparse.ArgumentParser(description="Compare the throughput of "
+        "the per-site and batched strand bias tests.")
+    parser.add_argument("--sites", type=int, default=100000,
+        help="Number of sites to test.")
+    parser.add_argument("--depth", type=int, default=40,
+        help="Mean read count per strand and allele.")
+    parser.add_argument("--seed", type=int, default=1,
+        help="Seed for generating the site counts.")
+    
+    return parser.parse_args()
+
+def simulate_sites(count, depth, seed):
+    """ simulate the REF and ALT read counts for a set of sites
+    
+    Args:
+        count: number of sites
+        depth: mean read count per strand and allele
+        seed: seed for the random number generator
+    
+    Returns:
+        pandas DataFrame with ref_F, ref_R, alt_F and alt_R columns
+    """
+    
+    state = numpy.random.RandomState(seed)
+    
+    return pandas.DataFrame({"ref_F": state.poisson(depth, count),
+        "ref_R": state.poisson(depth, count),
+        "alt_F": state.poisson(depth / 2, count),
+        "alt_R": state.poisson(depth / 2, count)})
+
+def main():
+    args = get_options()
+    
+    sites = simulate_sites(args.sites, args.depth, args.seed)
+    
+    start = time.time()
+    per_site = sites.apply(site_strand_bias, axis=1)
+    per_site_time = time.time() - start
+    
+    start = time.time()
+    batched = fisher_exact(sites["ref_F"], sites["ref_R"], sites["alt_F"],
+        sites["alt_R"])
+    batched_time = time.time() - start
+    
+    delta = numpy.abs(per_site - batched) / numpy.maximum(per_site, 1e-300)
+    
+    print("per-site: {0:.2f} s ({1:.0f} sites/s)".format(per_site_time,
+        args.sites / per_site_time))
+    print("batched:  {0:.2f} s ({1:.0f} sites/s)".format(batched_time,
+        args.sites / batched_time))
+    print("max relative difference: {0:.3g}".format(delta.max()))
+
+if __name__ == '__main__':
+    main()
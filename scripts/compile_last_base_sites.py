@@ -0,0 +1,46 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import argparse
+
+from denovoFilter.change_last_base_sites import compile_last_base_sites
+
+def get_options():
+    """ get the command line options
+    """
+    
+    parser = argparse.ArgumentParser(description="Convert the JSON list of "
+        "conserved last base of exon sites into a compact binary file, for "
+        "use with --last-base-sites.")
+    parser.add_argument("--input", required=True,
+        help="Path to JSON file of [chrom, pos] pairs.")
+    parser.add_argument("--output", required=True,
+        help="Path to write the binary file to.")
+    
+    return parser.parse_args()
+
+def main():
+    args = get_options()
+    compile_last_base_sites(args.input, args.output)
+
+if __name__ == '__main__':
+    main()
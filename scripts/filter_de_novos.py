@@ -27,6 +27,9 @@ import sys
 import pandas
 
 from denovoFilter.screen_candidates import screen_candidates
+from denovoFilter.load_candidates import write_candidates
+from denovoFilter.columnar import table_format
+from denovoFilter.regions import load_regions
 from denovoFilter.preliminary_filtering import check_coding
 from denovoFilter.filter_denovogear_sites import filter_denovogear_sites
 from denovoFilter.missing_indels import filter_missing_indels
@@ -40,7 +43,18 @@ def get_options():
     parser = argparse.ArgumentParser(description="Filters candidate de novo "
         "variants for sites with good characteristics.")
     parser.add_argument("--de-novos",
-        help="Path to file listing candidate de novos.")
+        help="Path to file listing candidate de novos. Parquet (.parquet) and "
+            "Arrow (.arrow or .feather) files are loaded without parsing, trio "
+            "VCFs (.vcf or .vcf.gz) are read directly, otherwise this is a "
+            "tab-separated file.")
+    parser.add_argument("--manifest",
+        help="Path to file listing per-trio files of candidate de novos, one "
+            "path per line, to use instead of --de-novos. The files are "
+            "loaded in parallel, and files which can't be loaded are reported "
+            "and skipped.")
+    parser.add_argument("--workers", type=int,
+        help="Number of processes to load the files in --manifest with. "
+            "Defaults to the number of CPUs.")
     parser.add_argument("--de-novos-indels",
         help="Path to file listing candidate de novos indels (not found in"
             "the standard de novo filtering).")
@@ -50,9 +64,13 @@ def get_options():
         help="Path to file listing problematic samples for the denovogear calls.")
     parser.add_argument("--sample-fails-indels",
         help="Path to file listing problematic samples for the indel calls.")
+    parser.add_argument("--mask-regions", nargs="+",
+        help="Paths to BED files (optionally gzipped) of regions to exclude "
+            "candidates from, in addition to the segdup regions.")
     parser.add_argument("--last-base-sites",
         help="Path to file of all conserved last base of exon sites in genome,"
-            " default is to not change anything if this option is not used.")
+            " either as JSON, or converted with compile_last_base_sites.py. "
+            "Default is to not change anything if this option is not used.")
     
     parser.add_argument("--fix-missing-genes", action='store_true', default=False,
         help="Whether to attempt re-annotation of gene symbols for variants"
@@ -69,32 +87,86 @@ def get_options():
             
     parser.add_argument("--build", default='grch37',
         help="Genome build to use to pick missing symbols.")
+    parser.add_argument("--gene-annotations",
+        help="Path to GTF, GFF3 or BED file (optionally gzipped) of genes for "
+            "the genome build. Missing symbols are found from this file, "
+            "rather than by querying Ensembl.")
+    parser.add_argument("--prefetch-genes", action='store_true', default=False,
+        help="Get genes from Ensembl once per 1 Mb region around the variants "
+            "lacking symbols, rather than once per variant.")
+    parser.add_argument("--verbose", action='store_true', default=False,
+        help="Print the Ensembl requests for missing symbols as they are made. "
+            "These are printed to standard out, so also use --output.")
+    
+    parser.add_argument("--region", nargs="+",
+        help="Only screen candidates within these regions, given as "
+            "chrom:start-end (1-based, inclusive), or chrom for a whole "
+            "chromosome. Bgzipped candidate files with a tabix index are read "
+            "from the regions, without reading the whole file.")
+    parser.add_argument("--regions-file",
+        help="Path to BED file (optionally gzipped) of regions to screen "
+            "candidates within, as for --region.")
+    parser.add_argument("--chunk-size", type=int,
+        help="Parse and screen the candidates in chunks of this many rows, "
+            "to limit memory use. The screened candidates are still joined in "
+            "memory. By default all candidates are loaded at once.")
     
     parser.add_argument("--output", default=sys.stdout,
-        help="Path to file for filtered de novos. Defaults to standard out.")
+        help="Path to file for filtered de novos. Defaults to standard out. "
+            "Paths ending in .parquet or .arrow (or .feather) are written as "
+            "Parquet or Arrow files, keeping the column types, otherwise this "
+            "writes a tab-separated file.")
+    parser.add_argument("--compression",
+        help="Compression for the output, e.g. zstd, lz4 or snappy for Parquet "
+            "and Arrow files, or gzip for tab-separated files. Defaults to "
+            "snappy for Parquet, lz4 for Arrow, and none for text. Only "
+            "used with --output.")
     
     args = parser.parse_args()
     
+    if args.de_novos is not None and args.manifest is not None:
+        parser.error("use either --de-novos or --manifest, not both")
+    
+    if table_format(args.output) == "vcf":
+        parser.error("--output can't be written as a VCF")
+    
+    if args.compression is not None and args.output is sys.stdout:
+        parser.error("--compression needs an --output path")
+    
     return args
 
 def main():
     args = get_options()
+    regions = load_regions(args.region, args.regions_file)
     
     # set a blank dataframe
     de_novos = pandas.DataFrame(columns=["person_stable_id", "chrom", "pos",
         "ref", "alt", "symbol", "consequence", "max_af", "pp_dnm"])
     de_novos['pos'] = de_novos['pos'].astype(int)
     
-    denovogear = screen_candidates(args.de_novos, args.sample_fails,
+    # the candidates can be in one file, or split across per-trio files
+    manifest = args.manifest is not None
+    de_novos_path = args.manifest if manifest else args.de_novos
+    
+    denovogear = screen_candidates(de_novos_path, args.sample_fails,
         filter_denovogear_sites, maf=0.01, fix_symbols=args.fix_missing_genes,
-        annotate_only=args.annotate_only, build=args.build)
+        annotate_only=args.annotate_only, build=args.build,
+        mask_paths=args.mask_regions, gene_annotations=args.gene_annotations,
+        prefetch_symbols=args.prefetch_genes, chunk_size=args.chunk_size,
+        regions=regions, manifest=manifest, workers=args.workers,
+        verbose=args.verbose)
     
     indels = screen_candidates(args.de_novos_indels, args.sample_fails_indels,
         filter_missing_indels, maf=0.0001, fix_symbols=args.fix_missing_genes,
-        annotate_only=args.annotate_only, build=args.build)
+        annotate_only=args.annotate_only, build=args.build,
+        mask_paths=args.mask_regions, gene_annotations=args.gene_annotations,
+        prefetch_symbols=args.prefetch_genes, chunk_size=args.chunk_size,
+        regions=regions, verbose=args.verbose)
     
-    de_novos = de_novos.append(denovogear, ignore_index=True)
-    de_novos = de_novos.append(indels, ignore_index=True)
+    # combine the screened candidates, unless neither set was given
+    screened = [ x for x in [denovogear, indels] if x is not None ]
+    if len(screened) > 0:
+        de_novos = pandas.concat(screened, ignore_index=True)
     
     if not args.include_noncoding and not args.annotate_only:
         de_novos = de_novos[check_coding(de_novos)]
@@ -119,7 +191,7 @@ def main():
     ids = ['DDDP123847', 'DDDP138759', 'DDDP135949', 'DDDP100238', 'DDDP125725', 'DDDP118316']
     de_novos = de_novos[~de_novos.person_stable_id.isin(ids)]
     
-    de_novos.to_csv(args.output, sep= "\t", index=False, na_rep='NA')
+    write_candidates(de_novos, args.output, args.compression)
 
 if __name__ == '__main__':
     main()
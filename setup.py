@@ -29,12 +29,13 @@ setup(
     description = ("Filtering candidate de novo variants."),
     license = "MIT",
     packages=["denovoFilter"],
-    install_requires=['pandas >= 0.17.0',
-                      'numpy >= 1.6.1',
-                      'scipy >= 0.9.0',
-                      'intervaltree >= 2.0',
+    python_requires=">=3.8",
+    install_requires=['pandas >= 1.5.0',
+                      'numpy >= 1.23.0',
+                      'scipy >= 1.9.0',
     ],
-    package_data={"denovoFilter": ['data/segdup_regions.gz']},
+    package_data={"denovoFilter": ['data/segdup_regions.gz',
+        'data/segdup_regions.npz']},
     classifiers=[
         "Development Status :: 3 - Alpha",
         "License :: OSI Approved :: MIT License",
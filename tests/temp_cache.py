@@ -0,0 +1,58 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+import shutil
+import tempfile
+
+def use_temp_cache(test):
+    """ point the denovoFilter cache directory at a temporary folder for a test
+    
+    This keeps the files cached by the tests (threshold tables, compiled
+    segdups and gene symbols) out of the user's cache directory. The folder is
+    removed, and the previous cache directory restored, once the test finishes.
+    
+    Args:
+        test: unittest.TestCase instance, usually called from its setUp()
+    
+    Returns:
+        path to the temporary cache folder
+    """
+    
+    folder = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, folder)
+    test.addCleanup(restore_cache, os.environ.get('DENOVOFILTER_CACHE'))
+    os.environ['DENOVOFILTER_CACHE'] = folder
+    
+    return folder
+
+def restore_cache(previous):
+    """ restore the cache directory setting from before a test
+    
+    Args:
+        previous: previous value of DENOVOFILTER_CACHE, or None if it was unset
+    """
+    
+    if previous is None:
+        os.environ.pop('DENOVOFILTER_CACHE', None)
+    else:
+        os.environ['DENOVOFILTER_CACHE'] = previous
@@ -19,12 +19,17 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
+import io
 import unittest
+from contextlib import redirect_stderr
 
+import numpy
 from pandas import DataFrame, Series
 
 from denovoFilter.allele_counts import extract_alt_and_ref_counts, \
-    get_recurrent_genes, get_allele_counts, get_depths_and_proportions
+    get_recurrent_genes, get_allele_counts, get_depths_and_proportions, \
+    group_codes, sum_by_group, get_grouped_allele_counts
+from denovoFilter.trio_counts import TrioCounts
 from tests.compare_dataframes import CompareTables
 
 class TestAlleleCounts(CompareTables):
@@ -64,6 +69,20 @@ class TestAlleleCounts(CompareTables):
         
         self.compare_tables(extract_alt_and_ref_counts(self.variants), self.counts)
     
+    def test_extract_alt_and_ref_counts_malformed(self):
+        ''' check that malformed DP4 entries are reported, with zero counts
+        '''
+        
+        self.variants['dp4_mother'] = ['20,15,0,1', 'NA']
+        
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            counts = extract_alt_and_ref_counts(self.variants)
+        
+        self.assertIn('1 candidates have missing or malformed DP4', stderr.getvalue())
+        self.assertEqual(counts['mother_ref_F'].tolist(), [20, 0])
+        self.assertEqual(counts['child_alt_F'].tolist(), [30, 15])
+    
     def test_get_recurrent_genes(self):
         ''' check that we identify the recurrently mutated genes correctly
         '''
@@ -72,6 +91,17 @@ class TestAlleleCounts(CompareTables):
         
         self.assertEqual(get_recurrent_genes(variants), Series(['TEST1']))
     
+    def test_get_recurrent_genes_other_counts(self):
+        ''' check that counts for other candidates contribute to recurrence
+        '''
+        
+        variants = DataFrame({'symbol': ['TEST1', 'TEST1', 'TEST2', 'TEST3']})
+        
+        # e.g. counts for candidates which were dropped while loading
+        others = Series({'TEST2': 1, 'TEST4': 1})
+        self.assertEqual(sorted(get_recurrent_genes(variants, others)),
+            ['TEST1', 'TEST2'])
+    
     def test_get_allele_counts(self):
         ''' check that counting alleles works correctly
         '''
@@ -85,6 +115,51 @@ class TestAlleleCounts(CompareTables):
             'parent_alt': 3, 'parent_ref': 195}
         self.assertEqual(get_allele_counts(self.counts, gene=False), expected)
     
+    def test_group_codes(self):
+        ''' check that variants are assigned integer codes per group
+        '''
+        
+        variants = DataFrame({'symbol': ['TEST1', 'TEST2', 'TEST1', None]})
+        codes, n_groups = group_codes(variants, ['symbol'])
+        
+        self.assertEqual(codes.tolist(), [0, 1, 0, -1])
+        self.assertEqual(n_groups, 2)
+    
+    def test_sum_by_group(self):
+        ''' check that rows are summed within groups
+        '''
+        
+        values = numpy.array([[1, 2], [3, 4], [5, 6], [7, 8]])
+        codes = numpy.array([2, 0, 2, 0])
+        
+        totals = sum_by_group(values, codes, 4)
+        self.assertEqual(totals.tolist(), [[10, 12], [0, 0], [6, 8], [0, 0]])
+        
+        # and check we can cope without any rows
+        totals = sum_by_group(values[:0], codes[:0], 2)
+        self.assertEqual(totals.tolist(), [[0, 0], [0, 0]])
+    
+    def test_get_grouped_allele_counts(self):
+        ''' check that grouped counts match counting each group separately
+        '''
+        
+        counts = TrioCounts.from_columns(self.counts)
+        codes = numpy.array([0, 0])
+        
+        sites = get_grouped_allele_counts(counts, codes, 1)
+        self.assertEqual(sites.iloc[0].to_dict(), get_allele_counts(self.counts))
+        
+        genes = get_grouped_allele_counts(counts, codes, 1, gene=True)
+        self.assertEqual(genes.iloc[0].to_dict(),
+            get_allele_counts(self.counts, gene=True))
+        
+        # check when the variants are in separate groups
+        sites = get_grouped_allele_counts(counts, numpy.array([1, 0]), 2)
+        self.assertEqual(sites.iloc[0].to_dict(),
+            get_allele_counts(self.counts.iloc[[1]]))
+        self.assertEqual(sites.iloc[1].to_dict(),
+            get_allele_counts(self.counts.iloc[[0]]))
+    
     def test_get_depths_and_proportions(self):
         ''' check that counting the depths and proportions works correctly
         '''
@@ -19,13 +19,16 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
+import os
 import unittest
 import tempfile
 import json
 
 from pandas import DataFrame
 
-from denovoFilter.change_last_base_sites import change_conserved_last_base_consequence
+from denovoFilter.change_last_base_sites import change_conserved_last_base_consequence, \
+    site_keys, compile_last_base_sites, load_last_base_sites
+from denovoFilter.most_severe import to_categorical
 from tests.compare_dataframes import CompareTables
 
 class TestChangeLastBaseSites(CompareTables):
@@ -55,3 +58,72 @@ class TestChangeLastBaseSites(CompareTables):
         expected['consequence'] = ['conserved_exon_terminus_variant', 'synonymous_variant', 'frameshift_variant']
         
         self.compare_tables(change_conserved_last_base_consequence(variants, temp.name), expected)
+    
+    def test_site_keys(self):
+        ''' check that sites are encoded as 64-bit keys
+        '''
+        
+        keys, known = site_keys(['1', 'X', 'MT'], [10, 20, 30], ['1', 'X'])
+        self.assertEqual(keys.tolist(), [10, (1 << 32) + 20, 30])
+        self.assertEqual(known.tolist(), [True, True, False])
+    
+    def test_change_last_base_sites_categorical(self):
+        ''' check conversion for categorical consequences, and other chroms
+        '''
+        
+        temp = tempfile.NamedTemporaryFile(mode='w')
+        json.dump([['1', 10], ['X', 20]], temp)
+        temp.flush()
+        
+        # the third variant is on a chromosome without any sites, but has the
+        # same position as a site on another chromosome
+        variants = DataFrame({'chrom': ['X', '1', '2'],
+            'pos': [20, 20, 10],
+            'ref': ['A', 'G', 'G'],
+            'alt': ['C', 'T', 'C']}, index=[2, 1, 0])
+        variants['consequence'] = to_categorical(['missense_variant',
+            'synonymous_variant', 'stop_gained']).values
+        
+        changed = change_conserved_last_base_consequence(variants, temp.name)
+        self.assertEqual(list(changed['consequence'].astype(str)),
+            ['conserved_exon_terminus_variant', 'synonymous_variant', 'stop_gained'])
+    
+    def test_compile_last_base_sites(self):
+        ''' check that the binary file holds the same sites as the JSON
+        '''
+        
+        temp = tempfile.NamedTemporaryFile(mode='w')
+        json.dump([['X', 5], ['1', 10], ['2', 10], ['1', 10]], temp)
+        temp.flush()
+        
+        compiled = tempfile.NamedTemporaryFile()
+        compile_last_base_sites(temp.name, compiled.name)
+        
+        chroms, keys = load_last_base_sites(compiled.name)
+        self.assertEqual(chroms, ['1', '2', 'X'])
+        self.assertEqual(keys.tolist(), [10, (1 << 32) + 10, (2 << 32) + 5])
+        self.assertFalse(keys.flags.writeable)
+        
+        # the keys follow an 8-byte aligned header
+        self.assertEqual(os.path.getsize(compiled.name) % 8, 0)
+        
+        # and the JSON file gives the same sites
+        json_chroms, json_keys = load_last_base_sites(temp.name)
+        self.assertEqual(json_chroms, chroms)
+        self.assertEqual(json_keys.tolist(), keys.tolist())
+        
+        variants = DataFrame({'chrom': ['1', '2', 'X', 'X'], 'pos': [10, 11, 5, 10],
+            'ref': ['A', 'G', 'T', 'T'], 'alt': ['C', 'T', 'G', 'G'],
+            'consequence': ['missense_variant'] * 4})
+        
+        changed = change_conserved_last_base_consequence(variants, compiled.name)
+        self.assertEqual(list(changed['consequence']),
+            ['conserved_exon_terminus_variant', 'missense_variant',
+            'conserved_exon_terminus_variant', 'missense_variant'])
+        
+        # files without any sites are fine too
+        with open(temp.name, 'w') as handle:
+            json.dump([], handle)
+        compile_last_base_sites(temp.name, compiled.name)
+        changed = change_conserved_last_base_consequence(variants, compiled.name)
+        self.assertEqual(list(changed['consequence']), list(variants['consequence']))
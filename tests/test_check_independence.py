@@ -54,6 +54,27 @@ class TestCheckIndependence(unittest.TestCase):
         status = person_recurrence(self.variants)
         self.assertTrue(all(status == Series([True, False])))
     
+    def test_person_recurrence_groups(self):
+        ''' check that we keep the first of the most severe variants per gene
+        '''
+        
+        variants = DataFrame({'person_stable_id': ['a', 'a', 'b', 'a', 'a', 'b'],
+            'symbol': ['TEST1', 'TEST1', 'TEST1', 'TEST1', 'TEST2', 'TEST1'],
+            'consequence': ['missense_variant', 'stop_gained',
+                'synonymous_variant', 'stop_gained', 'intron_variant',
+                'synonymous_variant']}, index=[10, 5, 7, 3, 1, 0])
+        
+        status = person_recurrence(variants)
+        self.assertEqual(list(status.index), [10, 5, 7, 3, 1, 0])
+        self.assertEqual(status.tolist(), [True, False, False, True, False, True])
+        
+        # recurrent variants need consequences we can rank
+        variants['consequence'] = ['missense_variant', 'unknown_variant',
+            'synonymous_variant', 'stop_gained', 'intron_variant',
+            'synonymous_variant']
+        with self.assertRaises(KeyError):
+            person_recurrence(variants)
+    
     def test_family_recurrence(self):
         ''' test that family_recurrence() works correctly
         '''
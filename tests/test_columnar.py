@@ -0,0 +1,130 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+from pandas import DataFrame, Series
+
+from denovoFilter.columnar import pyarrow, table_format, read_columnar, \
+    iter_columnar, write_columnar
+from denovoFilter.load_candidates import load_candidates, write_candidates
+from denovoFilter.most_severe import to_categorical
+
+class TestColumnar(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.table = DataFrame({'chrom': Series(['1', '1', 'X'], dtype='category'),
+            'pos': numpy.array([100, 200, 300], dtype=numpy.int32),
+            'consequence': to_categorical(Series(['missense_variant',
+                'stop_gained', 'missense_variant'])),
+            'max_af': numpy.array([0.001, numpy.nan, 0.0])})
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_table_format(self):
+        ''' check that formats are identified from the extension
+        '''
+        
+        self.assertEqual(table_format('a.parquet'), 'parquet')
+        self.assertEqual(table_format('a.PQ'), 'parquet')
+        self.assertEqual(table_format('a.arrow'), 'arrow')
+        self.assertEqual(table_format('a.feather'), 'arrow')
+        self.assertEqual(table_format('a.txt'), 'text')
+        self.assertEqual(table_format('a.txt.gz'), 'text')
+        self.assertEqual(table_format('a.vcf.gz'), 'vcf')
+        
+        # file handles are written as text
+        with open(os.path.join(self.folder, 'a.parquet'), 'w') as handle:
+            self.assertEqual(table_format(handle), 'text')
+    
+    @unittest.skipIf(pyarrow is None, 'needs pyarrow')
+    def test_write_columnar(self):
+        ''' check that tables keep their types in Parquet and Arrow files
+        '''
+        
+        for name in ['table.parquet', 'table.arrow']:
+            for compression in [None, 'zstd', 'uncompressed']:
+                path = os.path.join(self.folder, name)
+                write_columnar(self.table, path, compression)
+                loaded = read_columnar(path)
+                
+                self.assertTrue(loaded.equals(self.table))
+                self.assertTrue(loaded['consequence'].cat.ordered)
+    
+    @unittest.skipIf(pyarrow is None, 'needs pyarrow')
+    def test_read_columnar_columns(self):
+        ''' check that only the requested columns are loaded
+        '''
+        
+        path = os.path.join(self.folder, 'table.parquet')
+        write_columnar(self.table, path)
+        
+        loaded = read_columnar(path, columns=['pos', 'chrom', 'missing'])
+        self.assertEqual(list(loaded.columns), ['chrom', 'pos'])
+    
+    @unittest.skipIf(pyarrow is None, 'needs pyarrow')
+    def test_iter_columnar(self):
+        ''' check that chunks continue the index of the previous chunk
+        '''
+        
+        for name in ['table.parquet', 'table.arrow']:
+            path = os.path.join(self.folder, name)
+            write_columnar(self.table, path)
+            
+            chunks = list(iter_columnar(path, 2, columns=['pos']))
+            self.assertEqual([ list(x.index) for x in chunks ], [[0, 1], [2]])
+            self.assertEqual(list(chunks[1]['pos']), [300])
+    
+    @unittest.skipIf(pyarrow is None, 'needs pyarrow')
+    def test_load_candidates(self):
+        ''' check that candidates from other tools get the declared types
+        '''
+        
+        path = os.path.join(self.folder, 'candidates.parquet')
+        table = DataFrame({'person_stable_id': ['a', 'b'], 'chrom': [1, 2],
+            'pos': [100, 200], 'ref': ['A', 'G'], 'alt': ['C', 'T'],
+            'symbol': ['GENE1', None], 'consequence': ['missense_variant',
+            'stop_gained'], 'max_af': ['0.01,0.5', None], 'pp_dnm': [0.5, None],
+            'dp4_child': ['10,10,5,5'] * 2, 'dp4_father': ['10,10,0,0'] * 2,
+            'dp4_mother': ['10,10,0,0'] * 2, 'in_child_vcf': [1, 1],
+            'in_father_vcf': [0, 0], 'in_mother_vcf': [0, 0]})
+        write_columnar(table, path)
+        
+        candidates = load_candidates(path)
+        
+        self.assertEqual(list(candidates['chrom']), ['1', '2'])
+        self.assertEqual(list(candidates['symbol']), ['GENE1', ''])
+        self.assertEqual(candidates['symbol'].dtype.name, 'category')
+        self.assertEqual(candidates['pos'].dtype, numpy.int32)
+        self.assertEqual(candidates['in_child_vcf'].dtype, numpy.int8)
+        self.assertAlmostEqual(candidates['max_af'][0], 0.01, places=6)
+        self.assertTrue(numpy.isnan(candidates['pp_dnm'][1]))
+        
+        # and candidates written by write_candidates load unchanged
+        write_candidates(candidates, path)
+        self.assertTrue(load_candidates(path).equals(candidates))
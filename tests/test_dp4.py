@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import unittest
+
+import numpy
+from pandas import DataFrame, Series
+
+from denovoFilter.dp4 import parse_dp4_column, parse_dp4, dp4_views
+
+class TestDP4(unittest.TestCase):
+    
+    def setUp(self):
+        
+        self.variants = DataFrame({'person_stable_id': ['a', 'b'],
+            'dp4_child': ['20,15,30,25', '15,15,15,15'],
+            'dp4_mother': ['20,15,0,1', '20,20,0,0'],
+            'dp4_father': ['30,30,0,1', '30,30,0,1'],
+            })
+    
+    def test_parse_dp4_column(self):
+        ''' check that a column of DP4 strings is parsed correctly
+        '''
+        
+        counts, valid = parse_dp4_column(Series(['20,15,30,25', '1,2,3,4']))
+        self.assertEqual(counts.tolist(), [[20, 15, 30, 25], [1, 2, 3, 4]])
+        self.assertEqual(valid.tolist(), [True, True])
+    
+    def test_parse_dp4_column_malformed(self):
+        ''' check that malformed and missing DP4 entries are masked
+        '''
+        
+        values = Series(['20,15,30,25', '1,2,3', None, '', '1,a,3,4', ' 5, 6,7,8'])
+        counts, valid = parse_dp4_column(values)
+        
+        self.assertEqual(valid.tolist(), [True, False, False, False, False, True])
+        self.assertEqual(counts.tolist(), [[20, 15, 30, 25], [0, 0, 0, 0],
+            [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [5, 6, 7, 8]])
+        
+        # entries with empty fields pass the quick checks, but can't be parsed
+        counts, valid = parse_dp4_column(Series(['1,,2,3', '4,5,6,7']))
+        self.assertEqual(valid.tolist(), [False, True])
+        self.assertEqual(counts.tolist(), [[0, 0, 0, 0], [4, 5, 6, 7]])
+        
+        counts, valid = parse_dp4_column(Series(['1,,2,3']))
+        self.assertEqual(valid.tolist(), [False])
+    
+    def test_parse_dp4(self):
+        ''' check that the DP4 columns for all trio members are combined
+        '''
+        
+        counts, valid = parse_dp4(self.variants)
+        
+        self.assertEqual(counts.shape, (2, 3, 4))
+        self.assertEqual(counts[0].tolist(), [[20, 15, 30, 25], [30, 30, 0, 1],
+            [20, 15, 0, 1]])
+        self.assertEqual(valid.tolist(), [True, True])
+        
+        # a malformed entry in any member invalidates the candidate
+        self.variants['dp4_father'] = ['30,30,0,1', 'NA']
+        counts, valid = parse_dp4(self.variants)
+        self.assertEqual(valid.tolist(), [True, False])
+        self.assertEqual(counts[1, 1].tolist(), [0, 0, 0, 0])
+    
+    def test_dp4_views(self):
+        ''' check that the named columns are views into the counts array
+        '''
+        
+        counts, valid = parse_dp4(self.variants)
+        columns = dp4_views(counts)
+        
+        self.assertEqual(len(columns), 12)
+        self.assertEqual(columns['child_alt_F'].tolist(), [30, 15])
+        self.assertEqual(columns['mother_alt_R'].tolist(), [1, 0])
+        self.assertTrue(numpy.shares_memory(columns['father_ref_R'], counts))
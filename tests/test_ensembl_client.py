@@ -0,0 +1,270 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import json
+import random
+import re
+import socket
+import threading
+import time
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from denovoFilter.ensembl_client import TokenBucket, retry_wait, EnsemblClient
+
+GENES = [('6', 157406039, 157863125, 'ARID1B'), ('X', 76760356, 77041755, 'ATRX')]
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    ''' local stand-in for the Ensembl REST server
+    
+    Regions return the genes overlapping them, ordered by start (or in reverse
+    order, if set to, to check clients don't rely on the order). The server can
+    be set to respond with a number of errors before answering, and to take a
+    while to answer each request.
+    '''
+    
+    daemon_threads = True
+    
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.paths = []
+        self.clients = set()
+        self.errors = []
+        self.latency = 0.0
+        self.genes = GENES
+        self.reverse = False
+
+class StandInHandler(BaseHTTPRequestHandler):
+    
+    protocol_version = 'HTTP/1.1'
+    
+    # buffer the headers and body, to send them together
+    wbufsize = -1
+    
+    def log_message(self, *args):
+        pass
+    
+    def respond(self, status, body, headers=None):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.paths.append(self.path)
+            server.clients.add(self.client_address)
+            error = server.errors.pop(0) if len(server.errors) > 0 else None
+        
+        time.sleep(server.latency)
+        
+        if error is not None:
+            return self.respond(error[0], '{"error": "busy"}', error[1])
+        
+        match = re.search(r'region/human/(\w+):(\d+)-(\d+)', self.path)
+        chrom, start, end = match.group(1), int(match.group(2)), int(match.group(3))
+        genes = [ {'id': name, 'start': x, 'end': y, 'external_name': name,
+                'seq_region_name': seq, 'feature_type': 'gene'}
+            for seq, x, y, name in sorted(server.genes, key=lambda x: x[1],
+                reverse=server.reverse)
+            if seq == chrom and x <= end and y >= start ]
+        
+        self.respond(200, json.dumps(genes))
+
+class TestEnsemblClient(unittest.TestCase):
+    
+    def setUp(self):
+        self.server = StandInServer()
+        self.thread = threading.Thread(target=self.server.serve_forever,
+            kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+        
+        url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+        self.client = EnsemblClient(server=url, workers=4, rate=1000,
+            unavailable_wait=0.01)
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_retry_wait(self):
+        ''' check that we find how long to wait from the response headers
+        '''
+        
+        self.assertEqual(retry_wait({'retry-after': '1.5'}), 1.5)
+        self.assertEqual(retry_wait({'x-ratelimit-reset': '2'}), 2)
+        self.assertIsNone(retry_wait({}))
+    
+    def test_token_bucket(self):
+        ''' check that the token bucket limits the request rate
+        '''
+        
+        bucket = TokenBucket(rate=100, capacity=5)
+        start = time.time()
+        for x in range(25):
+            bucket.acquire()
+        
+        # the first five tokens are available at once, the rest take 0.01 s each
+        self.assertGreater(time.time() - start, 0.18)
+        
+        bucket.pause(0.1)
+        start = time.time()
+        bucket.acquire()
+        self.assertGreater(time.time() - start, 0.09)
+    
+    def test_get_gene_id(self):
+        ''' check that we get the first gene overlapping a region
+        '''
+        
+        self.assertEqual(self.client.get_gene_id('6', 157528051, 157528051), 'ARID1B')
+        self.assertEqual(self.client.get_gene_id('2', 129119889, 129119889), '')
+        self.assertEqual(self.server.paths[0],
+            '/overlap/region/human/6:157528051-157528051?feature=gene')
+    
+    def test_get_gene_ids(self):
+        ''' check that duplicate regions are only requested once
+        '''
+        
+        regions = [('6', 157528051, 157528051), ('X', 76760356, 76760356),
+            ('2', 129119889, 129119889), ('6', 157528051, 157528051)]
+        
+        symbols = self.client.get_gene_ids(regions)
+        self.assertEqual(symbols, ['ARID1B', 'ATRX', '', 'ARID1B'])
+        self.assertEqual(len(self.server.paths), 3)
+    
+    def test_keep_alive(self):
+        ''' check that each worker reuses its connection
+        '''
+        
+        regions = [ ('1', x, x) for x in range(100) ]
+        self.client.get_gene_ids(regions)
+        
+        self.assertEqual(len(self.server.paths), 100)
+        self.assertLessEqual(len(self.server.clients), self.client.workers)
+    
+    def test_retries(self):
+        ''' check that requests are retried when the server is busy
+        '''
+        
+        self.server.errors = [(429, {'Retry-After': '0.2'}), (503, {})]
+        
+        start = time.time()
+        self.assertEqual(self.client.get_gene_id('X', 76760356, 76760356), 'ATRX')
+        self.assertGreater(time.time() - start, 0.2)
+        self.assertEqual(len(self.server.paths), 3)
+        
+        # requests fail after too many attempts
+        self.server.errors = [(503, {})] * 5
+        with self.assertRaises(ValueError):
+            self.client.get_gene_id('X', 76760356, 76760356)
+        
+        # and fail immediately for other errors
+        self.server.errors = [(400, {})]
+        with self.assertRaises(ValueError):
+            self.client.get_gene_id('X', 76760356, 76760356)
+    
+    def test_connection_errors(self):
+        ''' check that we back off when connections keep failing
+        '''
+        
+        # find a port with nothing listening on it
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        
+        client = EnsemblClient(server='http://127.0.0.1:{0}'.format(port),
+            attempts=4, backoff=0.1)
+        
+        # the retries wait for 0, 0.1 and 0.2 seconds
+        start = time.time()
+        with self.assertRaises(ValueError):
+            client.get_gene_id('X', 76760356, 76760356)
+        self.assertGreater(time.time() - start, 0.3)
+        self.assertLess(time.time() - start, 0.7)
+        client.close()
+    
+    def test_throughput(self):
+        ''' check that slow requests run concurrently
+        '''
+        
+        self.server.latency = 0.05
+        regions = [ ('1', x, x) for x in range(40) ]
+        
+        start = time.time()
+        self.client.get_gene_ids(regions)
+        
+        # 40 requests taking 0.05 s each would take 2 s one after another
+        self.assertLess(time.time() - start, 1.0)
+    
+    def test_prefetch_gene_ids(self):
+        ''' check that prefetching genes gives the same symbols as per region
+        '''
+        
+        rand = random.Random(1)
+        genes = []
+        for i in range(300):
+            start = rand.randint(1, 5000000)
+            genes.append(('1', start, start + rand.randint(0, 100000), 'GENE{0}'.format(i)))
+        self.server.genes = genes + [('2', 999000, 1001000, 'EDGE')]
+        
+        regions = [ ('1', x, x + rand.randint(0, 10)) for x in
+            (rand.randint(1, 5200000) for i in range(200)) ]
+        regions += [('2', 999500, 999500), ('2', 1000500, 1000500),
+            ('2', 1001001, 1001001), ('3', 100, 100)]
+        
+        expected = self.client.get_gene_ids(regions)
+        requested = len(self.server.paths)
+        symbols = self.client.prefetch_gene_ids(regions, tile_size=1000000)
+        
+        self.assertEqual(symbols, expected)
+        self.assertEqual(symbols[-4:], ['EDGE', 'EDGE', '', ''])
+        
+        # only one request per tile containing a region
+        self.assertEqual(len(self.server.paths) - requested, 6 + 2 + 1)
+        self.assertEqual(self.client.prefetch_gene_ids([]), [])
+    
+    def test_unnamed_genes(self):
+        ''' check that genes without names are skipped, in any order
+        '''
+        
+        self.server.reverse = True
+        self.server.genes = GENES + [('X', 76700000, 76800000, None),
+            ('X', 76760380, 76760500, 'LATER'), ('1', 100, 200, None)]
+        regions = [('X', 76760400, 76760400), ('1', 150, 150)]
+        
+        self.assertEqual(self.client.get_gene_ids(regions), ['ATRX', ''])
+        self.assertEqual(self.client.prefetch_gene_ids(regions), ['ATRX', ''])
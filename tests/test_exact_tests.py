@@ -0,0 +1,98 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import unittest
+
+import numpy
+import scipy.stats
+
+from denovoFilter.exact_tests import bisect_last, fisher_exact, binom_test
+
+class TestExactTests(unittest.TestCase):
+    
+    def test_bisect_last(self):
+        ''' check that we find the last value where a condition holds
+        '''
+        
+        limits = numpy.array([3, 0, 10, 7])
+        condition = lambda x, i: x <= limits[i]
+        
+        found = bisect_last(condition, [0, 0, 0, 5], [10, 10, 10, 6])
+        self.assertEqual(found.tolist(), [3, 0, 10, 6])
+    
+    def test_fisher_exact(self):
+        ''' check the batched fisher exact test matches scipy
+        '''
+        
+        tables = [[5, 30, 10, 10], [30, 30, 10, 10], [1, 0, 0, 1],
+            [100, 0, 0, 100], [2, 2, 2, 2], [3, 17, 40, 1], [0, 4, 9, 2],
+            [12, 3, 1, 20], [60, 45, 22, 31]]
+        
+        ref_F, ref_R, alt_F, alt_R = zip(*tables)
+        pvalues = fisher_exact(ref_F, ref_R, alt_F, alt_R)
+        
+        for (a, b, c, d), pvalue in zip(tables, pvalues):
+            expected = scipy.stats.fisher_exact([[a, b], [c, d]])[1]
+            self.assertAlmostEqual(pvalue, expected, places=14)
+        
+        self.assertAlmostEqual(pvalues[0], 0.010024722592, places=11)
+    
+    def test_fisher_exact_untestable(self):
+        ''' check that tables which can't be tested give p-values of 1.0
+        '''
+        
+        # tables with a row or column of zeros, or with negative counts
+        pvalues = fisher_exact([0, 0, 5, -1], [0, 5, 0, 2], [0, 0, 3, 3],
+            [0, 3, 0, 4])
+        self.assertEqual(pvalues.tolist(), [1.0, 1.0, 1.0, 1.0])
+    
+    def test_fisher_exact_large_counts(self):
+        ''' check that extreme tables match scipy
+        '''
+        
+        pvalue = fisher_exact([1], [2], [9], [84419233])[0]
+        expected = scipy.stats.fisher_exact([[1, 2], [9, 84419233]])[1]
+        self.assertAlmostEqual(pvalue / expected, 1.0, places=10)
+    
+    def test_binom_test(self):
+        ''' check the batched binomial test against known p-values
+        '''
+        
+        alt = [3, 1, 0, 1]
+        ref = [195, 100, 50, 100]
+        expected = [0.007628904258026024, 0.18307032892094904, 1.0,
+            0.18307032892094904]
+        
+        for x, y in zip(binom_test(alt, ref, 0.002), expected):
+            self.assertAlmostEqual(x, y, places=14)
+        
+        # check counts on either side of the expected count
+        pvalues = binom_test([10, 2, 9], [10, 18, 1], 0.3)
+        self.assertAlmostEqual(pvalues[0], 0.08344502962981207, places=14)
+        self.assertAlmostEqual(pvalues[1], 0.05262794872972706, places=14)
+        self.assertAlmostEqual(pvalues[2], 0.00014368589999999996, places=14)
+    
+    def test_binom_test_empty(self):
+        ''' check that sites without reads, or without any sites, work
+        '''
+        
+        self.assertEqual(binom_test([0], [0], 0.002).tolist(), [1.0])
+        self.assertEqual(binom_test([], [], 0.002).tolist(), [])
@@ -19,11 +19,21 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
+import os
+import shutil
+import tempfile
 import unittest
 
+import numpy
 from pandas import DataFrame, Series
 
-from denovoFilter.exclude_segdups import check_segdups
+from denovoFilter.exclude_segdups import check_segdups, merge_regions, \
+    in_regions, load_segdups, compile_segdups, read_segdup_regions, \
+    read_compiled_segdups, file_checksum
+from tests.temp_cache import use_temp_cache
+
+SOURCE = os.path.join(os.path.dirname(__file__), '..', 'denovoFilter', 'data',
+    'segdup_regions.gz')
 
 class TestExcludeSegdups(unittest.TestCase):
     
@@ -44,3 +54,90 @@ class TestExcludeSegdups(unittest.TestCase):
         
         self.assertEqual(check_segdups(variants), expected)
     
+    def test_exclude_segdups_missing_chrom(self):
+        ''' check that chromosomes lacking segdups don't raise errors
+        '''
+        
+        variants = DataFrame({'chrom': ['1', 'UNKNOWN'], 'pos': [1379895, 1379895]})
+        
+        self.assertEqual(check_segdups(variants), [False, True])
+    
+    def test_merge_regions(self):
+        ''' check that overlapping regions are merged
+        '''
+        
+        starts = numpy.array([50, 10, 15, 30, 40])
+        ends = numpy.array([60, 20, 25, 40, 45])
+        
+        starts, ends = merge_regions(starts, ends)
+        self.assertEqual(starts.tolist(), [10, 30, 50])
+        self.assertEqual(ends.tolist(), [25, 45, 60])
+    
+    def test_in_regions(self):
+        ''' check that we find positions within regions
+        '''
+        
+        regions = {'1': (numpy.array([10, 30]), numpy.array([20, 40]))}
+        chroms = Series(['1', '1', '1', '1', '1', '2'])
+        positions = Series([9, 10, 19, 20, 35, 15])
+        
+        self.assertEqual(in_regions(regions, chroms, positions).tolist(),
+            [False, True, True, False, True, False])
+    
+    def test_load_segdups(self):
+        ''' check that the segdups are only loaded once per process
+        '''
+        
+        segdups = load_segdups()
+        self.assertIs(load_segdups(), segdups)
+        
+        starts, ends = segdups['1']
+        self.assertFalse(starts.flags.writeable)
+        self.assertFalse(ends.flags.writeable)
+    
+    def test_compile_segdups(self):
+        ''' check that the compiled segdups match the original table
+        '''
+        
+        folder = use_temp_cache(self)
+        
+        # the regions are compiled into the cache directory by default
+        compile_segdups()
+        path = os.path.join(folder, 'segdup_regions.npz')
+        compiled = numpy.load(path)
+        
+        original = read_segdup_regions(SOURCE)
+        for chrom, (starts, ends) in original.items():
+            self.assertEqual(compiled['starts_' + chrom].dtype, numpy.int32)
+            self.assertEqual(compiled['starts_' + chrom].tolist(), starts.tolist())
+            self.assertEqual(compiled['ends_' + chrom].tolist(), ends.tolist())
+        self.assertEqual(str(compiled['source_sha256']), file_checksum(SOURCE))
+        compiled.close()
+    
+    def test_read_compiled_segdups(self):
+        ''' check that compiled segdups are only used if the table is unchanged
+        '''
+        
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, 'segdup_regions.npz')
+            self.assertIsNone(read_compiled_segdups(path, file_checksum(SOURCE)))
+            
+            compile_segdups(destination=path)
+            segdups = read_compiled_segdups(path, file_checksum(SOURCE))
+            self.assertEqual(sorted(segdups), sorted(read_segdup_regions(SOURCE)))
+            self.assertIsNone(read_compiled_segdups(path, 'changed'))
+            
+            # as are files which can't be read
+            with open(path, 'wb') as handle:
+                handle.write(b'not a table')
+            self.assertIsNone(read_compiled_segdups(path, file_checksum(SOURCE)))
+        finally:
+            shutil.rmtree(folder)
+    
+    def test_bundled_segdups_current(self):
+        ''' check that the bundled compiled segdups match the bundled table
+        '''
+        
+        path = os.path.join(os.path.dirname(SOURCE), 'segdup_regions.npz')
+        self.assertIsNotNone(read_compiled_segdups(path, file_checksum(SOURCE)))
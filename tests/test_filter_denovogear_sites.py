@@ -24,10 +24,13 @@ import unittest
 from pandas import DataFrame, Series
 
 from denovoFilter.filter_denovogear_sites import filter_denovogear_sites
+from tests.temp_cache import use_temp_cache
 
 class TestFilterDenovogearSites(unittest.TestCase):
     
     def setUp(self):
+        # keep the cached threshold tables out of the user's cache directory
+        use_temp_cache(self)
         
         self.variants = DataFrame({'person_stable_id': ['a', 'b'],
             'chrom': ['1', '1'],
@@ -50,6 +53,16 @@ class TestFilterDenovogearSites(unittest.TestCase):
         status = filter_denovogear_sites(self.variants, initial)
         self.assertTrue(all(status == Series([True, True])))
     
+    def test_filter_denovogear_sites_malformed_dp4(self):
+        ''' check that filter_denovogear_sites() fails malformed DP4 entries
+        '''
+        
+        initial = [True, True]
+        self.variants['dp4_child'] = ['20,15,30,25', '20,15,30,']
+        
+        status = filter_denovogear_sites(self.variants, initial)
+        self.assertTrue(all(status == Series([True, False])))
+    
     def test_filter_denovogear_sites_strand_bias(self):
         ''' check that filter_denovogear_sites() identifies strand biased sites
         '''
@@ -0,0 +1,159 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from pandas import DataFrame, Series
+
+from denovoFilter.gene_index import annotation_format, read_gene_annotations, \
+    build_gene_index, get_gene_index, find_overlapping_genes, GENE_INDEXES
+from denovoFilter.missing_symbols import fix_missing_gene_symbols
+
+class TestGeneIndex(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        
+        self.gtf = os.path.join(self.folder, 'genes.gtf.gz')
+        with gzip.open(self.gtf, 'wt') as handle:
+            handle.write('#!genome-build GRCh37\n')
+            handle.write('6\tensembl\tgene\t1000\t2000\t.\t+\t.\tgene_id "G1"; gene_name "LONG";\n')
+            handle.write('6\tensembl\ttranscript\t1000\t2000\t.\t+\t.\tgene_id "G1"; gene_name "TX";\n')
+            handle.write('6\tensembl\tgene\t1100\t1200\t.\t+\t.\tgene_id "G2"; gene_name "INNER";\n')
+            handle.write('6\tensembl\tgene\t3000\t4000\t.\t-\t.\tgene_id "G3"; gene_name "LATE";\n')
+            handle.write('chr6\tensembl\tgene\t2500\t2600\t.\t-\t.\tgene_id "G4";\n')
+        
+        self.gff = os.path.join(self.folder, 'genes.gff3')
+        with open(self.gff, 'w') as handle:
+            handle.write('##gff-version 3\n')
+            handle.write('X\tensembl\tncRNA_gene\t10\t20\t.\t+\t.\tID=gene:G5;Name=MIR1\n')
+            handle.write('X\tensembl\texon\t10\t20\t.\t+\t.\tName=EXON\n')
+        
+        self.bed = os.path.join(self.folder, 'genes.bed')
+        with open(self.bed, 'w') as handle:
+            handle.write('track name=genes\n')
+            handle.write('chr1\t99\t200\tARID1B\n')
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        GENE_INDEXES.clear()
+    
+    def test_annotation_format(self):
+        ''' check that the annotation format is picked from the path
+        '''
+        
+        self.assertEqual(annotation_format('genes.gtf.gz'), 'gtf')
+        self.assertEqual(annotation_format('genes.GFF3'), 'gff')
+        self.assertEqual(annotation_format('genes.gff.bgz'), 'gff')
+        self.assertEqual(annotation_format('genes.bed'), 'bed')
+        
+        with self.assertRaises(ValueError):
+            annotation_format('genes.txt')
+    
+    def test_read_gene_annotations(self):
+        ''' check that genes are loaded from GTF, GFF3 and BED files
+        '''
+        
+        genes = read_gene_annotations(self.gtf)
+        self.assertEqual(genes['symbol'].tolist(), ['LONG', 'INNER', 'LATE', ''])
+        self.assertEqual(genes['chrom'].tolist(), ['6'] * 4)
+        self.assertEqual(genes['start'].tolist(), [1000, 1100, 3000, 2500])
+        self.assertEqual(genes['end'].tolist(), [2000, 1200, 4000, 2600])
+        
+        genes = read_gene_annotations(self.gff)
+        self.assertEqual(genes['symbol'].tolist(), ['MIR1'])
+        
+        # BED starts are shifted to 1-based coordinates
+        genes = read_gene_annotations(self.bed)
+        self.assertEqual(genes['chrom'].tolist(), ['1'])
+        self.assertEqual(genes['start'].tolist(), [100])
+        self.assertEqual(genes['end'].tolist(), [200])
+        self.assertEqual(genes['symbol'].tolist(), ['ARID1B'])
+    
+    def test_find_overlapping_genes(self):
+        ''' check that we get the first overlapping gene, by start position
+        '''
+        
+        index = build_gene_index(read_gene_annotations(self.gtf))
+        
+        chroms = Series(['6', '6', '6', '6', '6', '6', 'chr6', '7'])
+        starts = Series([1150, 900, 2100, 2001, 3999, 2550, 2000, 1150])
+        ends = Series([1150, 999, 2200, 3000, 4500, 2550, 2000, 1150])
+        
+        # the region from 2001 to 3000 overlaps an unnamed gene before LATE
+        symbols = find_overlapping_genes(index, chroms, starts, ends)
+        self.assertEqual(symbols.tolist(),
+            ['LONG', '', '', 'LATE', 'LATE', '', 'LONG', ''])
+        
+        # a long gene earlier on the chromosome shadows a short gene, which
+        # still needs to be found when the region lies after the short gene
+        genes = DataFrame({'chrom': ['1', '1', '1'], 'start': [10, 20, 100],
+            'end': [1000, 30, 110], 'symbol': ['A', 'B', 'C']})
+        index = build_gene_index(genes)
+        symbols = find_overlapping_genes(index, Series(['1', '1', '1']),
+            Series([5, 105, 1001]), Series([25, 105, 1001]))
+        self.assertEqual(symbols.tolist(), ['A', 'A', ''])
+    
+    def test_find_overlapping_genes_unnamed(self):
+        ''' check that genes without symbols don't hide later named genes
+        '''
+        
+        genes = DataFrame({'chrom': ['1', '1'], 'start': [10, 20],
+            'end': [50, 40], 'symbol': ['', 'NAMED']})
+        index = build_gene_index(genes)
+        
+        symbols = find_overlapping_genes(index, Series(['1', '1']),
+            Series([25, 45]), Series([25, 45]))
+        self.assertEqual(symbols.tolist(), ['NAMED', ''])
+        
+        # a chromosome with only unnamed genes isn't indexed at all
+        genes['chrom'] = ['1', '2']
+        self.assertEqual(sorted(build_gene_index(genes)), ['2'])
+    
+    def test_get_gene_index(self):
+        ''' check that gene indexes are cached per build and path
+        '''
+        
+        index = get_gene_index(self.gtf, 'grch37')
+        self.assertIs(get_gene_index(self.gtf, 'grch37'), index)
+        self.assertIsNot(get_gene_index(self.gtf, 'grch38'), index)
+    
+    def test_fix_missing_gene_symbols(self):
+        ''' check that missing symbols are found from a local annotation file
+        '''
+        
+        variants = DataFrame({'chrom': ['6', '6', '6'], 'pos': [1150, 2100, 1990],
+            'ref': ['A', 'A', 'ACGTACGTACGT'], 'alt': ['G', 'G', 'A'],
+            'symbol': ['', 'KNOWN', '']})
+        
+        symbols = fix_missing_gene_symbols(variants, gene_annotations=self.gtf)
+        self.assertEqual(symbols.tolist(), ['LONG', 'KNOWN', 'LONG'])
+        
+        variants['pos'] = [900, 2100, 2550]
+        variants['ref'] = ['A', 'A', 'A']
+        symbols = fix_missing_gene_symbols(variants, gene_annotations=self.gtf)
+        self.assertEqual(symbols.tolist(), ['fake_symbol.6_900', 'KNOWN',
+            'fake_symbol.6_2550'])
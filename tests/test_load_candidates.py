@@ -0,0 +1,280 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+from pandas import DataFrame, Series
+
+from denovoFilter.regions import load_regions, pysam
+from denovoFilter.load_candidates import load_candidates, iter_candidates, \
+    parse_floats, write_candidates, apply_schema, restore_categories, \
+    concat_candidates, REQUIRED_COLUMNS
+
+HEADER = ['person_stable_id', 'chrom', 'pos', 'ref', 'alt', 'consequence',
+    'symbol', 'max_af', 'pp_dnm', 'dp4_child', 'dp4_father', 'dp4_mother',
+    'in_child_vcf', 'in_father_vcf', 'in_mother_vcf']
+
+class TestLoadCandidates(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'candidates.txt')
+        
+        rows = [['a', '1', '100', 'A', 'G', 'missense_variant', 'GENE1', '0.001',
+                '0.9', '10,10,5,5', '10,10,0,0', '10,10,0,0', '1', '0', '0'],
+            ['b', 'X', '200', 'C', 'T', 'stop_gained', '', '.', 'NA',
+                '10,10,5,5', '10,10,0,0', '10,10,0,0', '1', '0', '0'],
+            ['b', '1', '300', 'G', 'GA', 'intron_variant', 'GENE1', '0.01,0.5',
+                '0.5', '10,10,5,5', '10,10,0,0', '10,10,0,0', '1', '1', '0']]
+        
+        with open(self.path, 'w') as handle:
+            handle.write('\t'.join(HEADER) + '\n')
+            for row in rows:
+                handle.write('\t'.join(row) + '\n')
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_load_candidates(self):
+        ''' check that candidates are loaded with the declared types
+        '''
+        
+        candidates = load_candidates(self.path)
+        
+        self.assertEqual(candidates['pos'].dtype, numpy.int32)
+        self.assertEqual(candidates['in_father_vcf'].dtype, numpy.int8)
+        self.assertEqual(candidates['max_af'].dtype, numpy.float64)
+        self.assertEqual(candidates['pp_dnm'].dtype, numpy.float64)
+        for column in ['person_stable_id', 'chrom', 'symbol', 'consequence']:
+            self.assertEqual(candidates[column].dtype.name, 'category')
+        
+        # blank symbols stay blank, whereas missing frequencies are NaN
+        self.assertEqual(list(candidates['symbol']), ['GENE1', '', 'GENE1'])
+        self.assertEqual(list(candidates['chrom']), ['1', 'X', '1'])
+        self.assertTrue(numpy.isnan(candidates['max_af'][1]))
+        self.assertTrue(numpy.isnan(candidates['pp_dnm'][1]))
+        self.assertAlmostEqual(candidates['max_af'][2], 0.01, places=6)
+    
+    def test_iter_candidates(self):
+        ''' check that chunks continue the index of the previous chunk
+        '''
+        
+        chunks = list(iter_candidates(self.path, chunk_size=2))
+        
+        self.assertEqual([ len(x) for x in chunks ], [2, 1])
+        self.assertEqual(list(chunks[1].index), [2])
+        self.assertEqual(chunks[1]['pos'].dtype, numpy.int32)
+    
+    def test_load_candidates_columns(self):
+        ''' check that only the required columns are loaded
+        '''
+        
+        with open(self.path) as handle:
+            lines = handle.readlines()
+        
+        # add an extra column, which isn't used for filtering
+        with open(self.path, 'w') as handle:
+            for i, line in enumerate(lines):
+                handle.write(line.rstrip('\n') + '\t' + ('extra' if i == 0 else 'x') + '\n')
+        
+        self.assertIn('extra', load_candidates(self.path).columns)
+        
+        candidates = load_candidates(self.path, REQUIRED_COLUMNS)
+        self.assertEqual(sorted(candidates.columns), sorted(REQUIRED_COLUMNS))
+    
+    def test_load_candidates_predicate(self):
+        ''' check that candidates failing a predicate are dropped while parsing
+        '''
+        
+        candidates = load_candidates(self.path,
+            predicate=lambda x: x['in_father_vcf'] == 0, chunk_size=1)
+        
+        self.assertEqual(list(candidates.index), [0, 1])
+        self.assertEqual(list(candidates['pos']), [100, 200])
+        
+        # the categorical columns are restored after joining the chunks
+        for column in ['person_stable_id', 'chrom', 'symbol', 'consequence']:
+            self.assertEqual(candidates[column].dtype.name, 'category')
+        self.assertTrue(candidates['consequence'].cat.ordered)
+        self.assertEqual(list(candidates['chrom']), ['1', 'X'])
+    
+    def test_load_candidates_regions(self):
+        ''' check that only candidates within the regions are loaded
+        '''
+        
+        regions = load_regions(['1:1-250', 'X'])
+        
+        candidates = load_candidates(self.path, regions=regions)
+        self.assertEqual(list(candidates['pos']), [100, 200])
+        self.assertEqual(list(candidates.index), [0, 1])
+        
+        chunks = list(iter_candidates(self.path, chunk_size=2, regions=regions))
+        self.assertEqual([ list(x['pos']) for x in chunks ], [[100, 200], []])
+    
+    def prefix_chroms(self):
+        ''' rewrite the candidates with "chr" prefixed chromosomes, sorted by
+        position, and return the path
+        '''
+        
+        path = os.path.join(self.folder, 'prefixed.txt')
+        with open(self.path) as handle, open(path, 'w') as output:
+            output.write(handle.readline())
+            lines = [ x.split('\t') for x in handle ]
+            for line in sorted(lines, key=lambda x: (x[1], int(x[2]))):
+                line[1] = 'chr' + line[1]
+                output.write('\t'.join(line))
+        
+        return path
+    
+    def test_load_candidates_regions_prefixed(self):
+        ''' check that regions match candidates with "chr" prefixed chromosomes
+        '''
+        
+        path = self.prefix_chroms()
+        candidates = load_candidates(path, regions=load_regions(['chr1:1-250', 'X']))
+        
+        self.assertEqual(list(candidates['chrom']), ['chr1', 'chrX'])
+        self.assertEqual(list(candidates['pos']), [100, 200])
+    
+    @unittest.skipIf(pysam is None, 'needs pysam')
+    def test_load_candidates_regions_indexed(self):
+        ''' check that candidates are fetched from a tabix indexed file
+        '''
+        
+        path = self.prefix_chroms()
+        pysam.tabix_compress(path, path + '.gz')
+        pysam.tabix_index(path + '.gz', seq_col=1, start_col=2, end_col=2,
+            line_skip=1, zerobased=False)
+        
+        regions = load_regions(['1:1-250', 'X'])
+        candidates = load_candidates(path + '.gz', regions=regions)
+        
+        self.assertEqual(list(candidates['chrom']), ['chr1', 'chrX'])
+        self.assertEqual(list(candidates['pos']), [100, 200])
+        
+        # an exact multiple of the chunk size doesn't give a trailing empty
+        # chunk, but regions without any candidates give one empty chunk
+        chunks = iter_candidates(path + '.gz', chunk_size=2, regions=regions)
+        self.assertEqual([ len(x) for x in chunks ], [2])
+        
+        chunks = iter_candidates(path + '.gz', regions=load_regions(['2']))
+        self.assertEqual([ len(x) for x in chunks ], [0])
+    
+    def test_write_candidates(self):
+        ''' check that candidates written to text load unchanged
+        '''
+        
+        candidates = load_candidates(self.path)
+        
+        for name in ['written.txt', 'written.txt.gz']:
+            path = os.path.join(self.folder, name)
+            write_candidates(candidates, path)
+            self.assertTrue(load_candidates(path).equals(candidates))
+        
+        # the parsed numbers are written as they were read
+        handle = io.StringIO()
+        write_candidates(candidates, handle)
+        rows = [ x.split('\t') for x in handle.getvalue().splitlines() ]
+        self.assertEqual([ x[HEADER.index('max_af')] for x in rows[1:] ],
+            ['0.001', 'NA', '0.01'])
+        self.assertEqual([ x[HEADER.index('pp_dnm')] for x in rows[1:] ],
+            ['0.9', 'NA', '0.5'])
+        
+        # file handles can't be compressed
+        with self.assertRaises(ValueError):
+            write_candidates(candidates, io.StringIO(), compression='gzip')
+        
+        # candidates can't be written as VCFs
+        for name in ['written.vcf', 'written.vcf.gz']:
+            with self.assertRaises(ValueError):
+                write_candidates(candidates, os.path.join(self.folder, name))
+    
+    def test_apply_schema(self):
+        ''' check that columns written by other tools get the declared types
+        '''
+        
+        candidates = DataFrame({'person_stable_id': ['a', 'b'],
+            'chrom': [1, 23], 'pos': [100, 200], 'ref': ['A', None],
+            'symbol': Series(['GENE1', None], dtype='category'),
+            'max_af': ['0.01', None], 'pp_dnm': [0.5, None],
+            'in_child_vcf': [1, 1]})
+        
+        candidates = apply_schema(candidates)
+        
+        self.assertEqual(candidates['pos'].dtype, numpy.int32)
+        self.assertEqual(candidates['pp_dnm'].dtype, numpy.float64)
+        self.assertEqual(candidates['in_child_vcf'].dtype, numpy.int8)
+        self.assertEqual(candidates['chrom'].dtype.name, 'category')
+        self.assertEqual(list(candidates['chrom']), ['1', '23'])
+        
+        # missing text is blank, as when loading from text, except max_af,
+        # which is parsed later
+        self.assertEqual(list(candidates['ref']), ['A', ''])
+        self.assertEqual(candidates['symbol'].dtype.name, 'category')
+        self.assertEqual(list(candidates['symbol']), ['GENE1', ''])
+        self.assertEqual(candidates['max_af'][0], '0.01')
+        self.assertTrue(candidates['max_af'].isnull()[1])
+    
+    def test_restore_categories(self):
+        ''' check that categorical columns are restored, with ordered consequences
+        '''
+        
+        candidates = load_candidates(self.path).astype(object)
+        candidates = restore_categories(candidates)
+        
+        for column in ['person_stable_id', 'chrom', 'symbol', 'consequence']:
+            self.assertEqual(candidates[column].dtype.name, 'category')
+        self.assertTrue(candidates['consequence'].cat.ordered)
+        self.assertEqual(list(candidates['chrom']), ['1', 'X', '1'])
+    
+    def test_concat_candidates(self):
+        ''' check that chunks with different categories are joined as categoricals
+        '''
+        
+        chunks = list(iter_candidates(self.path, chunk_size=1))
+        candidates = concat_candidates(chunks)
+        
+        self.assertTrue(candidates.equals(load_candidates(self.path)))
+        for column in ['person_stable_id', 'chrom', 'symbol', 'consequence']:
+            self.assertEqual(candidates[column].dtype.name, 'category')
+        self.assertEqual(list(candidates['symbol']), ['GENE1', '', 'GENE1'])
+    
+    def test_parse_floats(self):
+        ''' check that text values are converted to floats
+        '''
+        
+        values = Series(['0.1', '0.2,0.3', float('nan'), '.,0.4', '5e-05'])
+        parsed = parse_floats(values)
+        
+        self.assertEqual(parsed.dtype, numpy.float64)
+        self.assertTrue(numpy.isnan(parsed[2]))
+        self.assertTrue(numpy.isnan(parsed[3]))
+        self.assertEqual(list(parsed[[0, 1, 4]]), [0.1, 0.2, 5e-05])
+        
+        # values which aren't numbers raise an error
+        with self.assertRaises(ValueError):
+            parse_floats(Series(['0.1', 'ten']))
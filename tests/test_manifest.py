@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from denovoFilter.manifest import read_manifest, iter_manifest, load_manifest
+
+def after_150(candidates):
+    ''' module level predicate, so it can be sent to the worker processes
+    '''
+    return candidates['pos'] > 150
+
+HEADER = ['person_stable_id', 'chrom', 'pos', 'ref', 'alt', 'consequence',
+    'symbol', 'max_af', 'pp_dnm', 'dp4_child', 'dp4_father', 'dp4_mother',
+    'in_child_vcf', 'in_father_vcf', 'in_mother_vcf']
+
+class TestManifest(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.folder, 'manifest.txt')
+        
+        for person, positions in [('a', [100, 200]), ('b', [300])]:
+            path = os.path.join(self.folder, '{0}.txt'.format(person))
+            with open(path, 'w') as handle:
+                handle.write('\t'.join(HEADER) + '\n')
+                for pos in positions:
+                    handle.write('\t'.join([person, '1', str(pos), 'A', 'G',
+                        'missense_variant', 'GENE1', '0.001', '0.9', '10,10,5,5',
+                        '10,10,0,0', '10,10,0,0', '1', '0', '0']) + '\n')
+        
+        # include a file which can't be parsed, and a missing file
+        with open(os.path.join(self.folder, 'broken.txt'), 'w') as handle:
+            handle.write('\t'.join(HEADER) + '\nc\t1\tnot_a_position\n')
+        
+        with open(self.manifest, 'w') as handle:
+            handle.write('# candidate files\na.txt\textra\n\nbroken.txt\n'
+                'missing.txt\n{0}\n'.format(os.path.join(self.folder, 'b.txt')))
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_read_manifest(self):
+        ''' check that paths are read relative to the manifest
+        '''
+        
+        paths = read_manifest(self.manifest)
+        names = ['a.txt', 'broken.txt', 'missing.txt', 'b.txt']
+        
+        self.assertEqual(paths, [ os.path.join(self.folder, x) for x in names ])
+    
+    def test_iter_manifest(self):
+        ''' check that files are loaded in order, skipping files with errors
+        '''
+        
+        chunks = list(iter_manifest(self.manifest, workers=2))
+        
+        self.assertEqual([ list(x['pos']) for x in chunks ], [[100, 200], [300]])
+        self.assertEqual([ list(x.index) for x in chunks ], [[0, 1], [2]])
+    
+    def test_load_manifest(self):
+        ''' check that the files are joined, with a predicate applied to each
+        '''
+        
+        candidates = load_manifest(self.manifest, workers=2)
+        self.assertEqual(list(candidates['person_stable_id']), ['a', 'a', 'b'])
+        self.assertEqual(candidates['person_stable_id'].dtype.name, 'category')
+        self.assertEqual(candidates['symbol'].dtype.name, 'category')
+        self.assertTrue(candidates['consequence'].cat.ordered)
+        
+        dropped = []
+        candidates = load_manifest(self.manifest, workers=2,
+            predicate=after_150, dropped=dropped)
+        self.assertEqual(list(candidates.index), [0, 1])
+        self.assertEqual(list(candidates['pos']), [200, 300])
+        self.assertEqual([ x.to_dict() for x in dropped ], [{'GENE1': 1}, {}])
+    
+    def test_load_manifest_failed(self):
+        ''' check that an error is raised if no files can be loaded
+        '''
+        
+        with open(self.manifest, 'w') as handle:
+            handle.write('broken.txt\nmissing.txt\n')
+        
+        with self.assertRaises(ValueError):
+            load_manifest(self.manifest, workers=2)
+    
+    def test_load_manifest_empty(self):
+        ''' check that a manifest without any files gives a clear error
+        '''
+        
+        with open(self.manifest, 'w') as handle:
+            handle.write('# no candidate files\n\n')
+        
+        with self.assertRaisesRegex(ValueError, 'no candidate files listed'):
+            load_manifest(self.manifest, workers=2)
@@ -19,14 +19,25 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import os
+import shutil
+import tempfile
+import unittest
+
 import numpy
 import pandas
-import unittest
 
-from denovoFilter.min_depth import min_depth
+from denovoFilter.min_depth import min_depth, search_thresholds, \
+    threshold_table, min_depth_thresholds, threshold_table_path, \
+    get_threshold_table, THRESHOLD_TABLES
+from tests.temp_cache import use_temp_cache
 
 class TestMinDepth(unittest.TestCase):
     
+    def setUp(self):
+        # keep the cached threshold tables out of the user's cache directory
+        use_temp_cache(self)
+    
     def test_min_depth(self):
         ''' test estimating the minumum allowed depth
         '''
@@ -47,6 +58,74 @@ class TestMinDepth(unittest.TestCase):
         self.assertEqual(min_depth(numpy.array([75, 150]), 0.03), 5)
         self.assertEqual(min_depth(pandas.Series([75, 150]), 0.03), 5)
     
+    def test_search_thresholds(self):
+        ''' test searching for thresholds for many pairs of depths at once
+        '''
+        
+        thresholds = search_thresholds([100, 150, 75, 0], [100, 150, 150, 0], 0.03)
+        self.assertEqual(thresholds.tolist(), [min_depth(100, 0.03),
+            min_depth(150, 0.03), min_depth([75, 150], 0.03), 0])
+    
+    def test_threshold_table(self):
+        ''' test the table of thresholds matches the per-variant values
+        '''
+        
+        table = threshold_table(0.03, max_depth=60)
+        self.assertEqual(table.shape, (61, 61))
+        
+        for first in range(0, 61, 6):
+            for second in range(0, 61, 5):
+                self.assertEqual(table[first, second],
+                    min_depth([first, second], 0.03))
+    
+    def test_min_depth_thresholds(self):
+        ''' test looking up thresholds, including depths outside the table
+        '''
+        
+        first = numpy.array([10, 50, 100, 75])
+        second = numpy.array([20, 60, 100, 150])
+        
+        thresholds = min_depth_thresholds(first, second, 0.01, max_depth=80)
+        expected = [ min_depth([x, y], 0.01) for x, y in zip(first, second) ]
+        self.assertEqual(thresholds.tolist(), expected)
+    
+    def test_get_threshold_table_cached(self):
+        ''' test that threshold tables are cached on disk between runs
+        '''
+        
+        folder = tempfile.mkdtemp()
+        try:
+            path = threshold_table_path(0.01, 0.98, 50, folder)
+            
+            table = get_threshold_table(0.01, max_depth=50, cache_dir=folder)
+            self.assertTrue(os.path.exists(path))
+            
+            # clear the tables held in memory, so we load from the cached file
+            del THRESHOLD_TABLES[(0.01, 0.98, 50)]
+            cached = get_threshold_table(0.01, max_depth=50, cache_dir=folder)
+            self.assertIsInstance(cached, numpy.memmap)
+            self.assertTrue((cached == table).all())
+            
+            # a corrupted cache file gets replaced
+            del THRESHOLD_TABLES[(0.01, 0.98, 50)]
+            with open(path, 'wb') as handle:
+                handle.write(b'not a table')
+            rebuilt = get_threshold_table(0.01, max_depth=50, cache_dir=folder)
+            self.assertTrue((rebuilt == table).all())
+            self.assertIsNotNone(numpy.load(path, mmap_mode='r'))
+            
+            # as does a cached table with the wrong shape or type
+            for wrong in [table[:10, :10], table.astype(numpy.float64)]:
+                del THRESHOLD_TABLES[(0.01, 0.98, 50)]
+                numpy.save(path, wrong)
+                rebuilt = get_threshold_table(0.01, max_depth=50, cache_dir=folder)
+                self.assertEqual(rebuilt.shape, table.shape)
+                self.assertEqual(rebuilt.dtype, table.dtype)
+                self.assertTrue((rebuilt == table).all())
+        finally:
+            THRESHOLD_TABLES.pop((0.01, 0.98, 50), None)
+            shutil.rmtree(folder)
+    
     def test_min_depth_errors(self):
         ''' test that min depth raises appropriate errors
         '''
@@ -48,6 +48,14 @@ class TestMissingIndels(unittest.TestCase):
         status = filter_missing_indels(self.variants)
         self.assertTrue(all(status == Series([True, True])))
     
+    def test_filter_missing_indels_malformed_dp4(self):
+        ''' test that filter_missing_indels() fails malformed DP4 entries
+        '''
+        
+        self.variants['dp4_father'] = ['30,30,0,1', '30,30,0']
+        status = filter_missing_indels(self.variants)
+        self.assertTrue(all(status == Series([True, False])))
+    
     def test_filter_missing_indels_child_depth(self):
         ''' test that filter_missing_indels() screens low child alt depth
         '''
@@ -19,17 +19,36 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
+import os
 import unittest
-import time
 
 from pandas import DataFrame
 
 from denovoFilter.missing_symbols import fix_missing_gene_symbols, open_url, \
-    rate_limit_requests, get_gene_id
+    get_gene_id
+from denovoFilter.symbol_cache import SymbolCache
+from tests.temp_cache import use_temp_cache
+
+class FakeClient(object):
+    ''' stands in for EnsemblClient, recording the requested regions
+    '''
+    def __init__(self):
+        self.requested = []
+        self.closed = False
+    
+    def get_gene_ids(self, regions):
+        self.requested.append(regions)
+        return [ 'ARID1B' if x[0] == '6' else '' for x in regions ]
+    
+    def close(self):
+        self.closed = True
 
 class TestMissingSymbols(unittest.TestCase):
     
     def setUp(self):
+        # keep the symbol cache out of the user's cache directory
+        self.cache_dir = use_temp_cache(self)
+        
         self.variants = DataFrame({'person_stable_id': ['a', 'b'],
             'chrom': ['6', '2'],
             'pos': [157528051, 129119889],
@@ -46,6 +65,30 @@ class TestMissingSymbols(unittest.TestCase):
         symbols = fix_missing_gene_symbols(self.variants)
         self.assertEqual(list(symbols), ['ARID1B', 'fake_symbol.2_129119889'])
     
+    def test_fix_missing_gene_symbols_shared(self):
+        ''' check that a cache and client passed in are used, and left open
+        '''
+        
+        cache = SymbolCache(os.path.join(self.cache_dir, 'symbols.sqlite'))
+        client = FakeClient()
+        for _ in range(2):
+            symbols = fix_missing_gene_symbols(self.variants, cache=cache,
+                client=client)
+            self.assertEqual(list(symbols), ['ARID1B', 'fake_symbol.2_129119889'])
+        
+        # the second call finds both regions in the cache
+        self.assertEqual(client.requested, [[('2', 129119889, 129119889),
+            ('6', 157528051, 157528051)]])
+        self.assertFalse(client.closed)
+        cache.close()
+    
+    def test_get_gene_id(self):
+        ''' check that get_gene_id() still finds the symbol for one variant
+        '''
+        
+        self.assertEqual(get_gene_id('6', 157528051, 157528051), 'ARID1B')
+        self.assertEqual(get_gene_id('2', 129119889, 129119889), '')
+    
     def test_open_url(self):
         ''' check that open_url works correctly
         '''
@@ -64,36 +107,6 @@ class TestMissingSymbols(unittest.TestCase):
         
         # # The following code doesn't seem to work on travis-ci, so I have
         # # commented it out. The HTTPError part is later captured when testing
-        # # the get_gene_id function, by passing an invalid ensembl REST URL.
+        # # the EnsemblClient, by passing an invalid ensembl REST URL.
         # response, status_code, headers = open_url('http://httpbin.org/status/500', headers)
         # self.assertIn(status_code, [500, 411])
-    
-    def test_rate_limit_requests(self):
-        ''' test that rate_limit_requests() works correctly
-        '''
-        
-        # run this once, otherwise the first time around it won't pause, since
-        # the starting time was when the function was imported.
-        rate_limit_requests()
-        
-        initial = time.time()
-        rate_limit_requests()
-        self.assertTrue(time.time() - initial > 0.0667)
-        
-        initial = time.time()
-        rate_limit_requests(rate_limit=0.1)
-        self.assertTrue(time.time() - initial > 0.1)
-    
-    def test_get_gene_id(self):
-        ''' test that get_gene_id() works correctly
-        '''
-        
-        self.assertEqual(get_gene_id('6', 157528051, 157528051), 'ARID1B')
-        
-        with self.assertRaises(ValueError):
-            get_gene_id('NOTCHROM', 'AAAA', 'BBBB')
-        
-        with self.assertRaises(ValueError):
-            get_gene_id('6', 157528051, 157528051, attempts=6)
-        
-    
@@ -21,7 +21,11 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import unittest
 
-from denovoFilter.most_severe import get_most_severe
+from pandas import Series
+
+from denovoFilter.most_severe import get_most_severe, to_categorical, \
+    consequence_bitmask, severity_ranks, get_most_severe_terms, \
+    most_severe_per_group, is_coding
 
 class TestMostSevere(unittest.TestCase):
     
@@ -41,6 +45,62 @@ class TestMostSevere(unittest.TestCase):
         with self.assertRaises(IndexError):
             get_most_severe([])
         
+        # as do unknown consequences
+        with self.assertRaises(KeyError):
+            get_most_severe(['missense_variant', 'unknown_variant'])
+    
+    def test_to_categorical(self):
+        ''' check that consequences are ordered by severity
+        '''
+        
+        cq = to_categorical(['intron_variant', 'stop_gained', 'unknown_variant'])
+        
+        self.assertTrue(cq.cat.ordered)
+        self.assertEqual(list(cq), ['intron_variant', 'stop_gained', 'unknown_variant'])
+        self.assertEqual((cq < 'intron_variant').tolist(), [False, True, False])
+        
+        # unknown values are placed after all the VEP consequences
+        self.assertEqual(cq.cat.codes.tolist(), [24, 3, 39])
+    
+    def test_consequence_bitmask(self):
+        ''' check that multi-term consequences are encoded as bitmasks
+        '''
+        
+        cq = ['stop_gained', 'splice_donor_variant&intron_variant',
+            'missense_variant,unknown_variant', 'unknown_variant', None]
+        
+        masks = consequence_bitmask(cq)
+        self.assertEqual(masks.tolist(), [1 << 3, (1 << 1) | (1 << 24), 1 << 12, 0, 0])
+        self.assertEqual(severity_ranks(cq).tolist(), [3, 1, 12, -1, -1])
+        
+        terms = get_most_severe_terms(Series(cq, index=[5, 4, 3, 2, 1]))
+        self.assertEqual(list(terms.index), [5, 4, 3, 2, 1])
+        self.assertEqual(terms.astype(object).tolist()[:3], ['stop_gained',
+            'splice_donor_variant', 'missense_variant'])
+        self.assertTrue(terms.iloc[3:].isnull().all())
+    
+    def test_most_severe_per_group(self):
+        ''' check that we get the most severe consequence in each group
+        '''
+        
+        cq = Series(['intron_variant', 'missense_variant&stop_lost',
+            'synonymous_variant', 'unknown_variant'])
+        genes = Series(['A', 'A', 'B', 'C'])
+        
+        most_severe = most_severe_per_group(cq, genes)
+        self.assertEqual(list(most_severe.index), ['A', 'B', 'C'])
+        self.assertEqual(most_severe['A'], 'stop_lost')
+        self.assertEqual(most_severe['B'], 'synonymous_variant')
+        self.assertTrue(most_severe.isnull()['C'])
+    
+    def test_is_coding(self):
+        ''' check that coding consequences are identified
+        '''
+        
+        cq = ['missense_variant', 'intron_variant', 'unknown_variant', None,
+            'conserved_exon_terminus_variant']
+        self.assertEqual(is_coding(cq).tolist(), [True, False, False, False, True])
+        
         
         
     
@@ -25,7 +25,7 @@ import time
 from pandas import DataFrame, Series
 
 from denovoFilter.preliminary_filtering import fix_maf, preliminary_filtering, \
-    check_coding
+    rare_de_novo, check_coding
 
 class TestPreliminaryFiltering(unittest.TestCase):
     
@@ -68,6 +68,17 @@ class TestPreliminaryFiltering(unittest.TestCase):
         status = preliminary_filtering(self.variants)
         self.assertTrue(all(status == Series([False, True])))
     
+    def test_rare_de_novo(self):
+        ''' test that rare_de_novo ignores the sample QC
+        '''
+        
+        self.variants['in_mother_vcf'] = [0, 1]
+        status = rare_de_novo(self.variants, maf_cutoff=0.0001)
+        self.assertTrue(all(status == Series([False, False])))
+        
+        status = rare_de_novo(self.variants)
+        self.assertTrue(all(status == Series([True, False])))
+    
     def test_check_coding(self):
         ''' check that check_coding works correctly
         '''
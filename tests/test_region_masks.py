@@ -0,0 +1,114 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from pandas import DataFrame
+
+from denovoFilter.region_masks import read_bed, track_name, load_tracks, \
+    build_mask_index, index_tracks, region_bitmask, check_masks
+
+class TestRegionMasks(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        
+        self.first = os.path.join(self.folder, 'first.bed')
+        with open(self.first, 'w') as handle:
+            handle.write('track name=first\n')
+            handle.write('chr1\t100\t200\n')
+            handle.write('chr1\t150\t250\n')
+            handle.write('chr2\t10\t20\n')
+        
+        self.second = os.path.join(self.folder, 'second.bed.gz')
+        with gzip.open(self.second, 'wt') as handle:
+            handle.write('# a comment\n')
+            handle.write('1\t180\t300\tname\n')
+        
+        self.variants = DataFrame({'chrom': ['1', '1', '1', '1', '1', '2', 'X'],
+            'pos': [100, 101, 200, 250, 251, 15, 150]})
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_read_bed(self):
+        ''' check that BED regions are merged, and converted to 1-based
+        '''
+        
+        regions = read_bed(self.first)
+        
+        self.assertEqual(sorted(regions), ['1', '2'])
+        self.assertEqual(regions['1'][0].tolist(), [101])
+        self.assertEqual(regions['1'][1].tolist(), [251])
+        
+        regions = read_bed(self.second)
+        self.assertEqual(regions['1'][0].tolist(), [181])
+        self.assertEqual(regions['1'][1].tolist(), [301])
+    
+    def test_track_name(self):
+        ''' check that track names are taken from the paths
+        '''
+        
+        self.assertEqual(track_name('/data/low_complexity.bed.gz'), 'low_complexity')
+        self.assertEqual(track_name('blacklist.bed'), 'blacklist')
+    
+    def test_region_bitmask(self):
+        ''' check that every track is checked in a single search
+        '''
+        
+        tracks = [ x for name, x in load_tracks([self.first, self.second]) ]
+        index = build_mask_index(tracks)
+        
+        bitmask = region_bitmask(index, self.variants['chrom'], self.variants['pos'])
+        self.assertEqual(bitmask.tolist(), [0, 1, 3, 3, 2, 1, 0])
+    
+    def test_check_masks(self):
+        ''' check that we get a column per track
+        '''
+        
+        masked = check_masks(self.variants, load_tracks([self.first, self.second]))
+        
+        self.assertEqual(list(masked.columns), ['first', 'second'])
+        self.assertEqual(masked['first'].tolist(),
+            [False, True, True, True, False, True, False])
+        self.assertEqual(masked['second'].tolist(),
+            [False, False, True, True, True, False, False])
+    
+    def test_check_masks_prebuilt_index(self):
+        ''' check that a prebuilt index gives the same masks
+        '''
+        
+        tracks = load_tracks([self.first, self.second])
+        index = index_tracks(tracks)
+        
+        self.assertTrue(check_masks(self.variants, tracks, index).equals(
+            check_masks(self.variants, tracks)))
+    
+    def test_too_many_tracks(self):
+        ''' check that we can't check more tracks than fit in the bitmask
+        '''
+        
+        with self.assertRaises(ValueError):
+            build_mask_index([{}] * 65)
@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pandas import Series
+
+from denovoFilter.regions import pysam, parse_region, load_regions, \
+    build_region_index, in_regions, index_path, fetch_regions, MAX_POSITION
+
+class TestRegions(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_parse_region(self):
+        ''' check that region strings are parsed correctly
+        '''
+        
+        self.assertEqual(parse_region('1:100-200'), ('1', 100, 201))
+        self.assertEqual(parse_region('chr1:1,000-2,000'), ('1', 1000, 2001))
+        self.assertEqual(parse_region('X:5000'), ('X', 5000, MAX_POSITION))
+        self.assertEqual(parse_region('X'), ('X', 1, MAX_POSITION))
+        
+        for region in ['1:200-100', '1:a-b', ':100-200', '1:0-10']:
+            with self.assertRaises(ValueError):
+                parse_region(region)
+    
+    def test_load_regions(self):
+        ''' check that regions from text and BED files are merged
+        '''
+        
+        self.assertIsNone(load_regions())
+        
+        path = os.path.join(self.folder, 'regions.bed')
+        with open(path, 'w') as handle:
+            handle.write('chr1\t99\t150\n2\t0\t10\n')
+        
+        regions = load_regions(['1:120-300', '1:500-600'], path)
+        
+        self.assertEqual(sorted(regions), ['1', '2'])
+        starts, ends = regions['1']
+        self.assertEqual(list(starts), [100, 500])
+        self.assertEqual(list(ends), [301, 601])
+    
+    def test_in_regions(self):
+        ''' check that positions within regions are found
+        '''
+        
+        regions = load_regions(['1:100-200', 'X'])
+        chroms = Series(['1', '1', '1', '2', 'X'])
+        positions = Series([99, 100, 200, 150, 1000000])
+        
+        index = build_region_index(regions)
+        
+        self.assertEqual(list(in_regions(index, chroms, positions)),
+            [False, True, True, False, True])
+        
+        # chromosomes with a "chr" prefix match regions given either way
+        index = build_region_index(load_regions(['chr1:100-200']))
+        chroms = Series(['chr1', '1', 'chr2'], dtype='category')
+        self.assertEqual(list(in_regions(index, chroms, Series([150, 150, 150]))),
+            [True, True, False])
+    
+    def test_index_path(self):
+        ''' check that tabix and CSI indexes are found
+        '''
+        
+        path = os.path.join(self.folder, 'candidates.txt.gz')
+        self.assertIsNone(index_path(path))
+        
+        open(path + '.csi', 'w').close()
+        self.assertEqual(index_path(path), path + '.csi')
+    
+    @unittest.skipIf(pysam is None, 'needs pysam')
+    def test_fetch_regions(self):
+        ''' check that lines are fetched from a tabix indexed file
+        '''
+        
+        path = os.path.join(self.folder, 'candidates.txt')
+        with open(path, 'w') as handle:
+            handle.write('person_stable_id\tchrom\tpos\n')
+            for pos in range(100, 1000, 100):
+                handle.write('a\tchr1\t{0}\n'.format(pos))
+        
+        pysam.tabix_compress(path, path + '.gz')
+        pysam.tabix_index(path + '.gz', seq_col=1, start_col=2, end_col=2,
+            line_skip=1, zerobased=False)
+        
+        regions = load_regions(['1:200-300', '1:250-400', '2'])
+        lines = list(fetch_regions(path + '.gz', regions))
+        
+        self.assertEqual(lines, ['a\tchr1\t200', 'a\tchr1\t300', 'a\tchr1\t400'])
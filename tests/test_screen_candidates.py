@@ -0,0 +1,175 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from denovoFilter.screen_candidates import accepts_keyword, \
+    load_rare_candidates, screen_candidates
+from denovoFilter.filter_denovogear_sites import filter_denovogear_sites
+from tests.temp_cache import use_temp_cache
+
+HEADER = ['person_stable_id', 'chrom', 'pos', 'ref', 'alt', 'consequence',
+    'symbol', 'max_af', 'pp_dnm', 'dp4_child', 'dp4_father', 'dp4_mother',
+    'in_child_vcf', 'in_father_vcf', 'in_mother_vcf']
+
+class TestScreenCandidates(unittest.TestCase):
+    
+    def setUp(self):
+        # keep the compiled segdups and threshold tables out of the user's
+        # cache directory
+        use_temp_cache(self)
+        
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'candidates.txt')
+        
+        # the second candidate is common, and the third is inherited
+        rows = [['a', '1', '100', 'A', 'G', 'missense_variant', 'GENE1', '0.001'],
+            ['a', '1', '200', 'A', 'G', 'missense_variant', 'GENE1', '0.5'],
+            ['b', '1', '300', 'A', 'G', 'missense_variant', 'GENE2', '0'],
+            ['b', '1', '400', 'A', 'G', 'missense_variant', '', '0.5']]
+        
+        with open(self.path, 'w') as handle:
+            handle.write('\t'.join(HEADER) + '\n')
+            for i, row in enumerate(rows):
+                father = '1' if i == 2 else '0'
+                handle.write('\t'.join(row + ['0.9', '10,10,5,5', '10,10,0,0',
+                    '10,10,0,0', '1', father, '0']) + '\n')
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_load_rare_candidates(self):
+        ''' check that failing candidates are dropped, but counted per symbol
+        '''
+        
+        candidates, symbol_counts = load_rare_candidates(self.path, 0.01)
+        
+        # candidates without symbols are kept, since their symbols are fixed later
+        self.assertEqual(list(candidates['pos']), [100, 400])
+        self.assertEqual(symbol_counts.to_dict(), {'GENE1': 1, 'GENE2': 1})
+    
+    def test_load_rare_candidates_no_chunks(self):
+        ''' check that loading without any chunks gives no dropped counts
+        '''
+        
+        def load(path, columns, predicate, regions=None, dropped=None):
+            return None
+        
+        candidates, symbol_counts = load_rare_candidates(self.path, 0.01, load=load)
+        self.assertEqual(len(symbol_counts), 0)
+    
+    def test_accepts_keyword(self):
+        ''' check that keyword arguments are found
+        '''
+        
+        self.assertTrue(accepts_keyword(lambda x, symbol_counts=None: x, 'symbol_counts'))
+        self.assertTrue(accepts_keyword(lambda x, **kwargs: x, 'symbol_counts'))
+        self.assertFalse(accepts_keyword(lambda x, counts=None: x, 'symbol_counts'))
+    
+    def test_screen_candidates_filter_function(self):
+        ''' check that filter functions without symbol_counts still work
+        '''
+        
+        calls = []
+        def filter_function(de_novos, status, counts=None):
+            calls.append(len(de_novos))
+            return status
+        
+        screened = screen_candidates(self.path, None, filter_function,
+            maf=0.01, fix_symbols=False)
+        
+        self.assertEqual(calls, [2])
+        self.assertEqual(list(screened['pos']), [100])
+        
+        # and functions which take symbol_counts get the dropped candidates
+        def filter_function(de_novos, status, counts=None, symbol_counts=None):
+            calls.append(symbol_counts.to_dict())
+            return status
+        
+        screen_candidates(self.path, None, filter_function, maf=0.01,
+            fix_symbols=False)
+        self.assertEqual(calls[-1], {'GENE1': 1, 'GENE2': 1})
+    
+    def write_cohort(self):
+        ''' write a cohort of candidates in a few genes, and a BED file of genes
+        
+        Some sites recur in several people, some have parental alt reads, some
+        are common or inherited, and some lack symbols, which are found from
+        the BED file.
+        '''
+        
+        genes_path = os.path.join(self.folder, 'genes.bed')
+        genes = [('1', 1000, 2000, 'GENE1'), ('1', 5000, 6000, 'GENE2'),
+            ('2', 1000, 3000, 'GENE3')]
+        with open(genes_path, 'w') as handle:
+            for chrom, start, end, name in genes:
+                handle.write('{0}\t{1}\t{2}\t{3}\n'.format(chrom, start - 1, end, name))
+        
+        rand = random.Random(1)
+        path = os.path.join(self.folder, 'cohort.txt')
+        with open(path, 'w') as handle:
+            handle.write('\t'.join(HEADER) + '\n')
+            for i in range(60):
+                chrom, start, end, symbol = rand.choice(genes)
+                pos = rand.choice([start + 10, start + 20, rand.randint(start, end)])
+                if rand.random() < 0.2:
+                    symbol = ''
+                max_af = rand.choice(['0.001', '0.001', '0.001', '0.5', ''])
+                child = [ rand.randint(0, 30) for x in range(4) ]
+                parents = [ '{0},{1},{2},{3}'.format(rand.randint(5, 40),
+                    rand.randint(5, 40), rand.choice([0, 0, 0, 1, 5]),
+                    rand.choice([0, 0, 0, 1, 5])) for x in range(2) ]
+                handle.write('\t'.join(['person_{0}'.format(i % 20), chrom,
+                    str(pos), 'A', rand.choice(['G', 'T']), 'missense_variant',
+                    symbol, max_af, '0.9', ','.join(map(str, child))] + parents +
+                    ['1', rand.choice(['0'] * 9 + ['1']), '0']) + '\n')
+        
+        return path, genes_path
+    
+    def test_screen_candidates_chunked(self):
+        ''' check that screening in chunks matches screening all at once
+        '''
+        
+        path, genes_path = self.write_cohort()
+        
+        for annotate_only in [True, False]:
+            expected = screen_candidates(path, None, filter_denovogear_sites,
+                annotate_only=annotate_only, gene_annotations=genes_path)
+            
+            # chunks of 7 candidates split the genes and recurrent sites
+            # across chunks
+            chunked = screen_candidates(path, None, filter_denovogear_sites,
+                annotate_only=annotate_only, gene_annotations=genes_path,
+                chunk_size=7)
+            
+            self.assertTrue(chunked.reset_index(drop=True).astype(object).equals(
+                expected.reset_index(drop=True).astype(object)))
+        
+        # check the cohort exercises the filtering, with fixed symbols, and
+        # candidates which pass and fail
+        self.assertIn('GENE1', set(expected['symbol']))
+        self.assertTrue(0 < len(expected) < 60)
+        self.assertTrue(set(expected['symbol']) <= set(['GENE1', 'GENE2', 'GENE3']))
@@ -22,9 +22,12 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 import unittest
 import math
 
+import numpy
 from pandas import DataFrame, Series
 
-from denovoFilter.site_deviations import site_strand_bias, test_sites, test_genes
+from denovoFilter.site_deviations import site_strand_bias, test_sites, \
+    test_genes, DeviationCounts
+from denovoFilter.trio_counts import TrioCounts
 
 class TestSiteDeviations(unittest.TestCase):
     
@@ -108,3 +111,40 @@ class TestSiteDeviations(unittest.TestCase):
         # check when we mask some variants due to failing earlier variants
         expected = [float('nan'), float('nan')]
         self.check_series(test_genes(self.counts, sb, pass_status=[True, False]), expected)
+    
+    def test_deviation_counts(self):
+        ''' check that counts accumulated over chunks give the same p-values
+        '''
+        
+        state = numpy.random.RandomState(1)
+        n = 500
+        variants = DataFrame({'chrom': state.choice(['1', '2'], n),
+            'pos': state.randint(1, 20, n),
+            'ref': state.choice(['A', 'G', 'GC'], n),
+            'alt': state.choice(['C', 'T', 'TA'], n),
+            'symbol': state.choice(['TEST1', 'TEST2', 'TEST3'], n)},
+            index=numpy.arange(n) + 10)
+        for member in ['child', 'mother', 'father']:
+            for allele in ['ref_F', 'ref_R', 'alt_F', 'alt_R']:
+                depth = 2 if member != 'child' or allele.startswith('ref') else 8
+                variants[member + '_' + allele] = state.poisson(depth, n)
+        pass_status = state.random_sample(n) > 0.2
+        
+        counts = TrioCounts.from_columns(variants)
+        strand_bias, parental_bias = test_sites(variants, pass_status, counts)
+        gene_bias = test_genes(variants, strand_bias, pass_status, counts)
+        
+        # count the variants in chunks, and merge the chunks every so often
+        deviations = DeviationCounts(max_pending=100)
+        for start in range(0, n, 60):
+            chunk = slice(start, start + 60)
+            deviations.add(variants[chunk], counts.subset(numpy.arange(n)[chunk]),
+                pass_status[chunk])
+        
+        chunk_strand, chunk_parental = deviations.test_sites(variants)
+        self.assertEqual(list(chunk_strand.index), list(variants.index))
+        self.check_series(chunk_strand, strand_bias)
+        self.check_series(chunk_parental, parental_bias)
+        self.check_series(deviations.test_genes(variants), gene_bias)
+        
+        self.assertEqual(sorted(deviations.recurrent_genes()), ['TEST1', 'TEST2', 'TEST3'])
@@ -0,0 +1,127 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pandas import DataFrame
+
+from denovoFilter.symbol_cache import SymbolCache, ROW_OVERHEAD
+from denovoFilter.missing_symbols import get_cached_gene_ids
+
+class TestSymbolCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'symbols.sqlite')
+        self.cache = SymbolCache(self.path)
+    
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.folder)
+    
+    def test_get_and_set(self):
+        ''' check that symbols are stored per build and region
+        '''
+        
+        self.assertIsNone(self.cache.get('grch37', '6', 157528051, 157528051))
+        self.cache.set('grch37', '6', 157528051, 157528051, 'ARID1B')
+        
+        self.assertEqual(self.cache.get('grch37', '6', 157528051, 157528051), 'ARID1B')
+        self.assertIsNone(self.cache.get('grch38', '6', 157528051, 157528051))
+        self.assertIsNone(self.cache.get('grch37', '6', 157528051, 157528052))
+        
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+        self.assertEqual(self.cache.report(), 'symbol cache: 1 hits, 3 misses')
+    
+    def test_negative_results(self):
+        ''' check that regions without genes are cached as blank symbols
+        '''
+        
+        self.cache.set('grch37', '2', 129119889, 129119889, '')
+        self.assertEqual(self.cache.get('grch37', '2', 129119889, 129119889), '')
+    
+    def test_persistent(self):
+        ''' check that symbols are available to later runs
+        '''
+        
+        self.cache.set('grch37', '6', 100, 100, 'ARID1B')
+        self.cache.close()
+        
+        self.cache = SymbolCache(self.path)
+        self.assertEqual(self.cache.get('grch37', '6', 100, 100), 'ARID1B')
+    
+    def test_eviction(self):
+        ''' check that the least recently used regions are dropped first
+        '''
+        
+        # allow space for two regions, each with 8 bytes of text
+        self.cache.close()
+        self.cache = SymbolCache(self.path, max_bytes=2 * (8 + ROW_OVERHEAD))
+        for pos in [100, 200, 300]:
+            self.cache.set('grch37', '1', pos, pos, 'A')
+        self.assertEqual(self.cache.size(), 3 * (8 + ROW_OVERHEAD))
+        
+        # using the first region means the second is the least recently used
+        self.cache.get('grch37', '1', 100, 100)
+        self.cache.evict()
+        
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.get('grch37', '1', 100, 100), 'A')
+        self.assertIsNone(self.cache.get('grch37', '1', 200, 200))
+        self.assertEqual(self.cache.get('grch37', '1', 300, 300), 'A')
+        
+        # a region with a longer symbol takes more space, and so needs both
+        # older regions dropped
+        self.cache.set('grch37', '1', 400, 400, 'LONGER_SYMBOL')
+        self.cache.evict()
+        self.assertEqual(len(self.cache), 1)
+    
+    def test_get_many(self):
+        ''' check that many regions can be looked up and stored at once
+        '''
+        
+        regions = [('1', 100, 100), ('1', 200, 200)]
+        self.assertEqual(self.cache.get_many('grch37', regions), [None, None])
+        
+        self.cache.set_many('grch37', regions, ['A', ''])
+        self.assertEqual(self.cache.get_many('grch37', regions), ['A', ''])
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+    
+    def test_get_cached_gene_ids(self):
+        ''' check that cached regions don't need any requests to Ensembl
+        '''
+        
+        variants = DataFrame({'chrom': ['6', '2', '6'],
+            'pos': [157528051, 129119889, 157528051],
+            'end': [157528051, 129119889, 157528051]})
+        
+        self.cache.set('grch37', '6', 157528051, 157528051, 'ARID1B')
+        self.cache.set('grch37', '2', 129119889, 129119889, '')
+        
+        symbols = get_cached_gene_ids(variants, 'grch37', self.cache)
+        self.assertEqual(symbols, ['ARID1B', '', 'ARID1B'])
+        
+        # the repeated region is only looked up once
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 0))
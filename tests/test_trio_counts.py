@@ -0,0 +1,96 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import unittest
+import math
+
+from pandas import DataFrame
+
+from denovoFilter.trio_counts import TrioCounts
+
+class TestTrioCounts(unittest.TestCase):
+    
+    def setUp(self):
+        
+        self.variants = DataFrame({'person_stable_id': ['a', 'b'],
+            'dp4_child': ['20,15,30,25', '0,0,0,0'],
+            'dp4_mother': ['20,15,0,1', '20,20,0,0'],
+            'dp4_father': ['30,30,0,1', '30,30,0,2'],
+            })
+    
+    def test_from_dp4(self):
+        ''' check that the counts are constructed from the DP4 columns
+        '''
+        
+        counts = TrioCounts.from_dp4(self.variants)
+        self.assertEqual(len(counts), 2)
+        self.assertEqual(counts.columns()['child_alt_R'].tolist(), [25, 0])
+        self.assertEqual(counts.valid.tolist(), [True, True])
+    
+    def test_from_columns(self):
+        ''' check that the counts can be constructed from count columns
+        '''
+        
+        counts = TrioCounts.from_dp4(self.variants)
+        table = DataFrame(counts.columns())
+        
+        other = TrioCounts.from_columns(table)
+        self.assertEqual(other.counts.tolist(), counts.counts.tolist())
+    
+    def test_depths_and_alts(self):
+        ''' check the depths and ALT counts for each trio member
+        '''
+        
+        counts = TrioCounts.from_dp4(self.variants)
+        
+        self.assertEqual(counts.depth('child').tolist(), [90, 0])
+        self.assertEqual(counts.depth('mother').tolist(), [36, 40])
+        self.assertEqual(counts.alts('father').tolist(), [1, 2])
+        self.assertEqual(counts.min_parent_alt.tolist(), [1, 0])
+    
+    def test_proportion(self):
+        ''' check the ALT proportions, including for sites without reads
+        '''
+        
+        counts = TrioCounts.from_dp4(self.variants)
+        
+        child = counts.proportion('child')
+        self.assertAlmostEqual(child[0], 55/90.0)
+        self.assertTrue(math.isnan(child[1]))
+    
+    def test_cached(self):
+        ''' check that derived values are only computed once
+        '''
+        
+        counts = TrioCounts.from_dp4(self.variants)
+        self.assertIs(counts.depth('child'), counts.depth('child'))
+        self.assertIs(counts.min_parent_alt, counts.min_parent_alt)
+    
+    def test_subset(self):
+        ''' check that we can select a subset of the variants
+        '''
+        
+        counts = TrioCounts.from_dp4(self.variants)
+        counts.depth('child')
+        
+        subset = counts.subset([False, True])
+        self.assertEqual(len(subset), 1)
+        self.assertEqual(subset.depth('child').tolist(), [0])
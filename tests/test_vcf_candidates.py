@@ -0,0 +1,170 @@
+"""
+Copyright (c) 2016 Genome Research Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from denovoFilter.vcf_candidates import trio_columns, carries_allele, \
+    read_depths, vep_allele, parse_float, get_annotation, iter_vcf_records
+from denovoFilter.load_candidates import load_candidates, iter_candidates
+
+HEADER = ['##fileformat=VCFv4.2',
+    '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations '
+        'from Ensembl VEP. Format: Allele|Consequence|SYMBOL|MAX_AF">',
+    '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tchild\tdad\tmum']
+
+RECORDS = ['chr1\t100\t.\tA\tG\t.\tPASS\tPP_DNM=0.9;CSQ=G|intron_variant|GENE2|,'
+        'G|missense_variant|GENE1|0.001\tGT:DP4\t0/1:10,10,5,5\t0/0:10,10,0,0\t0/0:12,8,0,0',
+    'chr1\t200\t.\tC\tCT,T\t.\tPASS\tMAX_AF=0.2,0.01;CQ=frameshift_variant,'
+        'stop_gained;HGNC=GENE3\tGT:AD\t1/2:10,4,6\t0/1:7,3,0\t0/0:9,0,0',
+    'chr2\t300\t.\tG\tA\t.\tPASS\t.\tGT:ADF:ADR\t0/0:5,0:5,0\t0/1:5,2:5,2\t0/0:5,0:5,0']
+
+class TestVcfCandidates(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'trio.vcf')
+        
+        with open(self.path, 'w') as handle:
+            handle.write('\n'.join(HEADER + RECORDS) + '\n')
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_trio_columns(self):
+        ''' check that the trio samples are found
+        '''
+        
+        samples = ['mum', 'child', 'dad']
+        pedigree = {'child': 'child', 'father': 'dad', 'mother': 'mum'}
+        
+        self.assertEqual(trio_columns(samples, pedigree), (1, 2, 0))
+        self.assertEqual(trio_columns(samples), (0, 1, 2))
+        
+        with self.assertRaises(ValueError):
+            trio_columns(samples, {'child': 'other', 'father': 'dad', 'mother': 'mum'})
+        
+        with self.assertRaises(ValueError):
+            trio_columns(['child', 'dad'])
+    
+    def test_carries_allele(self):
+        ''' check that genotypes are checked for alleles
+        '''
+        
+        self.assertEqual(carries_allele('0/1', 1), 1)
+        self.assertEqual(carries_allele('1|2', 2), 1)
+        self.assertEqual(carries_allele('0/1', 2), 0)
+        self.assertEqual(carries_allele('./.', 1), 0)
+        self.assertEqual(carries_allele(None, 1), 0)
+        self.assertEqual(carries_allele(None, 1, missing=1), 1)
+    
+    def test_read_depths(self):
+        ''' check that DP4 depths come from DP4, ADF/ADR or AD fields
+        '''
+        
+        self.assertEqual(read_depths({'DP4': '1,2,3,4', 'AD': '3,7'}, 1), '1,2,3,4')
+        self.assertEqual(read_depths({'ADF': '5,2,1', 'ADR': '4,3,0'}, 2), '5,4,1,0')
+        self.assertEqual(read_depths({'AD': '11,.,5'}, 2), '6,5,3,2')
+        self.assertEqual(read_depths({}, 1), '0,0,0,0')
+    
+    def test_vep_allele(self):
+        ''' check that alleles are trimmed as VEP does
+        '''
+        
+        self.assertEqual(vep_allele('A', 'G'), 'G')
+        self.assertEqual(vep_allele('A', 'AT'), 'T')
+        self.assertEqual(vep_allele('AT', 'A'), '-')
+    
+    def test_parse_float(self):
+        ''' check that frequencies are parsed, and missing values give None
+        '''
+        
+        self.assertEqual(parse_float('0.01'), 0.01)
+        self.assertIsNone(parse_float('.'))
+        self.assertIsNone(parse_float(''))
+        
+        # INFO fields given as flags, or absent, aren't numbers
+        self.assertIsNone(parse_float(True))
+        self.assertIsNone(parse_float(None))
+    
+    def test_get_annotation(self):
+        ''' check that the most severe VEP consequence for the allele is used
+        '''
+        
+        fields = ['Allele', 'Consequence', 'SYMBOL', 'MAX_AF']
+        info = {'CSQ': 'G|intron_variant|GENE2|0.2,C|stop_gained|GENE3|,'
+            'G|splice_region_variant&missense_variant|GENE1|0.001',
+            'MAX_AF': '0.01'}
+        
+        self.assertEqual(get_annotation(info, fields, 'A', 'G', 1),
+            ('missense_variant', 'GENE1', 0.2))
+        
+        consequence, symbol, max_af = get_annotation({}, fields, 'A', 'G', 1)
+        self.assertEqual((consequence, symbol), ('', ''))
+        self.assertTrue(numpy.isnan(max_af))
+        
+        # frequency fields given as flags are missing
+        consequence, symbol, max_af = get_annotation({'MAX_AF': True}, fields,
+            'A', 'G', 1)
+        self.assertTrue(numpy.isnan(max_af))
+    
+    def test_iter_vcf_records(self):
+        ''' check that candidates are extracted for alleles in the child
+        '''
+        
+        records = list(iter_vcf_records(self.path))
+        
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0], ['child', '1', 100, 'A', 'G',
+            'missense_variant', 'GENE1', 0.001, 0.9, '10,10,5,5',
+            '10,10,0,0', '12,8,0,0', 1, 0, 0])
+        
+        # each allele of multiallelic sites is a separate candidate
+        self.assertEqual([ x[4] for x in records[1:] ], ['CT', 'T'])
+        self.assertEqual(records[1][5:8], ['frameshift_variant', 'GENE3', 0.2])
+        self.assertEqual(records[2][5:8], ['stop_gained', 'GENE3', 0.01])
+        self.assertEqual(records[1][9:], ['5,5,2,2', '4,3,2,1', '5,4,0,0', 1, 1, 0])
+        self.assertEqual(records[2][9:], ['5,5,3,3', '4,3,0,0', '5,4,0,0', 1, 0, 0])
+    
+    def test_load_candidates(self):
+        ''' check that candidates load from plain and gzipped VCFs
+        '''
+        
+        gzipped = self.path + '.gz'
+        with open(self.path, 'rb') as handle, gzip.open(gzipped, 'wb') as output:
+            shutil.copyfileobj(handle, output)
+        
+        candidates = load_candidates(self.path)
+        self.assertTrue(load_candidates(gzipped).equals(candidates))
+        
+        self.assertEqual(list(candidates['chrom']), ['1', '1', '1'])
+        self.assertEqual(candidates['pos'].dtype, numpy.int32)
+        self.assertEqual(candidates['symbol'].dtype.name, 'category')
+        self.assertTrue(numpy.isnan(candidates['pp_dnm'][1]))
+        
+        chunks = list(iter_candidates(self.path, chunk_size=2))
+        self.assertEqual([ list(x.index) for x in chunks ], [[0, 1], [2]])